@@ -1,35 +1,43 @@
 """FastAPI server with WebSocket for real-time ship position updates"""
 import asyncio
 import json
+import time
 
 import httpx
 from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.responses import HTMLResponse, JSONResponse, Response
 from contextlib import asynccontextmanager
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import List
 
+from app.change_feed import ChangeFeedListener, FleetSnapshot
 from app.database import close_db_pool, get_ais_stations, get_ship_positions, get_ship_trails, init_db_pool
 from app.world_ports import STATIC_MAJOR_PORTS
-from config import OPENWEATHERMAP_API_KEY
+from config import (
+    API_BROADCAST_INTERVAL, API_KEYFRAME_INTERVAL, API_POLL_OVERLAP, API_RECONCILE_INTERVAL, OPENWEATHERMAP_API_KEY,
+    POSITIONS_FEED_CHANNEL,
+)
 
 ALLOWED_WEATHER_TILE_LAYERS = frozenset({"precipitation_new", "temp_new"})
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global poller_task
     await init_db_pool()
-    poller_task = asyncio.create_task(refresh_positions_loop())
+    poller_tasks.append(asyncio.create_task(reconcile_loop()))
+    poller_tasks.append(asyncio.create_task(broadcast_loop()))
+    if feed_listener is not None:
+        poller_tasks.append(asyncio.create_task(feed_listener.run()))
     try:
         yield
     finally:
-        if poller_task:
-            poller_task.cancel()
+        for task in poller_tasks:
+            task.cancel()
             try:
-                await poller_task
+                await task
             except asyncio.CancelledError:
                 pass
+        poller_tasks.clear()
         await close_db_pool()
 
 
@@ -48,11 +56,12 @@ class ConnectionManager:
             self.active_connections.remove(websocket)
 
     async def broadcast(self, data: dict):
-        """Broadcast data to all connected clients"""
+        """Broadcast data to all connected clients (serialized once for all of them)"""
+        message = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
         disconnected = []
         for connection in self.active_connections:
             try:
-                await connection.send_json(data)
+                await connection.send_text(message)
             except Exception:
                 disconnected.append(connection)
         
@@ -61,13 +70,30 @@ class ConnectionManager:
             self.disconnect(conn)
 
 manager = ConnectionManager()
-latest_payload = {
-    "type": "update",
-    "ships": [],
-    "stations": [],
-    "timestamp": datetime.now(timezone.utc).isoformat(),
-}
-poller_task = None
+# /ws protocol: a "keyframe" (full fleet) on connect, on "resync" requests and
+# every API_KEYFRAME_INTERVAL; otherwise "delta" frames with only the added,
+# changed and removed ships. Every broadcast frame carries the next sequence
+# number, so a client that sees a gap asks for a keyframe.
+broadcast_seq = 0
+poller_tasks = []
+
+# Ships are kept current from the collector's change feed; the DB is only
+# queried to reconcile (every API_RECONCILE_INTERVAL) and, while the feed is
+# down, polled incrementally every second
+fleet = FleetSnapshot(max_age=30 * 60)
+db_stations_payload = []
+fleet_changed = asyncio.Event()
+reconcile_requested = asyncio.Event()
+
+
+def _on_feed_rows(rows) -> None:
+    if fleet.apply_feed(rows):
+        fleet_changed.set()
+
+
+feed_listener = None
+if POSITIONS_FEED_CHANNEL:
+    feed_listener = ChangeFeedListener(POSITIONS_FEED_CHANNEL, _on_feed_rows, reconcile_requested.set)
 
 _STATIC_STATIONS_PAYLOAD = [
     {
@@ -82,23 +108,87 @@ _STATIC_STATIONS_PAYLOAD = [
 ]
 
 
-async def refresh_positions_loop():
-    """Single shared poller: one DB query, broadcast to all clients."""
-    global latest_payload
+async def reconcile_loop():
+    """Keep the snapshot in sync with the DB when the feed cannot be trusted.
+
+    A full read of current positions and stations runs every
+    API_RECONCILE_INTERVAL and whenever the feed listener (re)connects. While
+    the feed is down, positions are polled every second incrementally: only
+    rows with updated_at above the snapshot watermark (minus API_POLL_OVERLAP).
+    """
+    global db_stations_payload
+    last_full = 0.0
     while True:
+        force_full = reconcile_requested.is_set()
+        reconcile_requested.clear()
         try:
-            positions = await get_ship_positions(max_age_minutes=30)
-            db_stations = _serialize_ais_stations(await get_ais_stations())
-            latest_payload = {
-                "type": "update",
-                "ships": _serialize_positions(positions),
-                "stations": db_stations + _STATIC_STATIONS_PAYLOAD,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-            }
-            await manager.broadcast(latest_payload)
+            started_at = time.time()
+            if force_full or fleet.watermark is None or started_at - last_full >= API_RECONCILE_INTERVAL:
+                positions = await get_ship_positions(max_age_minutes=30)
+                fleet.reconcile(positions, started_at)
+                db_stations_payload = _serialize_ais_stations(await get_ais_stations())
+                last_full = started_at
+                changed = True
+            else:
+                since = fleet.watermark - timedelta(seconds=API_POLL_OVERLAP)
+                changed = fleet.merge(await get_ship_positions(max_age_minutes=30, since=since)) > 0
+            if fleet.expire() or changed:
+                fleet_changed.set()
+        except Exception as exc:
+            print(f"Reconcile error: {exc}")
+        if feed_listener is not None and feed_listener.connected:
+            timeout = max(0.0, API_RECONCILE_INTERVAL - (time.time() - last_full))
+        else:
+            timeout = 1
+        try:
+            await asyncio.wait_for(reconcile_requested.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+def _keyframe() -> dict:
+    return {
+        "type": "keyframe",
+        "seq": broadcast_seq,
+        "ships": fleet.ships(),
+        "stations": db_stations_payload + _STATIC_STATIONS_PAYLOAD,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+async def broadcast_loop():
+    """Single shared broadcaster: at most one frame per API_BROADCAST_INTERVAL, only after changes."""
+    global broadcast_seq
+    last_keyframe_at = time.monotonic()
+    last_stations = None
+    while True:
+        await fleet_changed.wait()
+        fleet_changed.clear()
+        try:
+            added, changed, removed = fleet.take_changes()
+            stations = db_stations_payload + _STATIC_STATIONS_PAYLOAD
+            keyframe_due = time.monotonic() - last_keyframe_at >= API_KEYFRAME_INTERVAL
+            if keyframe_due or added or changed or removed or stations != last_stations:
+                broadcast_seq += 1
+                if keyframe_due:
+                    last_keyframe_at = time.monotonic()
+                    frame = _keyframe()
+                else:
+                    frame = {
+                        "type": "delta",
+                        "seq": broadcast_seq,
+                        "added": added,
+                        "changed": changed,
+                        "removed": removed,
+                        "timestamp": datetime.now(timezone.utc).isoformat(),
+                    }
+                    if stations != last_stations:
+                        frame["stations"] = stations
+                last_stations = stations
+                await manager.broadcast(frame)
         except Exception as exc:
-            print(f"Refresh loop error: {exc}")
-        await asyncio.sleep(1)
+            print(f"Broadcast error: {exc}")
+        await asyncio.sleep(API_BROADCAST_INTERVAL)
 
 
 @app.get("/api/weather/current")
@@ -2475,6 +2565,59 @@ async def get_index():
         let renderCapOverride = null;
         let clusterIconsWarm = false;
 
+        // Живой флот из /ws: ключевой кадр (keyframe) при подключении, дальше дельты
+        // (added / changed / removed) с порядковым номером seq. При пропуске номера
+        // просим у сервера новый ключевой кадр ("resync").
+        const liveShips = new Map();
+        let liveShipsArray = null;
+        let liveStations = [];
+        let liveSeq = null;
+        let lastFullRenderAt = 0;
+        let lastReplayPushAt = 0;
+        // Полная перерисовка (новые суда, лимит по зуму, KPI) не чаще этого интервала;
+        // между ними дельты обновляют только уже существующие маркеры.
+        const FULL_RENDER_INTERVAL_MS = 5000;
+        const REPLAY_PUSH_INTERVAL_MS = 1000;
+
+        function liveShipsList() {
+            if (liveShipsArray === null) liveShipsArray = Array.from(liveShips.values());
+            return liveShipsArray;
+        }
+
+        // Кадр в прежнем формате для renderFrame, replay и фильтров; ships собирается лениво
+        function liveFrame(timestamp) {
+            return {
+                type: 'update',
+                get ships() { return liveShipsList(); },
+                stations: liveStations,
+                timestamp,
+            };
+        }
+
+        function applyLiveMessage(data) {
+            if (data.type === 'keyframe') {
+                liveShips.clear();
+                (data.ships || []).forEach((s) => liveShips.set(s.ship_id, s));
+                liveStations = data.stations || [];
+                liveSeq = data.seq;
+                liveShipsArray = null;
+                return true;
+            }
+            if (data.type !== 'delta') return false;
+            if (liveSeq === null || data.seq !== liveSeq + 1) {
+                liveSeq = null;
+                if (ws && ws.readyState === WebSocket.OPEN) ws.send('resync');
+                return false;
+            }
+            liveSeq = data.seq;
+            (data.added || []).forEach((s) => liveShips.set(s.ship_id, s));
+            (data.changed || []).forEach((s) => liveShips.set(s.ship_id, s));
+            (data.removed || []).forEach((id) => liveShips.delete(id));
+            if (Array.isArray(data.stations)) liveStations = data.stations;
+            liveShipsArray = null;
+            return true;
+        }
+
         function refreshModeButtons() {
             const live = document.getElementById('liveBtn');
             const pause = document.getElementById('pauseBtn');
@@ -3236,8 +3379,92 @@ async def get_index():
             });
         }
 
+        function updateShipMarker(ship, zoom) {
+            const shipId = ship.ship_id;
+            const lat = ship.latitude;
+            const lon = ship.longitude;
+            const angle = Math.round(getShipAngle(ship));
+            const kind = shipTypeCategory(ship.ship_type);
+            const prev = markerStates[shipId] || {};
+            const moved = Math.abs((prev.lat || 0) - lat) >= 0.00002 || Math.abs((prev.lon || 0) - lon) >= 0.00002;
+            const iconChanged = prev.iconRev !== ICON_REV || prev.angle !== angle || prev.zoom !== zoom || prev.kind !== kind;
+            if (moved) {
+                markers[shipId].setLatLng([lat, lon]);
+            }
+            if (iconChanged) {
+                markers[shipId].setIcon(createShipIcon(ship));
+            }
+            if (markers[shipId].isPopupOpen()) {
+                markers[shipId].setPopupContent(getPopup(ship));
+            }
+            // Чтобы clusterclick мог получить shipId через options
+            markers[shipId].options.shipId = shipId;
+            markerStates[shipId] = { lat, lon, angle, zoom, iconRev: ICON_REV, kind };
+        }
+
+        function removeShipMarker(shipId) {
+            if (!markers[shipId]) return;
+            markerLayer.removeLayer(markers[shipId]);
+            delete markers[shipId];
+            delete markerStates[shipId];
+        }
+
+        function createShipMarker(ship, zoom) {
+            const shipId = ship.ship_id;
+            const lat = ship.latitude;
+            const lon = ship.longitude;
+            const angle = Math.round(getShipAngle(ship));
+            const kind = shipTypeCategory(ship.ship_type);
+            markers[shipId] = L.marker([lat, lon], { icon: createShipIcon(ship), shipId: shipId })
+                .addTo(markerLayer)
+                .bindPopup(getPopup(ship));
+            markers[shipId].options.shipId = shipId;
+            markerStates[shipId] = { lat, lon, angle, zoom, iconRev: ICON_REV, kind };
+
+            // Наведение открывает popup с параметрами (помогает в демо после клика по кластеру).
+            // Проверяем текущий zoom, чтобы не разогревать UI на дальнем зуме.
+            markers[shipId].on('mouseover', function () {
+                if (map.getZoom() >= 8) this.openPopup();
+            });
+            markers[shipId].on('mouseout', function () {
+                if (map.getZoom() >= 8) this.closePopup();
+            });
+            markers[shipId].on('click', function () {
+                selectShip(shipId);
+            });
+        }
+
+        // Дельта без полной перерисовки: двигаем показанные суда, убираем удаленные
+        // и сразу рисуем новые (в видимой области, пока не достигнут лимит маркеров по зуму).
+        // Выборку по лимиту пересчитывает следующая полная перерисовка (FULL_RENDER_INTERVAL_MS).
+        function renderDelta(data) {
+            (data.removed || []).forEach(removeShipMarker);
+            const zoom = map.getZoom();
+            const bounds = map.getBounds();
+            const cap = renderCapOverride !== null ? renderCapOverride : getRenderCapByZoom(zoom);
+            let shown = Object.keys(markers).length;
+            const apply = (ship) => {
+                if (!passesSpeedFilter(ship) || !passesTypeFilter(ship)) {
+                    if (markers[ship.ship_id]) {
+                        removeShipMarker(ship.ship_id);
+                        shown -= 1;
+                    }
+                    return;
+                }
+                if (markers[ship.ship_id]) {
+                    updateShipMarker(ship, zoom);
+                } else if (shown < cap && bounds.contains([ship.latitude, ship.longitude])) {
+                    createShipMarker(ship, zoom);
+                    shown += 1;
+                }
+            };
+            (data.added || []).forEach(apply);
+            (data.changed || []).forEach(apply);
+        }
+
         function renderFrame(frame) {
             if (!frame || !frame.ships) return;
+            lastFullRenderAt = Date.now();
             const { kpiShips, renderShips } = applyShipFilter(frame.ships);
             const visibleShips = renderShips;
             const currentShipIds = new Set();
@@ -3245,55 +3472,19 @@ async def get_index():
             visibleShips.forEach((ship) => {
                 const shipId = ship.ship_id;
                 currentShipIds.add(shipId);
-                const lat = ship.latitude;
-                const lon = ship.longitude;
                 const zoom = map.getZoom();
-                const angle = Math.round(getShipAngle(ship));
-                const kind = shipTypeCategory(ship.ship_type);
 
                 if (markers[shipId]) {
-                    const prev = markerStates[shipId] || {};
-                    const moved = Math.abs((prev.lat || 0) - lat) >= 0.00002 || Math.abs((prev.lon || 0) - lon) >= 0.00002;
-                    const iconChanged = prev.iconRev !== ICON_REV || prev.angle !== angle || prev.zoom !== zoom || prev.kind !== kind;
-                    if (moved) {
-                        markers[shipId].setLatLng([lat, lon]);
-                    }
-                    if (iconChanged) {
-                        markers[shipId].setIcon(createShipIcon(ship));
-                    }
-                    if (markers[shipId].isPopupOpen()) {
-                        markers[shipId].setPopupContent(getPopup(ship));
-                    }
-                    // Чтобы clusterclick мог получить shipId через options
-                    markers[shipId].options.shipId = shipId;
-                    markerStates[shipId] = { lat, lon, angle, zoom, iconRev: ICON_REV, kind };
+                    updateShipMarker(ship, zoom);
                 } else {
-                    markers[shipId] = L.marker([lat, lon], { icon: createShipIcon(ship), shipId: shipId })
-                        .addTo(markerLayer)
-                        .bindPopup(getPopup(ship));
-                    markers[shipId].options.shipId = shipId;
-                    markerStates[shipId] = { lat, lon, angle, zoom, iconRev: ICON_REV, kind };
-
-                    // Наведение открывает popup с параметрами (помогает в демо после клика по кластеру).
-                    // Проверяем текущий zoom, чтобы не разогревать UI на дальнем зуме.
-                    markers[shipId].on('mouseover', function () {
-                        if (map.getZoom() >= 8) this.openPopup();
-                    });
-                    markers[shipId].on('mouseout', function () {
-                        if (map.getZoom() >= 8) this.closePopup();
-                    });
-                    markers[shipId].on('click', function () {
-                        selectShip(shipId);
-                    });
+                    createShipMarker(ship, zoom);
                 }
             });
 
             Object.keys(markers).forEach((shipIdRaw) => {
                 const shipId = Number(shipIdRaw);
                 if (!currentShipIds.has(shipId)) {
-                    markerLayer.removeLayer(markers[shipId]);
-                    delete markers[shipId];
-                    delete markerStates[shipId];
+                    removeShipMarker(shipId);
                 }
             });
 
@@ -3385,13 +3576,25 @@ async def get_index():
 
             ws.onmessage = (event) => {
                 const data = JSON.parse(event.data);
-                latestLiveFrame = data;
-                replayBuffer.push(data);
-                if (replayBuffer.length > MAX_BUFFER_FRAMES) replayBuffer.shift();
+                if (!applyLiveMessage(data)) return;
+                const frame = liveFrame(data.timestamp);
+                latestLiveFrame = frame;
+                const nowMs = Date.now();
+                if (nowMs - lastReplayPushAt >= REPLAY_PUSH_INTERVAL_MS) {
+                    lastReplayPushAt = nowMs;
+                    replayBuffer.push({ type: 'update', ships: frame.ships, stations: frame.stations, timestamp: frame.timestamp });
+                    if (replayBuffer.length > MAX_BUFFER_FRAMES) replayBuffer.shift();
+                }
                 if (!isPaused && !isReplaying) {
-                    scheduleRender(data);
+                    if (data.type === 'keyframe' || nowMs - lastFullRenderAt >= FULL_RENDER_INTERVAL_MS) {
+                        scheduleRender(frame);
+                    } else {
+                        renderDelta(data);
+                    }
+                }
+                if (data.type === 'keyframe' || Array.isArray(data.stations)) {
+                    queueStationsSyncFromFrame(frame);
                 }
-                queueStationsSyncFromFrame(data);
             };
 
             ws.onerror = () => {
@@ -3401,6 +3604,7 @@ async def get_index():
             };
 
             ws.onclose = () => {
+                liveSeq = null;
                 const statusEl = document.getElementById('status');
                 statusEl.textContent = t().statDisconnected;
                 statusEl.className = 'status disconnected';
@@ -3604,27 +3808,6 @@ def _serialize_ais_stations(rows):
     return out
 
 
-def _serialize_positions(positions):
-    out = []
-    for p in positions:
-        row = {
-            "ship_id": p["ship_id"],
-            "latitude": float(p["latitude"]),
-            "longitude": float(p["longitude"]),
-            "course_over_ground": float(p["course_over_ground"]) if p["course_over_ground"] else None,
-            "speed_over_ground": float(p["speed_over_ground"]) if p["speed_over_ground"] else None,
-            "heading": int(p["heading"]) if p["heading"] else None,
-        }
-        try:
-            st = p["ship_type"]
-        except (KeyError, TypeError):
-            st = None
-        if st is not None:
-            row["ship_type"] = int(st)
-        out.append(row)
-    return out
-
-
 @app.get("/api/trails")
 async def get_trails(minutes: int = Query(default=30, ge=0, le=60)):
     """Return ship trails from history for the selected time range."""
@@ -3639,9 +3822,11 @@ async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time ship position updates"""
     await manager.connect(websocket)
     try:
-        await websocket.send_json(latest_payload)
+        await websocket.send_json(_keyframe())
         while True:
-            await websocket.receive_text()
+            message = await websocket.receive_text()
+            if message == "resync":
+                await websocket.send_json(_keyframe())
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception as e:
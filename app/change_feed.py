@@ -0,0 +1,195 @@
+"""In-memory fleet snapshot fed by the collector's LISTEN/NOTIFY change feed.
+
+The collector publishes committed current positions as JSON arrays of
+[ship_id, latitude, longitude, course, speed, heading, ship_type, event_time]
+(see collector/change_feed.py). The API applies them to a snapshot and
+periodically reconciles it with ship_positions_current, which covers events
+lost while the listener was disconnected.
+"""
+import asyncio
+import json
+import time
+
+import asyncpg
+
+from config import DB_CONFIG
+
+
+def _ship_row(ship_id, latitude, longitude, course, speed, heading, ship_type) -> dict:
+    """One ship in the /ws payload format."""
+    row = {
+        "ship_id": ship_id,
+        "latitude": float(latitude),
+        "longitude": float(longitude),
+        "course_over_ground": float(course) if course else None,
+        "speed_over_ground": float(speed) if speed else None,
+        "heading": int(heading) if heading else None,
+    }
+    if ship_type is not None:
+        row["ship_type"] = int(ship_type)
+    return row
+
+
+class FleetSnapshot:
+    """Latest row per ship_id, merged from feed events and reconciliation queries.
+
+    A row never replaces one with a newer event time, and ships not updated
+    for `max_age` seconds are dropped. Ships added, changed and removed since
+    the last `take_changes()` are tracked for /ws delta frames.
+    """
+
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        # ship_id -> [event_time, seen_at, row]
+        self._ships = {}
+        # newest updated_at read from ship_positions_current, for incremental polling
+        self.watermark = None
+        self._added = set()
+        self._changed = set()
+        self._removed = set()
+
+    def __len__(self) -> int:
+        return len(self._ships)
+
+    def _put(self, ship_id, event_time: float, seen_at: float, row: dict) -> bool:
+        known = self._ships.get(ship_id)
+        if known is None:
+            self._ships[ship_id] = [event_time, seen_at, row]
+            if ship_id in self._removed:
+                # removed and back within one delta: clients still have it
+                self._removed.discard(ship_id)
+                self._changed.add(ship_id)
+            else:
+                self._added.add(ship_id)
+            return True
+        if event_time < known[0]:
+            return False
+        if "ship_type" not in row and "ship_type" in known[2]:
+            row["ship_type"] = known[2]["ship_type"]
+        known[0] = event_time
+        known[1] = max(known[1], seen_at)
+        if row == known[2]:
+            return False
+        known[2] = row
+        if ship_id not in self._added:
+            self._changed.add(ship_id)
+        return True
+
+    def _delete(self, ship_id) -> None:
+        del self._ships[ship_id]
+        if ship_id in self._added:
+            self._added.discard(ship_id)
+        else:
+            self._changed.discard(ship_id)
+            self._removed.add(ship_id)
+
+    def apply_feed(self, rows: list) -> int:
+        """Apply decoded feed rows. Returns the number of ships changed."""
+        now = time.time()
+        changed = 0
+        for ship_id, lat, lon, course, speed, heading, ship_type, event_time in rows:
+            row = _ship_row(ship_id, lat, lon, course, speed, heading, ship_type)
+            changed += self._put(ship_id, event_time, now, row)
+        return changed
+
+    def merge(self, records: list) -> int:
+        """Apply ship_positions_current rows and advance the watermark. Returns the number of ships changed."""
+        changed = 0
+        watermark = self.watermark
+        for r in records:
+            ship_id = r["ship_id"]
+            updated_at = r["updated_at"]
+            row = _ship_row(
+                ship_id, r["latitude"], r["longitude"], r["course_over_ground"],
+                r["speed_over_ground"], r["heading"], r["ship_type"],
+            )
+            changed += self._put(ship_id, r["timestamp"].timestamp(), updated_at.timestamp(), row)
+            if watermark is None or updated_at > watermark:
+                watermark = updated_at
+        self.watermark = watermark
+        return changed
+
+    def reconcile(self, records: list, started_at: float) -> None:
+        """Merge a full ship_positions_current query issued at `started_at` (epoch seconds).
+
+        Ships missing from the result are dropped unless the feed updated them
+        after the query started.
+        """
+        self.merge(records)
+        present = {r["ship_id"] for r in records}
+        for ship_id in [s for s, known in self._ships.items() if s not in present and known[1] < started_at]:
+            self._delete(ship_id)
+
+    def expire(self) -> int:
+        cutoff = time.time() - self.max_age
+        stale = [ship_id for ship_id, known in self._ships.items() if known[1] < cutoff]
+        for ship_id in stale:
+            self._delete(ship_id)
+        return len(stale)
+
+    def ships(self) -> list:
+        return [known[2] for known in self._ships.values()]
+
+    def take_changes(self) -> tuple:
+        """(added rows, changed rows, removed ship_ids) since the previous call."""
+        ships = self._ships
+        added = [ships[ship_id][2] for ship_id in self._added]
+        changed = [ships[ship_id][2] for ship_id in self._changed]
+        removed = list(self._removed)
+        self._added = set()
+        self._changed = set()
+        self._removed = set()
+        return added, changed, removed
+
+
+class ChangeFeedListener:
+    """LISTEN on a dedicated connection, reconnecting with backoff.
+
+    `on_rows(rows)` gets every decoded payload. `on_gap()` is called whenever
+    events may have been missed (each (re)connect), so the caller can reconcile.
+    """
+
+    def __init__(self, channel: str, on_rows, on_gap, keepalive: float = 30.0):
+        self.channel = channel
+        self.on_rows = on_rows
+        self.on_gap = on_gap
+        self.keepalive = keepalive
+        self.connected = False
+
+    def _notify(self, connection, pid, channel, payload) -> None:
+        try:
+            rows = json.loads(payload)
+        except ValueError as exc:
+            print(f"Change feed: bad payload skipped: {exc}")
+            return
+        self.on_rows(rows)
+
+    async def run(self) -> None:
+        delay = 1.0
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(**DB_CONFIG)
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _: closed.set())
+                await conn.add_listener(self.channel, self._notify)
+                self.connected = True
+                delay = 1.0
+                print(f"Change feed: listening on '{self.channel}'")
+                self.on_gap()
+                while not closed.is_set():
+                    try:
+                        await asyncio.wait_for(closed.wait(), self.keepalive)
+                    except asyncio.TimeoutError:
+                        # a half-open TCP connection would otherwise go unnoticed
+                        await conn.fetchval("SELECT 1", timeout=5)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                print(f"Change feed error: {exc}")
+            finally:
+                self.connected = False
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
@@ -1,5 +1,6 @@
 import asyncpg
-from typing import Dict, List
+from datetime import datetime
+from typing import Dict, List, Optional
 
 from config import DB_CONFIG
 
@@ -23,11 +24,17 @@ async def close_db_pool():
             db_pool = None
 
 
-async def get_ship_positions(max_age_minutes: int = 30) -> List:
+async def get_ship_positions(max_age_minutes: int = 30, since: Optional[datetime] = None) -> List:
+        """Current positions updated in the last `max_age_minutes`.
+
+        With `since`, only rows with updated_at after it are returned (incremental
+        polling). Callers pass their watermark minus an overlap, because a row
+        written by a transaction that commits late can carry an older updated_at.
+        """
         pool = await init_db_pool()
-        
+
         query = """
-            SELECT 
+            SELECT
                 ship_id,
                 latitude,
                 longitude,
@@ -40,11 +47,13 @@ async def get_ship_positions(max_age_minutes: int = 30) -> List:
                 timestamp,
                 updated_at
             FROM ship_positions_current
-            WHERE updated_at > NOW() - INTERVAL '%s minutes'
-            ORDER BY updated_at DESC
-        """ % max_age_minutes
+            WHERE updated_bucket >= freshness_bucket(
+                    GREATEST(NOW() - $1::int * INTERVAL '1 minute', $2::timestamptz)
+                  )
+              AND updated_at > GREATEST(NOW() - $1::int * INTERVAL '1 minute', $2::timestamptz)
+        """
         async with pool.acquire() as conn:
-            rows = await conn.fetch(query)
+            rows = await conn.fetch(query, max_age_minutes, since)
         return rows
 
 
@@ -65,35 +74,39 @@ async def get_ais_stations() -> List:
         return []
 
 
+# Last N history points of every vessel with history in the window. The window
+# is read through the BRIN index on timestamp (rows arrive in near time order),
+# then ranked per vessel; vessels need no row in ship_positions_current.
+TRAILS_QUERY = """
+    WITH ranked_history AS (
+        SELECT
+            ship_id,
+            latitude,
+            longitude,
+            timestamp,
+            ROW_NUMBER() OVER (
+                PARTITION BY ship_id
+                ORDER BY timestamp DESC
+            ) AS rn
+        FROM ship_positions_history
+        WHERE timestamp > NOW() - ($1::int * INTERVAL '1 minute')
+    )
+    SELECT
+        ship_id,
+        latitude,
+        longitude,
+        timestamp
+    FROM ranked_history
+    WHERE rn <= $2
+    ORDER BY ship_id, timestamp ASC;
+"""
+
+
 async def get_ship_trails(trail_minutes: int = 30, points_per_ship: int = 60) -> Dict[int, List[Dict]]:
         pool = await init_db_pool()
 
-        query = """
-            WITH ranked_history AS (
-                SELECT
-                    ship_id,
-                    latitude,
-                    longitude,
-                    timestamp,
-                    ROW_NUMBER() OVER (
-                        PARTITION BY ship_id
-                        ORDER BY timestamp DESC
-                    ) AS rn
-                FROM ship_positions_history
-                WHERE timestamp > NOW() - ($1::int * INTERVAL '1 minute')
-            )
-            SELECT
-                ship_id,
-                latitude,
-                longitude,
-                timestamp
-            FROM ranked_history
-            WHERE rn <= $2
-            ORDER BY ship_id, timestamp ASC;
-        """
-
         async with pool.acquire() as conn:
-            rows = await conn.fetch(query, trail_minutes, points_per_ship)
+            rows = await conn.fetch(TRAILS_QUERY, trail_minutes, points_per_ship)
 
         trails: Dict[int, List[Dict]] = {}
         for row in rows:
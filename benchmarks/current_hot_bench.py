@@ -0,0 +1,199 @@
+"""Current-position upsert throughput and bloat: updated_at index vs HOT-friendly table.
+
+Both variants run the same workload: every vessel is upserted once per round,
+in collector-sized batches. The tables are scratch copies in schema `bench_current`
+(dropped afterwards).
+    before   index on updated_at, default fillfactor and autovacuum settings
+    after    index on updated_bucket only, fillfactor 70, per-table autovacuum
+             (init_postgres.sql), written with upsert_ship_positions_batch
+Results are JSON: upserts/s, the HOT update share, dead tuples, and table and
+index size. Needs a local PostgreSQL 15+ (DB_CONFIG).
+
+Usage:
+    python -m benchmarks.current_hot_bench [--vessels 20000] [--rounds 50] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+
+from config import AIS_CURRENT_BATCH_SIZE, DB_CONFIG
+from collector.ship_repository import upsert_ship_positions_batch
+
+SCHEMA = "bench_current"
+
+_COLUMNS = """
+    ship_id BIGINT PRIMARY KEY,
+    latitude DOUBLE PRECISION NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    course_over_ground DOUBLE PRECISION,
+    speed_over_ground DOUBLE PRECISION,
+    heading INTEGER,
+    navigational_status INTEGER,
+    rate_of_turn DOUBLE PRECISION,
+    ship_type SMALLINT,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+"""
+
+_BEFORE = f"""
+CREATE TABLE ship_positions_current ({_COLUMNS});
+CREATE INDEX idx_current_updated_at ON ship_positions_current(updated_at);
+"""
+
+_AFTER = f"""
+CREATE FUNCTION freshness_bucket(ts TIMESTAMPTZ) RETURNS TIMESTAMPTZ AS $$
+    SELECT date_bin(INTERVAL '10 minutes', ts, TIMESTAMPTZ '2000-01-01 00:00:00+00');
+$$ LANGUAGE sql IMMUTABLE;
+CREATE TABLE ship_positions_current (
+    {_COLUMNS.strip()},
+    updated_bucket TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT freshness_bucket(NOW())
+) WITH (
+    fillfactor = 70,
+    autovacuum_vacuum_scale_factor = 0.02,
+    autovacuum_vacuum_threshold = 1000,
+    autovacuum_analyze_scale_factor = 0.05,
+    autovacuum_vacuum_cost_delay = 0
+);
+CREATE INDEX idx_current_updated_bucket ON ship_positions_current(updated_bucket);
+"""
+
+# upsert_ship_positions_batch before updated_bucket existed
+_BEFORE_UPSERT = """
+    INSERT INTO ship_positions_current (
+        ship_id, latitude, longitude, course_over_ground,
+        speed_over_ground, heading, navigational_status,
+        rate_of_turn, ship_type, timestamp, updated_at
+    )
+    SELECT
+        r.ship_id, r.latitude, r.longitude, r.course_over_ground,
+        r.speed_over_ground, r.heading, r.navigational_status,
+        r.rate_of_turn, r.ship_type, r.timestamp, NOW()
+    FROM unnest(
+        $1::bigint[], $2::float8[], $3::float8[], $4::float8[],
+        $5::float8[], $6::int[], $7::int[],
+        $8::float8[], $9::smallint[], $10::timestamptz[]
+    ) AS r(
+        ship_id, latitude, longitude, course_over_ground,
+        speed_over_ground, heading, navigational_status,
+        rate_of_turn, ship_type, timestamp
+    )
+    ON CONFLICT (ship_id)
+    DO UPDATE SET
+        latitude = EXCLUDED.latitude,
+        longitude = EXCLUDED.longitude,
+        course_over_ground = EXCLUDED.course_over_ground,
+        speed_over_ground = EXCLUDED.speed_over_ground,
+        heading = EXCLUDED.heading,
+        navigational_status = EXCLUDED.navigational_status,
+        rate_of_turn = EXCLUDED.rate_of_turn,
+        ship_type = COALESCE(EXCLUDED.ship_type, ship_positions_current.ship_type),
+        timestamp = EXCLUDED.timestamp,
+        updated_at = EXCLUDED.updated_at
+    WHERE EXCLUDED.timestamp >= ship_positions_current.timestamp
+"""
+
+
+async def _upsert_before(conn: asyncpg.Connection, records: list) -> None:
+    await conn.execute(_BEFORE_UPSERT, *(list(col) for col in zip(*records)))
+
+
+def _rounds(vessels: int, rounds: int, seed: int = 1) -> list:
+    """One list of batches per round; each vessel moves a little every round."""
+    rng = random.Random(seed)
+    start = datetime.now(timezone.utc)
+    ships = [[200_000_000 + i, rng.uniform(-60, 60), rng.uniform(-180, 180)] for i in range(vessels)]
+    result = []
+    for n in range(rounds):
+        stamp = start + timedelta(seconds=10 * n)
+        records = []
+        for ship in ships:
+            ship[1] += rng.uniform(-0.001, 0.001)
+            ship[2] += rng.uniform(-0.001, 0.001)
+            records.append((
+                ship[0], ship[1], ship[2], rng.uniform(0, 360), rng.uniform(0, 20),
+                rng.randrange(360), 0, 0.0, 70, stamp,
+            ))
+        result.append([records[i:i + AIS_CURRENT_BATCH_SIZE] for i in range(0, len(records), AIS_CURRENT_BATCH_SIZE)])
+    return result
+
+
+async def _table_stats(conn: asyncpg.Connection) -> dict:
+    await conn.execute("SELECT pg_stat_force_next_flush()")
+    row = await conn.fetchrow(
+        """
+        SELECT n_tup_upd, n_tup_hot_upd, n_dead_tup, autovacuum_count,
+               pg_relation_size(relid) AS table_bytes, pg_indexes_size(relid) AS index_bytes
+        FROM pg_stat_user_tables
+        WHERE relid = 'ship_positions_current'::regclass
+        """
+    )
+    stats = dict(row)
+    stats["hot_ratio"] = row["n_tup_hot_upd"] / row["n_tup_upd"] if row["n_tup_upd"] else 0.0
+    return stats
+
+
+async def _run_variant(ddl: str, write, rounds: list) -> dict:
+    conn = await asyncpg.connect(**DB_CONFIG, server_settings={"search_path": SCHEMA})
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA};")
+        await conn.execute(ddl)
+        for batch in rounds[0]:
+            await write(conn, batch)  # initial inserts, not timed
+
+        rows = 0
+        started = time.perf_counter()
+        for batches in rounds[1:]:
+            for batch in batches:
+                await write(conn, batch)
+                rows += len(batch)
+        elapsed = time.perf_counter() - started
+        return {"upserts": rows, "seconds": elapsed, "upserts_per_s": rows / elapsed, **await _table_stats(conn)}
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+async def run(vessels: int, rounds: int) -> dict:
+    workload = _rounds(vessels, rounds)
+    results = {
+        "vessels": vessels,
+        "rounds": rounds,
+        "before": await _run_variant(_BEFORE, _upsert_before, workload),
+        "after": await _run_variant(_AFTER, upsert_ship_positions_batch, workload),
+    }
+    results["speedup"] = results["after"]["upserts_per_s"] / results["before"]["upserts_per_s"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vessels", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--output", default="-", help="JSON results file ('-' = stdout)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.vessels, args.rounds))
+    for name in ("before", "after"):
+        r = results[name]
+        print(
+            f"{name:6s} {r['upserts_per_s']:9.0f} upserts/s | HOT {r['hot_ratio']:.0%} | "
+            f"dead {r['n_dead_tup']} | table {r['table_bytes'] / 2**20:.1f} MB | "
+            f"indexes {r['index_bytes'] / 2**20:.1f} MB",
+            file=sys.stderr,
+        )
+    payload = json.dumps(results, indent=2)
+    if args.output == "-":
+        print(payload)
+    else:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Per-message CPU cost of AIS frame decoding: dict path vs typed (msgspec) path.
+
+Usage:
+    python -m benchmarks.decode_bench [--messages 200000] [--repeat 5]
+"""
+import argparse
+import json
+import random
+import time
+
+from collector import decoder
+
+# Rough aisstream message mix on a global subscription
+_MIX = (
+    ("PositionReport", 0.62),
+    ("StandardClassBPositionReport", 0.16),
+    ("ExtendedClassBPositionReport", 0.02),
+    ("ShipStaticData", 0.08),
+    ("StaticDataReport", 0.05),
+    ("BaseStationReport", 0.04),
+    ("AidsToNavigationReport", 0.02),
+    ("LongRangeAisBroadcastMessage", 0.01),
+)
+
+
+def _payload(msg_type: str, mmsi: int, rnd: random.Random) -> dict:
+    lat = rnd.uniform(-60, 70)
+    lon = rnd.uniform(-180, 180)
+    common = {"MessageID": 1, "RepeatIndicator": 0, "UserID": mmsi, "Valid": True, "Spare": 0}
+    if msg_type in ("PositionReport", "StandardClassBPositionReport", "ExtendedClassBPositionReport"):
+        body = dict(
+            common,
+            Latitude=lat, Longitude=lon,
+            Sog=round(rnd.uniform(0, 22), 1), Cog=round(rnd.uniform(0, 360), 1),
+            TrueHeading=rnd.choice((511, rnd.randint(0, 359))),
+            NavigationalStatus=rnd.randint(0, 8), RateOfTurn=rnd.randint(-127, 127),
+            PositionAccuracy=True, Raim=False, Timestamp=rnd.randint(0, 59),
+            SpecialManoeuvreIndicator=0, CommunicationState=rnd.randint(0, 100000),
+        )
+        if msg_type == "ExtendedClassBPositionReport":
+            body.update(Name=f"VESSEL {mmsi}   ", Type=rnd.randint(30, 89))
+        return body
+    if msg_type == "ShipStaticData":
+        return dict(
+            common,
+            Name=f"VESSEL {mmsi}        ", CallSign="ABC123", ImoNumber=rnd.randint(1000000, 9999999),
+            Type=rnd.randint(30, 89), Destination="ROTTERDAM", MaximumStaticDraught=8.5,
+            Dimension={"A": 100, "B": 20, "C": 10, "D": 10},
+            Eta={"Month": 5, "Day": 3, "Hour": 12, "Minute": 0},
+        )
+    if msg_type == "StaticDataReport":
+        return dict(
+            common, Reserved=0, PartNumber=True,
+            ReportA={"Valid": False, "Name": ""},
+            ReportB={"Valid": True, "ShipType": rnd.randint(30, 89), "CallSign": "XYZ", "VendorIDName": "ACME"},
+        )
+    if msg_type == "BaseStationReport":
+        return dict(common, Latitude=lat, Longitude=lon, FixType=1, UtcYear=2026, UtcMonth=1, UtcDay=1)
+    if msg_type == "AidsToNavigationReport":
+        return dict(common, Latitude=lat, Longitude=lon, Name=f"BUOY {mmsi}", Type=rnd.randint(1, 31))
+    return dict(common, Latitude=lat, Longitude=lon, Sog=12.0, Cog=90.0, PositionAccuracy=False)
+
+
+def sample_frames(count: int, vessels: int = 20000, seed: int = 1) -> list:
+    """Synthetic aisstream frames (bytes) with realistic field sets and MetaData."""
+    rnd = random.Random(seed)
+    types = [t for t, _ in _MIX]
+    weights = [w for _, w in _MIX]
+    frames = []
+    for msg_type in rnd.choices(types, weights=weights, k=count):
+        mmsi = 200000000 + rnd.randrange(vessels)
+        frame = {
+            "MessageType": msg_type,
+            "Message": {msg_type: _payload(msg_type, mmsi, rnd)},
+            "MetaData": {
+                "MMSI": mmsi, "ShipName": f"VESSEL {mmsi}",
+                "latitude": 0.0, "longitude": 0.0,
+                "time_utc": "2026-10-17 12:00:00.123456789 +0000 UTC",
+            },
+        }
+        frames.append(json.dumps(frame).encode())
+    return frames
+
+
+def _measure(fn, frames: list, repeat: int) -> float:
+    """Best-of-`repeat` nanoseconds per frame."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        for raw in frames:
+            fn(raw)
+        best = min(best, (time.perf_counter_ns() - started) / len(frames))
+    return best
+
+
+def run(messages: int, repeat: int) -> dict:
+    frames = sample_frames(messages)
+    results = {"messages": messages, "dict_ns_per_msg": _measure(decoder._decode_frame_dict, frames, repeat)}
+    if decoder.msgspec is not None:
+        results["typed_ns_per_msg"] = _measure(decoder._decode_frame_typed, frames, repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = run(args.messages, args.repeat)
+    print(f"dict  (JSON_LOADS + .get): {results['dict_ns_per_msg']:8.0f} ns/msg")
+    if "typed_ns_per_msg" in results:
+        speedup = results["dict_ns_per_msg"] / results["typed_ns_per_msg"]
+        print(f"typed (msgspec structs):   {results['typed_ns_per_msg']:8.0f} ns/msg  ({speedup:.1f}x)")
+    else:
+        print("typed: msgspec not installed")
+
+
+if __name__ == "__main__":
+    main()
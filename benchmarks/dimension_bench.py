@@ -0,0 +1,171 @@
+"""Position write throughput with per-row `ships` triggers vs collector-side ShipDimension.
+
+Both variants write the same synthetic fleet (batched current upserts and
+history COPY, as the collector does) into scratch copies of the tables in
+schema `bench_dimension`, which is dropped afterwards. Needs a local
+PostgreSQL (DB_CONFIG).
+
+Usage:
+    python -m benchmarks.dimension_bench [--messages 200000] [--vessels 20000] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import asyncpg
+
+from benchmarks.ingest_bench import _records, fleet_corpus
+from config import AIS_CURRENT_BATCH_SIZE, AIS_HISTORY_BATCH_SIZE, AIS_SHIPS_REFRESH, DB_CONFIG
+from collector.decoder import PositionReport, decode_batch
+from collector.ship_repository import ShipDimension, copy_history_positions, upsert_ship_positions_batch
+
+SCHEMA = "bench_dimension"
+
+_TABLES = """
+CREATE FUNCTION freshness_bucket(ts TIMESTAMPTZ) RETURNS TIMESTAMPTZ AS $$
+    SELECT date_bin(INTERVAL '10 minutes', ts, TIMESTAMPTZ '2000-01-01 00:00:00+00');
+$$ LANGUAGE sql IMMUTABLE;
+CREATE TABLE ships (
+    ship_id BIGINT PRIMARY KEY,
+    first_seen TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    last_seen TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    last_ship_type SMALLINT
+);
+CREATE TABLE ship_positions_current (
+    ship_id BIGINT PRIMARY KEY REFERENCES ships(ship_id) ON DELETE CASCADE,
+    latitude DOUBLE PRECISION NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    course_over_ground DOUBLE PRECISION,
+    speed_over_ground DOUBLE PRECISION,
+    heading INTEGER,
+    navigational_status INTEGER,
+    rate_of_turn DOUBLE PRECISION,
+    ship_type SMALLINT,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    updated_bucket TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT freshness_bucket(NOW())
+);
+CREATE TABLE ship_positions_history (
+    id BIGSERIAL PRIMARY KEY,
+    ship_id BIGINT NOT NULL REFERENCES ships(ship_id) ON DELETE CASCADE,
+    latitude DOUBLE PRECISION NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    course_over_ground DOUBLE PRECISION,
+    speed_over_ground DOUBLE PRECISION,
+    heading INTEGER,
+    navigational_status INTEGER,
+    rate_of_turn DOUBLE PRECISION,
+    ship_type SMALLINT,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+CREATE INDEX ON ship_positions_history(ship_id);
+CREATE INDEX ON ship_positions_history(timestamp);
+"""
+
+# the per-row triggers as installed by init_postgres.sql before ShipDimension
+_TRIGGERS = """
+CREATE FUNCTION ensure_ship_dimension_row() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO ships (ship_id, first_seen, last_seen, last_ship_type)
+    VALUES (NEW.ship_id, COALESCE(NEW.timestamp, NOW()), COALESCE(NEW.timestamp, NOW()), NEW.ship_type)
+    ON CONFLICT (ship_id) DO UPDATE SET
+        last_seen = GREATEST(ships.last_seen, EXCLUDED.last_seen),
+        last_ship_type = COALESCE(EXCLUDED.last_ship_type, ships.last_ship_type);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER trg_current_ensure_ship BEFORE INSERT OR UPDATE ON ship_positions_current
+FOR EACH ROW EXECUTE FUNCTION ensure_ship_dimension_row();
+CREATE TRIGGER trg_history_ensure_ship BEFORE INSERT ON ship_positions_history
+FOR EACH ROW EXECUTE FUNCTION ensure_ship_dimension_row();
+"""
+
+
+async def _reset(conn: asyncpg.Connection, triggers: bool) -> None:
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA};")
+    await conn.execute(_TABLES)
+    if triggers:
+        await conn.execute(_TRIGGERS)
+
+
+async def _run_variant(records: list, triggers: bool) -> dict:
+    conn = await asyncpg.connect(**DB_CONFIG, server_settings={"search_path": SCHEMA})
+    try:
+        await _reset(conn, triggers)
+        dimension = None if triggers else ShipDimension(AIS_SHIPS_REFRESH)
+        timings = {"current": 0.0, "history": 0.0}
+        rows = {"current": 0, "history": 0}
+
+        for i in range(0, len(records), AIS_HISTORY_BATCH_SIZE):
+            chunk = records[i:i + AIS_HISTORY_BATCH_SIZE]
+            for j in range(0, len(chunk), AIS_CURRENT_BATCH_SIZE):
+                batch = list({r[0]: r for r in chunk[j:j + AIS_CURRENT_BATCH_SIZE]}.values())
+                started = time.perf_counter()
+                if dimension is not None:
+                    await dimension.ensure(conn, batch)
+                await upsert_ship_positions_batch(conn, batch)
+                timings["current"] += time.perf_counter() - started
+                rows["current"] += len(batch)
+
+            started = time.perf_counter()
+            if dimension is not None:
+                await dimension.ensure(conn, chunk)
+            await copy_history_positions(conn, chunk)
+            timings["history"] += time.perf_counter() - started
+            rows["history"] += len(chunk)
+
+        result = {
+            kind: {"rows": rows[kind], "seconds": timings[kind], "rows_per_s": rows[kind] / timings[kind]}
+            for kind in timings if timings[kind]
+        }
+        if dimension is not None:
+            result["ships_upserts"] = dimension.upserts.value
+        return result
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+async def run(messages: int, vessels: int) -> dict:
+    positions = [d for d in decode_batch(fleet_corpus(messages, vessels)) if type(d) is PositionReport]
+    records = _records(positions)
+    results = {
+        "positions": len(records),
+        "vessels": vessels,
+        "trigger": await _run_variant(records, triggers=True),
+        "ship_dimension": await _run_variant(records, triggers=False),
+    }
+    for kind in ("current", "history"):
+        before = results["trigger"].get(kind, {}).get("rows_per_s")
+        after = results["ship_dimension"].get(kind, {}).get("rows_per_s")
+        if before and after:
+            results[f"{kind}_speedup"] = after / before
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--vessels", type=int, default=20000)
+    parser.add_argument("--output", default="-", help="JSON results file ('-' = stdout)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.messages, args.vessels))
+    for kind in ("current", "history"):
+        if f"{kind}_speedup" in results:
+            print(
+                f"{kind:8s} trigger {results['trigger'][kind]['rows_per_s']:10.0f} rows/s  "
+                f"ShipDimension {results['ship_dimension'][kind]['rows_per_s']:10.0f} rows/s  "
+                f"({results[f'{kind}_speedup']:.2f}x)"
+            )
+    payload = json.dumps(results, indent=2)
+    if args.output == "-":
+        print(payload)
+    else:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+
+
+if __name__ == "__main__":
+    main()
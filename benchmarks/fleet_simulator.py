@@ -0,0 +1,339 @@
+"""Synthetic AIS fleet served over a local websocket that speaks the aisstream protocol.
+
+Clients connect, send the usual {"APIKey": ..., "BoundingBoxes": ...}
+subscription and then receive aisstream-shaped frames for the vessels inside
+their boxes. Point the collector at it with AIS_STREAM_URL:
+
+    python -m benchmarks.fleet_simulator --vessels 50000 --rate 5000
+    AIS_STREAM_URL=ws://127.0.0.1:8765 SECRET_KEY_SHIPAPI=dev python -m collector.main
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+from bisect import bisect_right
+from datetime import datetime, timezone
+from itertools import accumulate
+
+import websockets
+from loguru import logger
+
+from collector.decoder import JSON_DUMPS, JSON_LOADS
+
+_KNOTS_TO_DEG_PER_S = 1852 / 3600 / 111320.0
+
+# (lat, lon, spread in degrees): ports and chokepoints for --geo ports
+_HOTSPOTS = (
+    (51.9, 4.1, 1.5), (1.25, 103.8, 1.5), (31.2, 122.0, 2.0), (22.3, 114.2, 1.5),
+    (35.4, 139.8, 1.5), (50.5, 0.5, 1.5), (29.5, -94.5, 2.0), (40.6, -73.9, 1.5),
+    (33.7, -118.3, 1.5), (25.2, 55.3, 1.5), (30.0, 32.5, 1.0), (36.0, -5.6, 1.0),
+    (59.0, 19.0, 3.0), (26.5, 56.5, 1.0), (12.5, 44.0, 2.0), (-34.0, 18.4, 2.0),
+)
+
+# SOLAS navigational status codes
+_UNDER_WAY = 0
+_AT_ANCHOR = 1
+_MOORED = 5
+
+
+class _Vessel:
+    __slots__ = (
+        "mmsi", "class_b", "name", "ship_type", "lat", "lon",
+        "sog", "cog", "status", "updated", "interval",
+    )
+
+
+def _report_interval(v: _Vessel) -> float:
+    """Nominal seconds between position reports (ITU-R M.1371 reporting rates)."""
+    if v.class_b:
+        return 30.0 if v.sog > 2 else 180.0
+    if v.status in (_AT_ANCHOR, _MOORED):
+        return 180.0
+    if v.sog > 23:
+        return 2.0
+    if v.sog > 14:
+        return 6.0
+    return 10.0
+
+
+def _time_utc(now: float) -> str:
+    stamp = datetime.fromtimestamp(now, timezone.utc)
+    return stamp.strftime("%Y-%m-%d %H:%M:%S.") + f"{stamp.microsecond:06d}000 +0000 UTC"
+
+
+def _stochastic_round(x: float, rnd: random.Random) -> int:
+    """Round so that the expected value is x (keeps fractional per-tick rates exact on average)."""
+    n = int(x)
+    return n + (rnd.random() < x - n)
+
+
+def _in_boxes(boxes: list, lat: float, lon: float) -> bool:
+    for (lat_a, lon_a), (lat_b, lon_b) in boxes:
+        if min(lat_a, lat_b) <= lat <= max(lat_a, lat_b) and min(lon_a, lon_b) <= lon <= max(lon_a, lon_b):
+            return True
+    return False
+
+
+class Fleet:
+    """Vessels moving by dead reckoning with occasional course and speed changes.
+
+    Position reports are drawn with probability proportional to each vessel's
+    reporting rate, so fast class A ships dominate the stream as they do live.
+    Static data goes out every ~6 minutes per vessel.
+    """
+
+    def __init__(self, vessels: int, geo: str, rnd: random.Random):
+        self.rnd = rnd
+        self.vessels = [self._new_vessel(200000000 + i, geo) for i in range(vessels)]
+        self.stations = [self._new_station(2000000 + i) for i in range(max(1, vessels // 200))]
+        self._cum_weights = list(accumulate(1.0 / v.interval for v in self.vessels))
+
+    def _new_vessel(self, mmsi: int, geo: str) -> _Vessel:
+        rnd = self.rnd
+        v = _Vessel()
+        v.mmsi = mmsi
+        v.class_b = rnd.random() < 0.3
+        v.name = f"SIM {mmsi}"
+        v.ship_type = rnd.choice((30, 36, 37, 52, 60, 70, 70, 70, 80, 80))
+        if geo == "ports":
+            lat, lon, spread = rnd.choice(_HOTSPOTS)
+            v.lat = max(-85.0, min(85.0, rnd.gauss(lat, spread)))
+            v.lon = (rnd.gauss(lon, spread) + 180.0) % 360.0 - 180.0
+        else:
+            v.lat = math.degrees(math.asin(rnd.uniform(-0.95, 0.95)))
+            v.lon = rnd.uniform(-180.0, 180.0)
+        roll = rnd.random()
+        if roll < 0.25:
+            v.status, v.sog = _MOORED, 0.0
+        elif roll < 0.35:
+            v.status, v.sog = _AT_ANCHOR, round(rnd.uniform(0.0, 0.5), 1)
+        else:
+            v.status, v.sog = _UNDER_WAY, round(rnd.uniform(6.0, 24.0), 1)
+        v.cog = round(rnd.uniform(0.0, 359.9), 1)
+        v.updated = time.time()
+        v.interval = _report_interval(v)
+        return v
+
+    def _new_station(self, mmsi: int) -> tuple:
+        anchor = self.rnd.choice(self.vessels) if self.vessels else None
+        lat = anchor.lat if anchor else 0.0
+        lon = anchor.lon if anchor else 0.0
+        return mmsi, lat, lon
+
+    def _advance(self, v: _Vessel, now: float) -> None:
+        elapsed = now - v.updated
+        v.updated = now
+        if v.status != _UNDER_WAY:
+            return
+        rnd = self.rnd
+        if rnd.random() < 0.05:
+            v.cog = round((v.cog + rnd.gauss(0.0, 15.0)) % 360.0, 1)
+            v.sog = round(max(0.5, min(30.0, v.sog + rnd.gauss(0.0, 0.5))), 1)
+        step = v.sog * _KNOTS_TO_DEG_PER_S * elapsed
+        course = math.radians(v.cog)
+        v.lat = max(-85.0, min(85.0, v.lat + step * math.cos(course)))
+        cos_lat = max(math.cos(math.radians(v.lat)), 0.01)
+        v.lon = (v.lon + step * math.sin(course) / cos_lat + 180.0) % 360.0 - 180.0
+
+    def positions(self, count: int, now: float) -> list:
+        """(lat, lon, frame) for `count` position reports."""
+        total = self._cum_weights[-1]
+        rnd = self.rnd
+        out = []
+        for _ in range(count):
+            v = self.vessels[bisect_right(self._cum_weights, rnd.random() * total) - 1]
+            self._advance(v, now)
+            msg_type = "StandardClassBPositionReport" if v.class_b else "PositionReport"
+            body = {
+                "MessageID": 18 if v.class_b else 1, "UserID": v.mmsi, "Valid": True,
+                "Latitude": round(v.lat, 6), "Longitude": round(v.lon, 6),
+                "Sog": v.sog, "Cog": v.cog,
+                "TrueHeading": 511 if v.class_b else int(v.cog) % 360,
+                "NavigationalStatus": v.status, "RateOfTurn": 0,
+                "PositionAccuracy": True, "Timestamp": int(now) % 60,
+            }
+            out.append((v.lat, v.lon, self._frame(msg_type, body, v, now)))
+        return out
+
+    def statics(self, count: int, now: float) -> list:
+        out = []
+        for v in self.rnd.sample(self.vessels, min(count, len(self.vessels))):
+            if v.class_b:
+                msg_type = "StaticDataReport"
+                body = {
+                    "MessageID": 24, "UserID": v.mmsi, "Valid": True, "PartNumber": True,
+                    "ReportA": {"Valid": False, "Name": ""},
+                    "ReportB": {"Valid": True, "ShipType": v.ship_type, "CallSign": "SIM"},
+                }
+            else:
+                msg_type = "ShipStaticData"
+                body = {
+                    "MessageID": 5, "UserID": v.mmsi, "Valid": True, "Name": f"{v.name:<20}",
+                    "Type": v.ship_type, "CallSign": "SIM", "Destination": "NOWHERE",
+                }
+            out.append((v.lat, v.lon, self._frame(msg_type, body, v, now)))
+        return out
+
+    def station_reports(self, count: int, now: float) -> list:
+        out = []
+        for mmsi, lat, lon in self.rnd.sample(self.stations, min(count, len(self.stations))):
+            body = {"MessageID": 4, "UserID": mmsi, "Valid": True, "Latitude": lat, "Longitude": lon, "FixType": 1}
+            frame = JSON_DUMPS({
+                "MessageType": "BaseStationReport",
+                "Message": {"BaseStationReport": body},
+                "MetaData": {"MMSI": mmsi, "ShipName": "", "latitude": lat, "longitude": lon,
+                             "time_utc": _time_utc(now)},
+            })
+            out.append((lat, lon, frame))
+        return out
+
+    @staticmethod
+    def _frame(msg_type: str, body: dict, v: _Vessel, now: float) -> str:
+        return JSON_DUMPS({
+            "MessageType": msg_type,
+            "Message": {msg_type: body},
+            "MetaData": {
+                "MMSI": v.mmsi, "ShipName": v.name, "latitude": v.lat, "longitude": v.lon,
+                "time_utc": _time_utc(now),
+            },
+        })
+
+
+_GARBAGE = (
+    '{"MessageType": "PositionReport", "Message": {"PositionReport": {"UserID": 1, "Latitude": 91, "Longitude": 181}}}',
+    '{"MessageType": "UnknownMessage", "Message": {}}',
+    '{"MessageType": "PositionReport", "Message": ',
+    'not json at all',
+)
+
+
+class Subscriber:
+    def __init__(self, websocket, boxes: list, queue_size: int):
+        self.websocket = websocket
+        self.boxes = boxes
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, frame: str) -> None:
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+
+class FleetServer:
+    """Generate the fleet's traffic in ticks and fan it out to subscribers."""
+
+    def __init__(self, fleet: Fleet, rate: float, duplicates: float, garbage: float,
+                 api_key: str = "", tick: float = 0.05, queue_size: int = 100000):
+        self.fleet = fleet
+        self.rate = rate
+        self.duplicates = duplicates
+        self.garbage = garbage
+        self.api_key = api_key
+        self.tick = tick
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.sent = 0
+
+    async def handle(self, websocket, path=None) -> None:
+        try:
+            sub = JSON_LOADS(await asyncio.wait_for(websocket.recv(), timeout=10))
+            boxes = sub["BoundingBoxes"]
+            key = sub.get("APIKey")
+            if not key or (self.api_key and key != self.api_key):
+                raise ValueError("Api Key Is Not Valid")
+        except Exception as e:
+            await websocket.send(JSON_DUMPS({"error": f"subscription rejected: {e}"}))
+            return
+
+        subscriber = Subscriber(websocket, boxes, self.queue_size)
+        self.subscribers.add(subscriber)
+        logger.info(f"Subscriber connected with {len(boxes)} box(es)")
+        try:
+            while True:
+                await websocket.send(await subscriber.queue.get())
+                self.sent += 1
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.subscribers.discard(subscriber)
+            logger.info(f"Subscriber disconnected ({subscriber.dropped} frames dropped as too slow)")
+
+    async def generate(self) -> None:
+        fleet = self.fleet
+        rnd = fleet.rnd
+        vessels = len(fleet.vessels)
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self.tick
+            now = time.time()
+            # static data every ~6 min per vessel, base stations every 10 s
+            statics = vessels * self.tick / 360.0
+            stations = len(fleet.stations) * self.tick / 10.0
+            positions = max(0.0, self.rate * self.tick - statics - stations)
+
+            frames = fleet.positions(_stochastic_round(positions, rnd), now)
+            frames += fleet.statics(_stochastic_round(statics, rnd), now)
+            frames += fleet.station_reports(_stochastic_round(stations, rnd), now)
+            rnd.shuffle(frames)
+            if self.subscribers:
+                self._fan_out(frames, rnd)
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+
+    def _fan_out(self, frames: list, rnd: random.Random) -> None:
+        subscribers = self.subscribers
+        for lat, lon, frame in frames:
+            copies = 2 if rnd.random() < self.duplicates else 1
+            for sub in subscribers:
+                if _in_boxes(sub.boxes, lat, lon):
+                    for _ in range(copies):
+                        sub.offer(frame)
+            if rnd.random() < self.garbage:
+                junk = rnd.choice(_GARBAGE)
+                for sub in subscribers:
+                    sub.offer(junk)
+
+    async def report(self, interval: float = 5.0) -> None:
+        last = 0
+        while True:
+            await asyncio.sleep(interval)
+            logger.info(
+                f"{(self.sent - last) / interval:.0f} frames/s sent | "
+                f"subscribers: {len(self.subscribers)} | vessels: {len(self.fleet.vessels)}"
+            )
+            last = self.sent
+
+
+async def serve(args) -> None:
+    fleet = Fleet(args.vessels, args.geo, random.Random(args.seed))
+    server = FleetServer(fleet, args.rate, args.duplicates, args.garbage, args.api_key)
+    async with websockets.serve(server.handle, args.host, args.port, max_queue=None):
+        logger.info(
+            f"Simulating {args.vessels} vessels at ~{args.rate:.0f} msg/s on ws://{args.host}:{args.port}"
+        )
+        await asyncio.gather(server.generate(), server.report())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--vessels", type=int, default=20000, help="fleet size")
+    parser.add_argument("--rate", type=float, default=1000, help="total frames per second before duplicates")
+    parser.add_argument("--geo", choices=("ports", "uniform"), default="ports",
+                        help="cluster vessels around major ports or spread them over the globe")
+    parser.add_argument("--duplicates", type=float, default=0.05, help="share of frames sent twice")
+    parser.add_argument("--garbage", type=float, default=0.001, help="share of invalid frames mixed in")
+    parser.add_argument("--api-key", default="", help="accept only this APIKey (default: any non-empty key)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""Collector ingest benchmark: per-stage throughput and latency as JSON.
+
+Stages:
+    decode    raw frame -> PositionReport/...: stdlib json, orjson, msgspec structs
+    throttle  `_maybe_save_position` in delta and predictive mode, in-memory sinks
+    db        local PostgreSQL: per-row save_ship_position (benchmarks.legacy_writes)
+              / save_ais_station vs the batched upserts and COPY used by the
+              collector's buffers
+
+The corpus is a synthetic fleet (see benchmarks.fleet_simulator) on a simulated
+clock, or recorded segments (collector.recorder). The db stage writes synthetic
+rows into the configured database (DB_CONFIG), so point it at a scratch one.
+
+Usage:
+    python -m benchmarks.ingest_bench [--messages 100000] [--corpus SEGMENT_OR_DIR ...]
+        [--stages decode,throttle,db] [--db-rows 5000] [--output results.json]
+        [--baseline previous.json]
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import asyncpg
+
+from benchmarks.fleet_simulator import Fleet, _stochastic_round
+from benchmarks.legacy_writes import save_ship_position
+from config import (
+    AIS_CURRENT_BATCH_SIZE,
+    AIS_HISTORY_BATCH_SIZE,
+    AIS_SHIPS_REFRESH,
+    AIS_STATION_BATCH_SIZE,
+    DB_CONFIG,
+)
+from collector import ais_client, decoder
+from collector.decoder import PositionReport, StationReport
+from collector.recorder import read_segment, segment_paths
+from collector.ship_repository import (
+    ShipDimension,
+    copy_history_positions,
+    upsert_ship_positions_batch,
+)
+from collector.station_repository import save_ais_station, upsert_ais_stations_batch
+from collector.vessel_state import VesselStateStore
+
+STAGES = ("decode", "throttle", "db")
+
+# a stage variant counts as regressed when its throughput drops below this share of the baseline
+_REGRESSION_RATIO = 0.9
+
+
+def fleet_corpus(messages: int, vessels: int = 20000, rate: float = 2000.0, seed: int = 1) -> list:
+    """Synthetic frames for `messages` reports of a moving fleet, timed as if sent at `rate` msg/s."""
+    rnd = random.Random(seed)
+    fleet = Fleet(vessels, "ports", rnd)
+    tick = 0.05
+    now = time.time() - messages / rate
+    for v in fleet.vessels:
+        v.updated = now
+    frames = []
+    while len(frames) < messages:
+        now += tick
+        statics = len(fleet.vessels) * tick / 360.0
+        stations = len(fleet.stations) * tick / 10.0
+        positions = max(0.0, rate * tick - statics - stations)
+        batch = fleet.positions(_stochastic_round(positions, rnd), now)
+        batch += fleet.statics(_stochastic_round(statics, rnd), now)
+        batch += fleet.station_reports(_stochastic_round(stations, rnd), now)
+        rnd.shuffle(batch)
+        frames.extend(frame for _, _, frame in batch)
+    return frames[:messages]
+
+
+def recorded_corpus(paths: list, messages: int) -> list:
+    frames = []
+    for path in segment_paths(paths):
+        for _, frame in read_segment(path):
+            frames.append(frame)
+            if len(frames) >= messages:
+                return frames
+    return frames
+
+
+def _summary(samples_ns: list, rows: int = 0) -> dict:
+    """Throughput and latency percentiles from per-call durations."""
+    if not samples_ns:
+        return {"calls": 0}
+    ordered = sorted(samples_ns)
+    total = sum(ordered)
+    calls = len(ordered)
+    result = {
+        "calls": calls,
+        "per_s": calls / (total / 1e9) if total else 0.0,
+        "mean_us": total / calls / 1000,
+        "p50_us": ordered[calls // 2] / 1000,
+        "p99_us": ordered[min(calls - 1, int(calls * 0.99))] / 1000,
+    }
+    if rows:
+        result["rows"] = rows
+        result["rows_per_s"] = rows / (total / 1e9) if total else 0.0
+    return result
+
+
+def _time_calls(fn, items) -> list:
+    perf = time.perf_counter_ns
+    samples = []
+    for item in items:
+        started = perf()
+        try:
+            fn(item)
+        except Exception:
+            pass
+        samples.append(perf() - started)
+    return samples
+
+
+def bench_decode(frames: list) -> dict:
+    variants = {"stdlib": lambda raw: decoder.decode_message(json.loads(raw))}
+    if decoder.JSON_LOADS is not json.loads:
+        variants["orjson"] = decoder._decode_frame_dict
+    if decoder.msgspec is not None:
+        variants["msgspec"] = decoder._decode_frame_typed
+    results = {}
+    for name, fn in variants.items():
+        _time_calls(fn, frames[:1000])
+        results[name] = _summary(_time_calls(fn, frames))
+    return results
+
+
+class _NullSink:
+    def __init__(self):
+        self.rows = 0
+
+    async def add(self, record: tuple) -> None:
+        self.rows += 1
+
+
+async def _bench_throttle_mode(positions: list, mode: str) -> dict:
+    store = VesselStateStore(ttl=float("inf"), max_vessels=len(positions) + 1)
+    current, history = _NullSink(), _NullSink()
+    saved_mode = ais_client.AIS_THROTTLE_MODE
+    ais_client.AIS_THROTTLE_MODE = mode
+    perf = time.perf_counter_ns
+    samples = []
+    try:
+        for pos in positions:
+            state = store.touch(pos.mmsi)
+            started = perf()
+            await ais_client._maybe_save_position(current, history, pos, state)
+            samples.append(perf() - started)
+    finally:
+        ais_client.AIS_THROTTLE_MODE = saved_mode
+    result = _summary(samples)
+    result["current_rows"] = current.rows
+    result["history_rows"] = history.rows
+    result["written_share"] = current.rows / len(positions) if positions else 0.0
+    return result
+
+
+async def bench_throttle(positions: list) -> dict:
+    return {mode: await _bench_throttle_mode(positions, mode) for mode in ("delta", "predictive")}
+
+
+def _ship_data(pos: PositionReport) -> dict:
+    return {
+        "UserID": pos.mmsi, "Latitude": pos.latitude, "Longitude": pos.longitude,
+        "Cog": pos.course, "Sog": pos.speed, "TrueHeading": pos.heading,
+        "NavigationalStatus": pos.navigational_status, "RateOfTurn": pos.rate_of_turn,
+        "ShipType": pos.ship_type,
+    }
+
+
+def _records(positions: list) -> list:
+    return [
+        (p.mmsi, p.latitude, p.longitude, p.course, p.speed, p.heading, p.navigational_status,
+         p.rate_of_turn, p.ship_type,
+         datetime.fromtimestamp(p.event_time if p.event_time is not None else time.time(), timezone.utc))
+        for p in positions
+    ]
+
+
+async def _timed_batches(pool, write, batches: list) -> dict:
+    perf = time.perf_counter_ns
+    samples = []
+    for batch in batches:
+        started = perf()
+        async with pool.acquire() as conn:
+            await write(conn, batch)
+        samples.append(perf() - started)
+    return _summary(samples, rows=sum(len(b) for b in batches))
+
+
+async def bench_db(positions: list, stations: list, rows: int) -> dict:
+    try:
+        pool = await asyncpg.create_pool(**DB_CONFIG, min_size=1, max_size=2)
+    except Exception as e:
+        return {"skipped": f"{type(e).__name__}: {e}"}
+
+    positions = positions[:rows]
+    records = _records(positions)
+    perf = time.perf_counter_ns
+    results = {}
+    try:
+        # the legacy writes relied on a trigger for `ships` rows; create them untimed
+        async with pool.acquire() as conn:
+            await ShipDimension(AIS_SHIPS_REFRESH).ensure(conn, records)
+
+        samples = []
+        for pos in positions:
+            started = perf()
+            await save_ship_position(pool, _ship_data(pos), save_history=True)
+            samples.append(perf() - started)
+        results["save_ship_position"] = _summary(samples, rows=2 * len(samples))
+
+        samples = []
+        for st in stations[:rows]:
+            started = perf()
+            await save_ais_station(
+                pool, mmsi=st.mmsi, kind=st.kind, latitude=st.latitude, longitude=st.longitude,
+                name=st.name, type_code=st.type_code,
+            )
+            samples.append(perf() - started)
+        results["save_ais_station"] = _summary(samples, rows=len(samples))
+
+        station_rows = [
+            (st.mmsi, st.kind, st.name, st.latitude, st.longitude, st.type_code, datetime.now(timezone.utc))
+            for st in stations[:rows]
+        ]
+        station_batches = []
+        for i in range(0, len(station_rows), AIS_STATION_BATCH_SIZE):
+            coalesced = {r[0]: r for r in station_rows[i:i + AIS_STATION_BATCH_SIZE]}
+            station_batches.append(list(coalesced.values()))
+        results["station_batch_upsert"] = await _timed_batches(pool, upsert_ais_stations_batch, station_batches)
+
+        # the buffers keep the ships dimension up to date before each write, as in the collector
+        dimension = ShipDimension(AIS_SHIPS_REFRESH)
+
+        def with_dimension(write):
+            async def wrapped(conn, batch):
+                await dimension.ensure(conn, batch)
+                await write(conn, batch)
+            return wrapped
+
+        # the current buffer coalesces by ship_id before each flush
+        current_batches = []
+        for i in range(0, len(records), AIS_CURRENT_BATCH_SIZE):
+            coalesced = {r[0]: r for r in records[i:i + AIS_CURRENT_BATCH_SIZE]}
+            current_batches.append(list(coalesced.values()))
+        results["current_batch_upsert"] = await _timed_batches(
+            pool, with_dimension(upsert_ship_positions_batch), current_batches
+        )
+
+        history_batches = [records[i:i + AIS_HISTORY_BATCH_SIZE] for i in range(0, len(records), AIS_HISTORY_BATCH_SIZE)]
+        results["history_copy"] = await _timed_batches(
+            pool, with_dimension(copy_history_positions), history_batches
+        )
+    finally:
+        await pool.close()
+    return results
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+async def run(frames: list, stages: tuple, db_rows: int, corpus: str) -> dict:
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "orjson": decoder.JSON_LOADS is not json.loads,
+            "msgspec": decoder.msgspec is not None,
+            "corpus": corpus,
+            "frames": len(frames),
+        },
+        "stages": {},
+    }
+    decoded = decoder.decode_batch(frames)
+    positions = [d for d in decoded if type(d) is PositionReport]
+    stations = [d for d in decoded if type(d) is StationReport]
+    if "decode" in stages:
+        results["stages"]["decode"] = bench_decode(frames)
+    if "throttle" in stages:
+        results["stages"]["throttle"] = await bench_throttle(positions)
+    if "db" in stages:
+        results["stages"]["db"] = await bench_db(positions, stations, db_rows)
+    return results
+
+
+def _throughput(variant: dict) -> float:
+    return variant.get("rows_per_s", variant.get("per_s", 0.0))
+
+
+def report(results: dict, baseline: dict = None) -> list:
+    """Print one line per stage variant to stderr; returns the names of regressed variants."""
+    regressions = []
+    for stage, variants in results["stages"].items():
+        if "skipped" in variants:
+            print(f"{stage}: skipped ({variants['skipped']})", file=sys.stderr)
+            continue
+        for name, v in variants.items():
+            line = (
+                f"{stage:8s} {name:22s} {_throughput(v):12.0f}/s  "
+                f"mean {v.get('mean_us', 0):8.1f} us  p50 {v.get('p50_us', 0):8.1f} us  p99 {v.get('p99_us', 0):8.1f} us"
+            )
+            if "written_share" in v:
+                line += f"  written {v['written_share']:.0%}"
+            old = (baseline or {}).get("stages", {}).get(stage, {}).get(name)
+            if old and _throughput(old):
+                ratio = _throughput(v) / _throughput(old)
+                line += f"  {ratio:5.2f}x vs baseline"
+                if ratio < _REGRESSION_RATIO:
+                    line += "  REGRESSION"
+                    regressions.append(f"{stage}.{name}")
+            print(line, file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--vessels", type=int, default=20000, help="synthetic fleet size")
+    parser.add_argument("--corpus", nargs="+", help="recorded segments or directories instead of the synthetic fleet")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated subset of {STAGES}")
+    parser.add_argument("--db-rows", type=int, default=5000, help="positions written per DB variant")
+    parser.add_argument("--output", default="-", help="JSON results file ('-' = stdout)")
+    parser.add_argument("--baseline", help="earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    stages = tuple(s.strip() for s in args.stages.split(",") if s.strip())
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    if args.corpus:
+        frames = recorded_corpus(args.corpus, args.messages)
+        corpus = "recorded:" + ",".join(args.corpus)
+    else:
+        frames = fleet_corpus(args.messages, args.vessels)
+        corpus = f"synthetic:{args.vessels} vessels"
+
+    results = asyncio.run(run(frames, stages, args.db_rows, corpus))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = report(results, baseline)
+
+    payload = json.dumps(results, indent=2)
+    if args.output == "-":
+        print(payload)
+    else:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+    if regressions:
+        print(f"Regressed vs baseline: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
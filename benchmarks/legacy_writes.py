@@ -0,0 +1,112 @@
+"""Per-row position writes as the collector did them before batching (the ingest_bench baseline).
+
+Kept here verbatim so benchmarks.ingest_bench can time the original path; the
+collector itself writes through the batched buffers in collector.ship_repository.
+The `ships` rows these writes need used to come from the per-row
+ensure_ship_dimension_row trigger; ingest_bench creates them untimed beforehand
+and benchmarks.dimension_bench measures the trigger cost separately.
+"""
+import asyncpg
+from datetime import datetime, timezone
+from loguru import logger
+
+
+async def upsert_ship_position(conn: asyncpg.Connection, ship_data: dict):
+    """UPSERT current ship position"""
+    ship_id = ship_data.get('UserID')
+    latitude = ship_data.get('Latitude')
+    longitude = ship_data.get('Longitude')
+    
+    course_over_ground = ship_data.get('Cog', None)
+    speed_over_ground = ship_data.get('Sog', None)
+    true_heading = ship_data.get('TrueHeading', None)
+    heading = None if (true_heading is None or true_heading == 511) else true_heading
+    
+    navigational_status = ship_data.get('NavigationalStatus')
+    rate_of_turn = ship_data.get('RateOfTurn')
+    ship_type = ship_data.get('ShipType')
+    if ship_type is not None:
+        try:
+            ship_type = int(ship_type)
+        except (TypeError, ValueError):
+            ship_type = None
+    timestamp = datetime.now(timezone.utc)
+
+    upsert_query = """
+        INSERT INTO ship_positions_current (
+            ship_id, latitude, longitude, course_over_ground,
+            speed_over_ground, heading, navigational_status,
+            rate_of_turn, ship_type, timestamp, updated_at
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+        ON CONFLICT (ship_id)
+        DO UPDATE SET
+            latitude = EXCLUDED.latitude,
+            longitude = EXCLUDED.longitude,
+            course_over_ground = EXCLUDED.course_over_ground,
+            speed_over_ground = EXCLUDED.speed_over_ground,
+            heading = EXCLUDED.heading,
+            navigational_status = EXCLUDED.navigational_status,
+            rate_of_turn = EXCLUDED.rate_of_turn,
+            ship_type = COALESCE(EXCLUDED.ship_type, ship_positions_current.ship_type),
+            timestamp = EXCLUDED.timestamp,
+            updated_at = EXCLUDED.updated_at
+    """
+
+    await conn.execute(
+        upsert_query,
+        ship_id, latitude, longitude, course_over_ground,
+        speed_over_ground, heading, navigational_status,
+        rate_of_turn, ship_type, timestamp, timestamp,
+    )
+
+
+async def insert_history_position(conn: asyncpg.Connection, ship_data: dict):
+    """Insert position into history"""
+    ship_id = ship_data.get('UserID')
+    latitude = ship_data.get('Latitude')
+    longitude = ship_data.get('Longitude')
+    
+    # Правильные названия полей в AIS API: Sog, Cog, TrueHeading
+    course_over_ground = ship_data.get('Cog', None)
+    speed_over_ground = ship_data.get('Sog', None)
+    true_heading = ship_data.get('TrueHeading', None)
+    # TrueHeading = 511 означает "недоступно" в AIS
+    heading = None if (true_heading is None or true_heading == 511) else true_heading
+    
+    navigational_status = ship_data.get('NavigationalStatus')
+    rate_of_turn = ship_data.get('RateOfTurn')
+    ship_type = ship_data.get('ShipType')
+    if ship_type is not None:
+        try:
+            ship_type = int(ship_type)
+        except (TypeError, ValueError):
+            ship_type = None
+    timestamp = datetime.now(timezone.utc)
+
+    insert_query = """
+        INSERT INTO ship_positions_history (
+            ship_id, latitude, longitude, course_over_ground,
+            speed_over_ground, heading, navigational_status,
+            rate_of_turn, ship_type, timestamp
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+    """
+
+    await conn.execute(
+        insert_query,
+        ship_id, latitude, longitude, course_over_ground,
+        speed_over_ground, heading, navigational_status,
+        rate_of_turn, ship_type, timestamp,
+    )
+
+
+async def save_ship_position(pool, ship_data: dict, save_history: bool = False):
+    """Save ship position to database (UPSERT + optionally history)"""
+    try:
+        async with pool.acquire() as conn:
+            await upsert_ship_position(conn, ship_data)
+            
+            if save_history:
+                await insert_history_position(conn, ship_data)
+    except Exception as e:
+        logger.error(f"Error saving to database: {e}")
+
@@ -0,0 +1,227 @@
+"""Trail query plans and latency at scale: B-tree vs BRIN on history timestamp.
+
+Loads a synthetic history (default 100M rows, daily partitions) into scratch
+schema `bench_trails`, then runs app.database.TRAILS_QUERY on
+    old     the previous (ship_id) and (timestamp) B-trees
+    new     (ship_id) and BRIN (timestamp)
+and reports median latency, EXPLAIN (ANALYZE, BUFFERS) summaries and index sizes
+as JSON. NOW() in the query is pinned to the end of the synthetic data, so
+both variants see the same window however long loading and index builds take.
+Needs a local PostgreSQL (DB_CONFIG) with room for the data; the schema is
+dropped afterwards unless --keep is given.
+
+Trails are `--vessels` fleets with rows spread evenly: 50000 vessels over
+7 days is ~6 points per vessel in 30 minutes (sparse), 2000 vessels ~150
+(dense, as moving ships written every few seconds).
+
+Usage:
+    python -m benchmarks.trail_query_bench [--rows 100000000] [--vessels 50000] [--days 7]
+        [--minutes 30] [--points 80] [--repeat 5] [--output results.json] [--keep]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+
+from app.database import TRAILS_QUERY
+from config import DB_CONFIG
+
+SCHEMA = "bench_trails"
+_CHUNK_ROWS = 5_000_000
+_SHIP_ID_BASE = 200_000_000
+
+_TABLES = """
+CREATE TABLE ship_positions_history (
+    id BIGSERIAL,
+    ship_id BIGINT NOT NULL,
+    latitude DOUBLE PRECISION NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    course_over_ground DOUBLE PRECISION,
+    speed_over_ground DOUBLE PRECISION,
+    heading INTEGER,
+    navigational_status INTEGER,
+    rate_of_turn DOUBLE PRECISION,
+    ship_type SMALLINT,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+CREATE TABLE ship_positions_history_default PARTITION OF ship_positions_history DEFAULT;
+"""
+
+_OLD_INDEX = "CREATE INDEX idx_history_timestamp ON ship_positions_history(timestamp)"
+_NEW_INDEX = (
+    "CREATE INDEX idx_history_timestamp_brin ON ship_positions_history "
+    "USING BRIN (timestamp) WITH (pages_per_range = 32)"
+)
+
+
+def _log(message: str) -> None:
+    print(message, file=sys.stderr, flush=True)
+
+
+async def _load(conn: asyncpg.Connection, rows: int, vessels: int, days: int) -> datetime:
+    """Load the scratch schema; returns the timestamp of the newest history row."""
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA};")
+    await conn.execute(_TABLES)
+
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=days)
+    day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day <= end:
+        await conn.execute(
+            f"CREATE TABLE ship_positions_history_p{day:%Y%m%d} PARTITION OF ship_positions_history "
+            f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+        )
+        day += timedelta(days=1)
+
+    # rows are spread evenly over the period in time order, as the collector appends them
+    step = (end - start) / rows
+    for lo in range(0, rows, _CHUNK_ROWS):
+        hi = min(rows, lo + _CHUNK_ROWS) - 1
+        started = time.monotonic()
+        await conn.execute(
+            """
+            INSERT INTO ship_positions_history (ship_id, latitude, longitude, speed_over_ground, timestamp)
+            SELECT $1::bigint + g % $2::bigint, random() * 170 - 85, random() * 360 - 180, random() * 20,
+                   $3::timestamptz + g * $4::interval
+            FROM generate_series($5::bigint, $6::bigint) AS g
+            """,
+            _SHIP_ID_BASE, vessels, start, step, lo, hi,
+        )
+        _log(f"loaded {hi + 1}/{rows} rows ({time.monotonic() - started:.0f}s)")
+    await conn.execute("CREATE INDEX idx_history_ship_id ON ship_positions_history(ship_id)")
+    await conn.execute("VACUUM (ANALYZE) ship_positions_history")
+    return end
+
+
+async def _index_sizes(conn: asyncpg.Connection, names: tuple) -> dict:
+    sizes = {}
+    for name in names:
+        # partitioned indexes have no storage of their own: sum their partitions
+        sizes[name] = await conn.fetchval(
+            """
+            SELECT COALESCE(SUM(pg_relation_size(i.inhrelid)), 0)::bigint
+            FROM pg_inherits i
+            WHERE i.inhparent = $1::regclass
+            """,
+            name,
+        )
+    return sizes
+
+
+def _plan_summary(plan: dict) -> dict:
+    nodes = []
+
+    def walk(node, depth=0):
+        if len(nodes) < 12:
+            label = node["Node Type"]
+            if "Index Name" in node:
+                label += f" using {node['Index Name']}"
+            nodes.append("  " * depth + label)
+        for child in node.get("Plans", ()):
+            walk(child, depth + 1)
+
+    walk(plan["Plan"])
+    return {
+        "execution_ms": plan["Execution Time"],
+        "planning_ms": plan["Planning Time"],
+        "shared_hit_blocks": plan["Plan"].get("Shared Hit Blocks"),
+        "shared_read_blocks": plan["Plan"].get("Shared Read Blocks"),
+        "rows": plan["Plan"]["Actual Rows"],
+        "nodes": nodes,
+    }
+
+
+def _pinned(query: str) -> str:
+    """The query with NOW() taken from parameter $3."""
+    return query.replace("NOW()", "$3::timestamptz")
+
+
+async def _measure(conn: asyncpg.Connection, query: str, minutes: int, points: int, repeat: int,
+                   now: datetime) -> dict:
+    query = _pinned(query)
+    await conn.fetch(query, minutes, points, now)  # warm the cache
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = await conn.fetch(query, minutes, points, now)
+        samples.append((time.perf_counter() - started) * 1000)
+    explained = await conn.fetchval(
+        "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query.strip().rstrip(";"), minutes, points, now
+    )
+    return {
+        "rows": len(rows),
+        "median_ms": statistics.median(samples),
+        "max_ms": max(samples),
+        "plan": _plan_summary(json.loads(explained)[0]),
+    }
+
+
+async def _variant(conn: asyncpg.Connection, index: str, name: str, minutes: int, points: int,
+                   repeat: int, now: datetime) -> dict:
+    started = time.monotonic()
+    await conn.execute(index)
+    build_s = time.monotonic() - started
+    await conn.execute("ANALYZE ship_positions_history")
+    result = await _measure(conn, TRAILS_QUERY, minutes, points, repeat, now)
+    result["index_build_s"] = build_s
+    result["index_bytes"] = await _index_sizes(conn, ("idx_history_ship_id", name))
+    return result
+
+
+async def run(rows: int, vessels: int, days: int, minutes: int, points: int, repeat: int, keep: bool) -> dict:
+    conn = await asyncpg.connect(**DB_CONFIG, server_settings={"search_path": SCHEMA})
+    try:
+        end = await _load(conn, rows, vessels, days)
+        results = {"rows": rows, "vessels": vessels, "days": days, "minutes": minutes, "points": points}
+
+        _log("B-tree on timestamp")
+        results["old"] = await _variant(conn, _OLD_INDEX, "idx_history_timestamp", minutes, points, repeat, end)
+        await conn.execute("DROP INDEX idx_history_timestamp")
+
+        _log("BRIN on timestamp")
+        results["new"] = await _variant(
+            conn, _NEW_INDEX, "idx_history_timestamp_brin", minutes, points, repeat, end
+        )
+        results["speedup"] = results["old"]["median_ms"] / results["new"]["median_ms"]
+        return results
+    finally:
+        if not keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000_000)
+    parser.add_argument("--vessels", type=int, default=50000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--minutes", type=int, default=30, help="trail window, as /api/trails?minutes=")
+    parser.add_argument("--points", type=int, default=80, help="points per ship, as the API uses")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="-", help="JSON results file ('-' = stdout)")
+    parser.add_argument("--keep", action="store_true", help=f"keep schema {SCHEMA} for manual EXPLAINs")
+    args = parser.parse_args()
+
+    results = asyncio.run(
+        run(args.rows, args.vessels, args.days, args.minutes, args.points, args.repeat, args.keep)
+    )
+    _log(
+        f"B-tree {results['old']['median_ms']:.1f} ms | BRIN {results['new']['median_ms']:.1f} ms "
+        f"({results['speedup']:.2f}x)"
+    )
+    payload = json.dumps(results, indent=2)
+    if args.output == "-":
+        print(payload)
+    else:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+
+
+if __name__ == "__main__":
+    main()
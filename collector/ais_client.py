@@ -1,20 +1,46 @@
+import asyncio
+import math
+import random
+import time
 import websockets
 from datetime import datetime, timezone
+from typing import Optional
 from loguru import logger
 
-try:
-    import orjson as json
-    JSON_LOADS = json.loads
-    JSON_DUMPS = lambda x: json.dumps(x).decode('utf-8')
-except ImportError:
-    import json
-    JSON_LOADS = json.loads
-    JSON_DUMPS = json.dumps
-    logger.warning("orjson not installed, using standard json library. Install orjson for better performance.")
-
-from config import AIS_API_KEY, AIS_STREAM_URL, AIS_BOUNDING_BOXES, AIS_LOG_STATS_INTERVAL, AIS_LOG_DETAILED
-from collector.ship_repository import save_ship_position
-from collector.station_repository import save_ais_station
+from config import (
+    AIS_API_KEY, AIS_STREAM_URL, AIS_BOUNDING_BOXES, AIS_LOG_STATS_INTERVAL, AIS_LOG_DETAILED,
+    AIS_CURRENT_BATCH_SIZE, AIS_CURRENT_FLUSH_INTERVAL, AIS_CURRENT_BUFFER_MAX,
+    AIS_HISTORY_BATCH_SIZE, AIS_HISTORY_FLUSH_INTERVAL, AIS_HISTORY_BUFFER_MAX, AIS_HISTORY_MAX_RETRIES,
+    AIS_HISTORY_PARTITIONS_AHEAD, AIS_HISTORY_RETENTION_DAYS, AIS_PARTITION_MAINTENANCE_INTERVAL,
+    AIS_WRITER_COUNT, AIS_QUEUE_MAXSIZE, AIS_QUEUE_POLICY,
+    AIS_RECONNECT_MIN_DELAY, AIS_RECONNECT_MAX_DELAY, AIS_STALL_TIMEOUT, AIS_SHARD_COUNT,
+    AIS_DECODE_WORKERS, AIS_DECODE_BATCH_SIZE, AIS_DECODE_BATCH_DELAY,
+    AIS_VESSEL_TTL, AIS_VESSEL_MAX,
+    AIS_REGISTRY_BATCH_SIZE, AIS_REGISTRY_FLUSH_INTERVAL, AIS_REGISTRY_BUFFER_MAX, AIS_REGISTRY_REFRESH,
+    AIS_THROTTLE_MODE, AIS_THROTTLE_MAX_AGE, AIS_DR_TOLERANCE_M,
+    AIS_TRAIL_TOLERANCE_M, AIS_TRAIL_MAX_DELAY, AIS_TRAIL_MAX_POINTS,
+    AIS_RECORD_DIR, AIS_RECORD_SEGMENT_SECONDS,
+    AIS_SHIPS_REFRESH,
+    AIS_STATION_BATCH_SIZE, AIS_STATION_FLUSH_INTERVAL, AIS_STATION_BUFFER_MAX, AIS_STATION_REFRESH,
+    AIS_METRICS_HOST, AIS_METRICS_PORT,
+    POSITIONS_FEED_CHANNEL,
+)
+from collector.change_feed import PositionFeed
+from collector.decoder import (
+    JSON_DUMPS, PositionReport, StaticReport, StationReport, decode_batch, decode_frame,
+)
+from collector.metrics import counter, histogram, serve_metrics
+from collector.pipeline import (
+    MESSAGES, MESSAGES_IGNORED, QUEUE_DROPPED, PartitionedWriters, ProcessDecodeStage,
+)
+from collector.ship_repository import (
+    CurrentPositionBuffer, HistoryPartitionMaintenance, HistorySink, ShipDimension, VesselRegistryBuffer,
+    load_vessel_registry,
+)
+from collector.recorder import StreamRecorder
+from collector.station_repository import StationWriter
+from collector.trajectory import TRAIL_POINTS_IN, TRAIL_POINTS_OUT, TrajectorySimplifier
+from collector.vessel_state import VESSELS_BYTES, VesselState, VesselStateStore
 from collector.db_pool import init_db_pool, close_db_pool
 
 logger.remove()
@@ -26,261 +52,551 @@ logger.add(
     colorize=False
 )
 
-_POSITION_KEYS = {
-    "PositionReport": "PositionReport",
-    "ExtendedClassBPositionReport": "ExtendedClassBPositionReport",
-    "StandardClassBPositionReport": "StandardClassBPositionReport",
-}
-
-
-def _remember_ship_type(mmsi, inner: dict, ship_types: dict) -> None:
-    t = inner.get("ShipType")
-    if t is None:
-        t = inner.get("Type")
-    if mmsi is not None and t is not None:
-        try:
-            ship_types[mmsi] = int(t)
-        except (TypeError, ValueError):
-            pass
-
-
-def _merge_type_into_row(mmsi: int, inner: dict, ship_types: dict) -> dict:
-    _remember_ship_type(mmsi, inner, ship_types)
-    row = dict(inner)
-    if mmsi in ship_types:
-        row["ShipType"] = ship_types[mmsi]
-    return row
+STREAM_RECONNECTS = counter("collector_stream_reconnects_total", "AIS websocket reconnect attempts")
+STREAM_FRAMES = counter("collector_stream_frames_total", "Raw frames received per stream shard", labels=("shard",))
+STREAM_GAP_SECONDS = histogram(
+    "collector_stream_gap_seconds", "Duration of AIS stream outages",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+STREAM_DOWNTIME_SECONDS = counter("collector_stream_downtime_seconds_total", "Total seconds without AIS data")
+THROTTLE_ACCEPTED = counter("collector_throttle_accepted_total", "Position reports written by the throttle")
+THROTTLE_SUPPRESSED = counter("collector_throttle_suppressed_total", "Position reports suppressed by the throttle")
+INGEST_LAG_SECONDS = histogram(
+    "collector_ingest_lag_seconds", "Delay from AIS receive time to the writer",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600),
+)
+LATE_MESSAGES = counter("collector_late_messages_total", "Position reports older than their vessel's watermark")
+MESSAGES_POSITION = MESSAGES.labels("position")
+MESSAGES_STATIC = MESSAGES.labels("static")
+
+_KNOTS_TO_MS = 1852 / 3600
+_METERS_PER_DEGREE = 111320.0
+
+
+
+def split_bounding_boxes(bounding_boxes: list, shards: int) -> list:
+    """Split every box into `shards` longitude bands; shard i gets band i of each box."""
+    shards = max(1, shards)
+    result = [[] for _ in range(shards)]
+    for (lat_a, lon_a), (lat_b, lon_b) in bounding_boxes:
+        lat_min, lat_max = min(lat_a, lat_b), max(lat_a, lat_b)
+        lon_min, lon_max = min(lon_a, lon_b), max(lon_a, lon_b)
+        step = (lon_max - lon_min) / shards
+        for i in range(shards):
+            west = lon_min + i * step
+            east = lon_max if i == shards - 1 else west + step
+            result[i].append([[lat_min, west], [lat_max, east]])
+    return result
+
+
+def _shard_stats(frames: dict, previous: dict, interval: float) -> str:
+    if len(frames) < 2:
+        return ""
+    rates = ", ".join(
+        f"{name} {(count - previous.get(name, 0)) / interval:.0f}/s" for name, count in sorted(frames.items())
+    )
+    return f" | Shards: {rates}"
+
+
+def _throttle_stats() -> str:
+    seen = THROTTLE_ACCEPTED.value + THROTTLE_SUPPRESSED.value
+    ratio = THROTTLE_SUPPRESSED.value / seen if seen else 0.0
+    stats = f"Suppressed: {ratio:.0%}"
+    if TRAIL_POINTS_IN.value:
+        stats += f" | Trail kept: {TRAIL_POINTS_OUT.value / TRAIL_POINTS_IN.value:.0%}"
+    return stats
+
+
+def _lag_stats() -> str:
+    if not INGEST_LAG_SECONDS.count:
+        return ""
+    return f" | Lag: {INGEST_LAG_SECONDS.mean:.1f}s avg, {LATE_MESSAGES.value:.0f} late"
+
+
+def _flush_stats(*writers) -> str:
+    parts = []
+    for w in writers:
+        if w.batch_rows.count:
+            part = (
+                f"{w.kind}: {w.batch_rows.count} flushes "
+                f"(avg {w.batch_rows.mean:.0f} rows, {w.flush_seconds.mean * 1000:.1f} ms)"
+            )
+            coalesced = getattr(w, "coalesced", None)
+            if coalesced is not None:
+                part += f", {coalesced.value:.0f} coalesced"
+            parts.append(part)
+    return "".join(f" | {p}" for p in parts)
+
+
+def _dead_reckoning_error_m(state: VesselState, lat: float, lon: float, elapsed: float) -> float:
+    """Metres between (lat, lon) and the last saved position moved on by its SOG/COG for `elapsed` s."""
+    cos_lat = max(math.cos(math.radians(state.lat)), 1e-6)
+    pred_lat = state.lat
+    pred_lon = state.lon
+    # without SOG or COG there is nothing to extrapolate: predict no movement
+    if state.speed is not None and state.course is not None:
+        travelled = state.speed * _KNOTS_TO_MS * elapsed
+        course = math.radians(state.course)
+        pred_lat += travelled * math.cos(course) / _METERS_PER_DEGREE
+        pred_lon += travelled * math.sin(course) / (_METERS_PER_DEGREE * cos_lat)
+    dy = (lat - pred_lat) * _METERS_PER_DEGREE
+    dx = ((lon - pred_lon + 540.0) % 360.0 - 180.0) * _METERS_PER_DEGREE * cos_lat
+    return math.hypot(dx, dy)
+
+
+def _changed(new: Optional[float], old: Optional[float], threshold: float) -> bool:
+    """Whether a value moved by `threshold`; a missing value on either side is no change."""
+    return new is not None and old is not None and abs(new - old) >= threshold
+
+
+def _turned(new: Optional[float], old: Optional[float], threshold: float) -> bool:
+    """Whether a course or heading turned by `threshold` degrees, across north too."""
+    return new is not None and old is not None and abs((new - old + 180.0) % 360.0 - 180.0) >= threshold
+
+
+def _report_time(pos: PositionReport, wall: float) -> float:
+    """Event time of a report, or `wall` for a missing or future receive time."""
+    event_time = pos.event_time
+    if event_time is None or event_time > wall:
+        # no receive time, or a receiver clock running ahead of ours
+        return wall
+    return event_time
+
+
+def _throttle(state: VesselState, pos: PositionReport, event_time: float) -> tuple:
+    """(write current, write history) for a report against the vessel's last saved position."""
+    if state.saved_event_time is None:
+        return True, True
+    lat = pos.latitude
+    lon = pos.longitude
+    if AIS_THROTTLE_MODE == "predictive":
+        # event time, so queued, bursty or replayed reports are predicted over the span they cover
+        elapsed = event_time - state.saved_event_time
+        too_old = elapsed >= AIS_THROTTLE_MAX_AGE
+        deviated = _dead_reckoning_error_m(state, lat, lon, elapsed) > AIS_DR_TOLERANCE_M
+        return deviated or too_old, deviated or (
+            too_old and _dead_reckoning_error_m(state, lat, lon, 0.0) > AIS_DR_TOLERANCE_M
+        )
+    moved = (
+        abs(lat - state.lat) >= 0.00005
+        or abs(lon - state.lon) >= 0.00005
+    )
+    speed_changed = _changed(pos.speed, state.speed, 0.5)
+    course_changed = _turned(pos.course, state.course, 5.0)
+    heading_changed = _turned(pos.heading, state.heading, 5.0)
+    too_old = event_time - state.saved_event_time >= AIS_THROTTLE_MAX_AGE
+    return moved or speed_changed or course_changed or heading_changed or too_old, moved
 
 
 async def _maybe_save_position(
-    pool,
-    inner: dict,
-    ship_types: dict,
-    last_saved_positions: dict,
-    last_saved_times: dict,
+    current_buffer: CurrentPositionBuffer,
+    history_sink: HistorySink,
+    pos: PositionReport,
+    state: VesselState,
+    trail: Optional[TrajectorySimplifier] = None,
 ) -> bool:
-    """Persist position if movement/throttle rules pass. Returns True if written."""
-    mmsi = inner.get("UserID")
-    lat = inner.get("Latitude")
-    lon = inner.get("Longitude")
-    if mmsi is None or lat is None or lon is None:
+    """Persist position if movement/throttle rules pass. Returns True if written.
+
+    Reports older than the vessel's event-time watermark are dropped as late.
+    "delta" mode writes on fixed position/speed/course/heading changes.
+    "predictive" mode dead-reckons the last saved state over the event time
+    elapsed since it and writes only when the report is more than
+    AIS_DR_TOLERANCE_M metres off the prediction.
+    Both write at least every AIS_THROTTLE_MAX_AGE seconds of event time, so
+    live, late and replayed data get the same decisions. A missing SOG, COG or
+    heading is never a change, and without SOG or COG the prediction is that
+    the vessel stays where it was last saved.
+    """
+    wall = time.time()
+    event_time = _report_time(pos, wall)
+    INGEST_LAG_SECONDS.observe(wall - event_time)
+    if state.watermark is not None and event_time < state.watermark:
+        LATE_MESSAGES.inc()
         return False
+    state.watermark = event_time
+
+    lat = pos.latitude
+    lon = pos.longitude
+    speed = pos.speed
+    course = pos.course
+    heading = pos.heading
+    ship_type = pos.ship_type
+    if ship_type is not None:
+        state.ship_type = ship_type
+    else:
+        ship_type = state.ship_type
 
-    pos_row = _merge_type_into_row(mmsi, inner, ship_types)
-    speed = pos_row.get("Sog")
-    course = pos_row.get("Cog")
-    true_heading = pos_row.get("TrueHeading", None)
-    heading = None if (true_heading is None or true_heading == 511) else true_heading
-
-    now_ts = datetime.now(timezone.utc)
-    prev = last_saved_positions.get(mmsi)
-    should_save = True
-    save_history = False
-
-    if prev is not None:
-        moved = (
-            abs(lat - prev["lat"]) >= 0.00005
-            or abs(lon - prev["lon"]) >= 0.00005
-        )
-        speed_changed = abs((speed or 0.0) - prev["speed"]) >= 0.5
-        course_changed = abs((course or 0.0) - prev["course"]) >= 5.0
-        heading_changed = abs((heading or 0.0) - prev["heading"]) >= 5.0
-        last_save_time = last_saved_times.get(mmsi, now_ts)
-        too_old = (now_ts - last_save_time).total_seconds() >= 15
-
-        should_save = moved or speed_changed or course_changed or heading_changed or too_old
-        save_history = moved
+    should_save, save_history = _throttle(state, pos, event_time)
+
+    if not should_save:
+        THROTTLE_SUPPRESSED.inc()
     else:
-        save_history = True
-
-    if should_save:
-        await save_ship_position(pool, pos_row, save_history=save_history)
-        last_saved_positions[mmsi] = {
-            "lat": lat,
-            "lon": lon,
-            "speed": speed or 0.0,
-            "course": course or 0.0,
-            "heading": heading or 0.0,
-        }
-        last_saved_times[mmsi] = now_ts
+        THROTTLE_ACCEPTED.inc()
+        record = (
+            pos.mmsi, lat, lon, course, speed, heading,
+            pos.navigational_status, pos.rate_of_turn, ship_type, datetime.fromtimestamp(event_time, timezone.utc),
+        )
+        await current_buffer.add(record)
+        if save_history:
+            if trail is not None:
+                await trail.add(state, record)
+            else:
+                await history_sink.add(record)
+        state.lat = lat
+        state.lon = lon
+        state.speed = speed
+        state.course = course
+        state.heading = heading
+        state.saved_event_time = event_time
     return should_save
 
 
+class _Partition:
+    """DB sinks owned by one writer task, so partitions flush on separate connections."""
+
+    def __init__(self, pool, dimension: ShipDimension, feed: Optional[PositionFeed] = None):
+        self.current = CurrentPositionBuffer(
+            pool,
+            batch_size=AIS_CURRENT_BATCH_SIZE,
+            flush_interval=AIS_CURRENT_FLUSH_INTERVAL,
+            max_rows=AIS_CURRENT_BUFFER_MAX // AIS_WRITER_COUNT,
+            dimension=dimension,
+            feed=feed,
+        )
+        self.history = HistorySink(
+            pool,
+            batch_size=AIS_HISTORY_BATCH_SIZE,
+            flush_interval=AIS_HISTORY_FLUSH_INTERVAL,
+            max_rows=AIS_HISTORY_BUFFER_MAX // AIS_WRITER_COUNT,
+            max_retries=AIS_HISTORY_MAX_RETRIES,
+            dimension=dimension,
+        )
+        self.trail = None
+        if AIS_TRAIL_TOLERANCE_M > 0:
+            self.trail = TrajectorySimplifier(
+                self.history, AIS_TRAIL_TOLERANCE_M, AIS_TRAIL_MAX_DELAY, AIS_TRAIL_MAX_POINTS
+            )
+
+    def start(self) -> None:
+        self.current.start()
+        self.history.start()
+        if self.trail is not None:
+            self.trail.start()
+
+    async def close(self) -> None:
+        if self.trail is not None:
+            await self.trail.close()
+        await self.current.close()
+        await self.history.close()
+
+
+class AisCollector:
+    """Ingest state shared by the stream reader and the writer tasks.
+
+    The reader decodes frames and routes positions into a bounded queue;
+    writer tasks, partitioned by MMSI, apply the throttle and feed the position
+    buffers. Static data and stations go to their own change-only buffers.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.vessels = VesselStateStore(ttl=AIS_VESSEL_TTL, max_vessels=AIS_VESSEL_MAX)
+        self.registry = VesselRegistryBuffer(
+            pool,
+            batch_size=AIS_REGISTRY_BATCH_SIZE,
+            flush_interval=AIS_REGISTRY_FLUSH_INTERVAL,
+            max_rows=AIS_REGISTRY_BUFFER_MAX,
+        )
+        self.stations = StationWriter(
+            pool,
+            batch_size=AIS_STATION_BATCH_SIZE,
+            flush_interval=AIS_STATION_FLUSH_INTERVAL,
+            max_rows=AIS_STATION_BUFFER_MAX,
+            refresh=AIS_STATION_REFRESH,
+        )
+        self.history_partitions = HistoryPartitionMaintenance(
+            pool,
+            interval=AIS_PARTITION_MAINTENANCE_INTERVAL,
+            days_ahead=AIS_HISTORY_PARTITIONS_AHEAD,
+            keep_days=AIS_HISTORY_RETENTION_DAYS,
+        )
+        # shared by all partitions; they own disjoint MMSIs
+        self.dimension = ShipDimension(AIS_SHIPS_REFRESH)
+        # committed current positions are pushed to the API over LISTEN/NOTIFY
+        self.feed = PositionFeed(POSITIONS_FEED_CHANNEL) if POSITIONS_FEED_CHANNEL else None
+        self.partitions = [_Partition(pool, self.dimension, self.feed) for _ in range(AIS_WRITER_COUNT)]
+        self.writers = PartitionedWriters(
+            self._write, AIS_WRITER_COUNT, AIS_QUEUE_MAXSIZE, AIS_QUEUE_POLICY
+        )
+        self.decode_stage = None
+        if AIS_DECODE_WORKERS > 0:
+            self.decode_stage = ProcessDecodeStage(
+                decode_batch, self.route, AIS_DECODE_WORKERS, AIS_DECODE_BATCH_SIZE, AIS_DECODE_BATCH_DELAY
+            )
+        self.recorder = None
+        if AIS_RECORD_DIR:
+            self.recorder = StreamRecorder(AIS_RECORD_DIR, AIS_RECORD_SEGMENT_SECONDS)
+        self.msg_count = 0
+        self.shard_frames = {}
+        self._stats_task = None
+
+    async def warm_start(self) -> int:
+        """Load known vessel names and types from vessel_registry. Returns the count loaded."""
+        started = time.monotonic()
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await load_vessel_registry(conn, AIS_VESSEL_MAX)
+        except Exception as e:
+            logger.warning(f"Vessel registry not loaded, starting cold: {e}")
+            return 0
+        for mmsi, name, ship_type in rows:
+            self.vessels.load(mmsi, name, ship_type)
+        logger.info(f"Warm start: {len(rows)} vessels from registry in {time.monotonic() - started:.1f}s")
+        return len(rows)
+
+    def start(self) -> None:
+        self.registry.start()
+        self.stations.start()
+        self.history_partitions.start()
+        for partition in self.partitions:
+            partition.start()
+        self.writers.start()
+        if self.decode_stage is not None:
+            self.decode_stage.start()
+        if self.recorder is not None:
+            self.recorder.start()
+        if self._stats_task is None:
+            self._stats_task = asyncio.create_task(self._stats_loop())
+
+    async def close(self) -> None:
+        """Drain the queue, then flush every partition's buffers."""
+        if self._stats_task is not None:
+            self._stats_task.cancel()
+            self._stats_task = None
+        if self.decode_stage is not None:
+            await self.decode_stage.close()
+        await self.writers.close()
+        for partition in self.partitions:
+            await partition.close()
+        await self.registry.close()
+        await self.stations.close()
+        await self.history_partitions.close()
+        if self.recorder is not None:
+            await self.recorder.close()
+
+    async def handle_message(self, message_json) -> None:
+        """Take one raw stream frame: decode it inline or hand it to the decode workers."""
+        self.msg_count += 1
+        if self.decode_stage is not None:
+            await self.decode_stage.feed(message_json)
+            return
+        try:
+            decoded = decode_frame(message_json)
+        except Exception:
+            MESSAGES_IGNORED.inc()
+            raise
+        if decoded is None:
+            MESSAGES_IGNORED.inc()
+            return
+        await self.route(decoded)
+
+    async def route(self, decoded) -> None:
+        """Apply static data in place, queue positions for their writer, hand stations to the change-only writer."""
+        kind = type(decoded)
+        if kind is PositionReport:
+            MESSAGES_POSITION.inc()
+            mmsi = decoded.mmsi
+            if decoded.name or decoded.ship_type is not None:
+                await self._remember_static(self.vessels.touch(mmsi), decoded.name, decoded.ship_type)
+            if AIS_LOG_DETAILED:
+                self._log_position(decoded)
+            low_priority = False
+            if AIS_QUEUE_POLICY == "drop_oldest":
+                # late reports and those the throttle would keep out of history are dropped first
+                state = self.vessels.get(mmsi)
+                if state is not None:
+                    event_time = _report_time(decoded, time.time())
+                    low_priority = (
+                        (state.watermark is not None and event_time < state.watermark)
+                        or not _throttle(state, decoded, event_time)[1]
+                    )
+            await self.writers.submit(mmsi, decoded, low_priority)
+
+        elif kind is StaticReport:
+            MESSAGES_STATIC.inc()
+            await self._remember_static(self.vessels.touch(decoded.mmsi), decoded.name, decoded.ship_type)
+
+        elif kind is StationReport:
+            MESSAGES.labels(decoded.kind).inc()
+            await self.stations.add(decoded)
+
+    async def _write(self, partition_index: int, pos: PositionReport) -> None:
+        partition = self.partitions[partition_index]
+        await _maybe_save_position(
+            partition.current, partition.history, pos, self.vessels.touch(pos.mmsi), partition.trail,
+        )
+
+    async def _remember_static(self, state: VesselState, name: Optional[str], ship_type: Optional[int]) -> None:
+        """Update name/type in memory; queue a registry write on change or when the entry is stale."""
+        changed = False
+        if ship_type is not None and ship_type != state.ship_type:
+            state.ship_type = ship_type
+            changed = True
+        if name and name != state.name:
+            if state.name is None and state.mmsi:
+                logger.info(f"New ship {state.mmsi}: {name}")
+            self.vessels.set_name(state, name)
+            changed = True
+        now = state.last_seen
+        if changed or state.registered_at is None or now - state.registered_at >= AIS_REGISTRY_REFRESH:
+            state.registered_at = now
+            await self.registry.add((state.mmsi, state.name, state.ship_type, datetime.now(timezone.utc)))
+
+    def _log_position(self, pos: PositionReport) -> None:
+        mmsi = pos.mmsi
+        lat = pos.latitude
+        lon = pos.longitude
+        speed = pos.speed
+        course = pos.course
+        heading = pos.heading
+
+        time_str = datetime.now(timezone.utc).strftime("%H:%M:%S")
+        info_parts = []
+        if speed is not None and speed > 0:
+            info_parts.append(f"Speed: {speed:.1f} kn")
+        if course is not None:
+            info_parts.append(f"Course: {course:.1f}°")
+        if heading is not None:
+            info_parts.append(f"Heading: {heading:.1f}°")
+        info_str = " | ".join(info_parts) if info_parts else ""
+        state = self.vessels.get(mmsi)
+        nm = state.name if state is not None and state.name else "Unknown"
+        logger.info(
+            f"[{time_str}] #{self.msg_count:4d} | ShipID: {mmsi:12d} | "
+            f"Name: {nm:20s} | "
+            f"Lat: {lat:8.5f}° | Lon: {lon:9.5f}°" +
+            (f" | {info_str}" if info_str else "")
+        )
+
+    async def _stats_loop(self) -> None:
+        last_count = self.msg_count
+        last_shard_frames = {}
+        while True:
+            await asyncio.sleep(AIS_LOG_STATS_INTERVAL)
+            now = datetime.now(timezone.utc)
+            rate = (self.msg_count - last_count) / AIS_LOG_STATS_INTERVAL
+            last_count = self.msg_count
+            shard_stats = _shard_stats(self.shard_frames, last_shard_frames, AIS_LOG_STATS_INTERVAL)
+            last_shard_frames = dict(self.shard_frames)
+            self.vessels.evict_expired()
+            # flush histograms are registered per kind, so they cover all partitions
+            first = self.partitions[0]
+            logger.info(
+                f"{now.strftime('%H:%M:%S')} | {rate:.0f} msg/s | "
+                f"Total: {self.msg_count} | Known ships: {len(self.vessels)} "
+                f"({VESSELS_BYTES.value / 2**20:.1f} MB) | {_throttle_stats()} | "
+                f"Queue: {self.writers.depth()}/{self.writers.maxsize} "
+                f"(dropped {QUEUE_DROPPED.value:.0f}) | Reconnects: {STREAM_RECONNECTS.value:.0f}"
+                f"{_lag_stats()}{shard_stats}{_flush_stats(first.current, first.history, self.registry, self.stations.buffer)}"
+            )
+
+
+class StreamStalled(Exception):
+    """No frame arrived for AIS_STALL_TIMEOUT seconds on an open subscription."""
+
+
+async def run_stream(collector: AisCollector, bounding_boxes, name: str = "stream") -> None:
+    """Keep one aisstream subscription alive, reconnecting until cancelled.
+
+    Failed or silent connections (no frame for AIS_STALL_TIMEOUT seconds) are
+    retried with full-jitter exponential backoff. Each outage is measured from
+    the last received frame (or the first failed connect) to the first frame
+    after reconnecting.
+    """
+    attempt = 0
+    last_frame_at = None
+    outage_started = None
+    shard_frames = collector.shard_frames
+    shard_frames.setdefault(name, 0)
+    recorder = collector.recorder
+    frames_counter = STREAM_FRAMES.labels(name)
+
+    while True:
+        subscribed = received = False
+        try:
+            async with websockets.connect(AIS_STREAM_URL) as websocket:
+                await websocket.send(JSON_DUMPS({
+                    "APIKey": AIS_API_KEY,
+                    "BoundingBoxes": bounding_boxes
+                }))
+                subscribed = True
+
+                while True:
+                    try:
+                        message_json = await asyncio.wait_for(websocket.recv(), timeout=AIS_STALL_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        raise StreamStalled(f"no data for {AIS_STALL_TIMEOUT:.0f}s") from None
+                    last_frame_at = time.monotonic()
+                    received = True
+                    shard_frames[name] += 1
+                    frames_counter.inc()
+                    if recorder is not None:
+                        recorder.record(message_json)
+                    if outage_started is not None:
+                        gap = last_frame_at - outage_started
+                        STREAM_GAP_SECONDS.observe(gap)
+                        STREAM_DOWNTIME_SECONDS.inc(gap)
+                        logger.warning(f"[{name}] AIS stream restored: {gap:.1f}s gap, {attempt} reconnect attempt(s)")
+                        outage_started = None
+                        attempt = 0
+                    try:
+                        await collector.handle_message(message_json)
+                    except Exception as e:
+                        logger.error(f"Message processing error: {e}")
+
+        except StreamStalled as e:
+            reason = str(e)
+        except asyncio.TimeoutError:
+            # websockets' open/close handshake timeouts
+            reason = "connect timed out" if not subscribed else "connection timed out"
+        except Exception as e:
+            reason = f"{type(e).__name__}: {e}"
+            if not subscribed:
+                reason = f"connect failed: {reason}"
+
+        if outage_started is None:
+            # only a frame from this connection dates the start of the outage
+            outage_started = last_frame_at if received else time.monotonic()
+        delay = random.uniform(0, min(AIS_RECONNECT_MAX_DELAY, AIS_RECONNECT_MIN_DELAY * 2 ** attempt))
+        attempt += 1
+        STREAM_RECONNECTS.inc()
+        logger.warning(f"[{name}] AIS stream connection lost ({reason}); reconnecting in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+
 async def connect_ais_stream():
-    """Connect to AIS stream and process messages."""
-    ship_names = {}
-    ship_types = {}
-    last_saved_positions = {}
-    last_saved_times = {}
-    pool = await init_db_pool()
-    msg_count = 0
-    msg_count_interval = 0
-    last_stat_time = datetime.now(timezone.utc)
+    """Connect to AIS stream and process messages until cancelled.
 
+    With AIS_SHARD_COUNT > 1 the subscription area is split into longitude
+    bands, each served by its own websocket; all shards share one collector.
+    """
+    pool = await init_db_pool()
+    collector = AisCollector(pool)
+    await collector.warm_start()
+    collector.start()
+    metrics_server = None
+    if AIS_METRICS_PORT:
+        metrics_server = await serve_metrics(AIS_METRICS_HOST, AIS_METRICS_PORT)
+
+    shards = split_bounding_boxes(AIS_BOUNDING_BOXES, AIS_SHARD_COUNT)
+    for i, boxes in enumerate(shards):
+        logger.info(f"shard-{i}: {boxes}")
     try:
-        async with websockets.connect(AIS_STREAM_URL) as websocket:
-            await websocket.send(JSON_DUMPS({
-                "APIKey": AIS_API_KEY,
-                "BoundingBoxes": AIS_BOUNDING_BOXES
-            }))
-
-            async for message_json in websocket:
-                try:
-                    msg_count += 1
-                    msg_count_interval += 1
-
-                    message = JSON_LOADS(message_json)
-                    msg_type = message.get("MessageType")
-
-                    if msg_type == "ShipStaticData":
-                        static = message.get("Message", {}).get("ShipStaticData", {})
-                        mmsi = static.get("UserID")
-                        name = static.get("Name", "").strip()
-                        stype = static.get("ShipType")
-                        if stype is None:
-                            stype = static.get("Type")
-                        if mmsi is not None and stype is not None:
-                            try:
-                                ship_types[mmsi] = int(stype)
-                            except (TypeError, ValueError):
-                                pass
-                        if mmsi and name and mmsi not in ship_names:
-                            ship_names[mmsi] = name
-                            logger.info(f"New ship {mmsi}: {name}")
-
-                    elif msg_type == "StaticDataReport":
-                        sdr = message.get("Message", {}).get("StaticDataReport", {})
-                        mmsi = sdr.get("UserID")
-                        rb = sdr.get("ReportB") or {}
-                        if rb.get("Valid") and mmsi is not None:
-                            st = rb.get("ShipType")
-                            if st is not None:
-                                try:
-                                    ship_types[mmsi] = int(st)
-                                except (TypeError, ValueError):
-                                    pass
-
-                    elif msg_type == "BaseStationReport":
-                        bs = message.get("Message", {}).get("BaseStationReport", {})
-                        mmsi = bs.get("UserID")
-                        lat = bs.get("Latitude")
-                        lon = bs.get("Longitude")
-                        if mmsi is not None and lat is not None and lon is not None:
-                            try:
-                                await save_ais_station(
-                                    pool,
-                                    mmsi=int(mmsi),
-                                    kind="ais_base",
-                                    latitude=float(lat),
-                                    longitude=float(lon),
-                                    name=None,
-                                    type_code=int(bs["FixType"]) if bs.get("FixType") is not None else None,
-                                )
-                            except (TypeError, ValueError) as e:
-                                logger.debug(f"BaseStationReport skip: {e}")
-
-                    elif msg_type == "AidsToNavigationReport":
-                        aton = message.get("Message", {}).get("AidsToNavigationReport", {})
-                        mmsi = aton.get("UserID")
-                        lat = aton.get("Latitude")
-                        lon = aton.get("Longitude")
-                        if mmsi is not None and lat is not None and lon is not None:
-                            nm = (aton.get("Name") or "").strip() or None
-                            tc = aton.get("Type")
-                            try:
-                                await save_ais_station(
-                                    pool,
-                                    mmsi=int(mmsi),
-                                    kind="ais_aton",
-                                    latitude=float(lat),
-                                    longitude=float(lon),
-                                    name=nm,
-                                    type_code=int(tc) if tc is not None else None,
-                                )
-                            except (TypeError, ValueError) as e:
-                                logger.debug(f"AidsToNavigationReport skip: {e}")
-
-                    elif msg_type == "LongRangeAisBroadcastMessage":
-                        lr = message.get("Message", {}).get("LongRangeAisBroadcastMessage", {})
-                        lat = lr.get("Latitude")
-                        lon = lr.get("Longitude")
-                        if lat is None:
-                            lat = lr.get("Latitude1")
-                        if lon is None:
-                            lon = lr.get("Longitude1")
-                        if lat is None or lon is None:
-                            continue
-                        inner = dict(lr)
-                        inner["Latitude"] = lat
-                        inner["Longitude"] = lon
-                        now = datetime.now(timezone.utc)
-                        if (now - last_stat_time).total_seconds() >= AIS_LOG_STATS_INTERVAL:
-                            rate = msg_count_interval / AIS_LOG_STATS_INTERVAL
-                            logger.info(
-                                f"{now.strftime('%H:%M:%S')} | {rate:.0f} msg/s | "
-                                f"Total: {msg_count} | Known ships: {len(ship_names)}"
-                            )
-                            last_stat_time = now
-                            msg_count_interval = 0
-                        await _maybe_save_position(
-                            pool, inner, ship_types, last_saved_positions, last_saved_times
-                        )
-
-                    elif msg_type in _POSITION_KEYS:
-                        key = _POSITION_KEYS[msg_type]
-                        pos = message.get("Message", {}).get(key, {})
-                        if not pos:
-                            continue
-
-                        mmsi = pos.get("UserID")
-                        name = (pos.get("Name") or "").strip()
-                        if mmsi and name and mmsi not in ship_names:
-                            ship_names[mmsi] = name
-                            logger.info(f"New ship {mmsi}: {name}")
-
-                        lat = pos.get("Latitude")
-                        lon = pos.get("Longitude")
-                        speed = pos.get("Sog", None)
-                        course = pos.get("Cog", None)
-                        true_heading = pos.get("TrueHeading", None)
-                        heading = None if (true_heading is None or true_heading == 511) else true_heading
-
-                        now = datetime.now(timezone.utc)
-                        if (now - last_stat_time).total_seconds() >= AIS_LOG_STATS_INTERVAL:
-                            rate = msg_count_interval / AIS_LOG_STATS_INTERVAL
-                            logger.info(
-                                f"{now.strftime('%H:%M:%S')} | {rate:.0f} msg/s | "
-                                f"Total: {msg_count} | Known ships: {len(ship_names)}"
-                            )
-                            last_stat_time = now
-                            msg_count_interval = 0
-
-                        if AIS_LOG_DETAILED and msg_type == "PositionReport":
-                            time_str = now.strftime("%H:%M:%S")
-                            info_parts = []
-                            if speed is not None and speed > 0:
-                                info_parts.append(f"Speed: {speed:.1f} kn")
-                            if course is not None:
-                                info_parts.append(f"Course: {course:.1f}°")
-                            if heading is not None:
-                                info_parts.append(f"Heading: {heading:.1f}°")
-                            info_str = " | ".join(info_parts) if info_parts else ""
-                            nm = ship_names.get(mmsi, "Unknown")
-                            logger.info(
-                                f"[{time_str}] #{msg_count:4d} | ShipID: {mmsi:12d} | "
-                                f"Name: {nm:20s} | "
-                                f"Lat: {lat:8.5f}° | Lon: {lon:9.5f}°" +
-                                (f" | {info_str}" if info_str else "")
-                            )
-
-                        await _maybe_save_position(
-                            pool, pos, ship_types, last_saved_positions, last_saved_times
-                        )
-
-                except Exception as e:
-                    logger.error(f"Message processing error: {e}")
-
-    except Exception as e:
-        logger.error(f"AIS stream connection error: {e}")
+        await asyncio.gather(*(
+            run_stream(collector, boxes, name=f"shard-{i}") for i, boxes in enumerate(shards)
+        ))
     finally:
+        if metrics_server is not None:
+            metrics_server.close()
+        await collector.close()
         await close_db_pool()
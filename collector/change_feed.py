@@ -0,0 +1,62 @@
+"""Publish committed current-position changes over PostgreSQL LISTEN/NOTIFY.
+
+Each flushed batch of ship_positions_current is sent as NOTIFYs on one channel
+in the same transaction as the upsert, so listeners only see committed rows.
+Every payload is a compact JSON array of rows
+
+    [ship_id, latitude, longitude, course, speed, heading, ship_type, event_time]
+
+with event_time in epoch seconds and null for unknown values, and stays under
+the server's 8000-byte payload limit.
+"""
+import asyncpg
+
+from collector.metrics import counter
+
+# NOTIFY payloads must be shorter than 8000 bytes
+MAX_PAYLOAD = 7900
+
+FEED_ROWS = counter("collector_feed_rows_total", "Current-position rows published on the change feed")
+FEED_NOTIFICATIONS = counter("collector_feed_notifications_total", "NOTIFY payloads sent on the change feed")
+
+
+def _num(value, digits: int = None) -> str:
+    if value is None:
+        return "null"
+    if digits is not None:
+        return f"{value:.{digits}f}"
+    return str(value)
+
+
+def encode_rows(records: list) -> list:
+    """Split position rows into JSON array payloads of at most MAX_PAYLOAD bytes."""
+    payloads = []
+    parts = []
+    size = 2
+    for r in records:
+        row = (
+            f"[{r[0]},{r[1]:.6f},{r[2]:.6f},{_num(r[3], 1)},{_num(r[4], 1)},"
+            f"{_num(r[5])},{_num(r[8])},{r[9].timestamp():.3f}]"
+        )
+        if parts and size + len(row) + 1 > MAX_PAYLOAD:
+            payloads.append("[" + ",".join(parts) + "]")
+            parts = []
+            size = 2
+        parts.append(row)
+        size += len(row) + 1
+    if parts:
+        payloads.append("[" + ",".join(parts) + "]")
+    return payloads
+
+
+class PositionFeed:
+    """NOTIFY publisher for flushed current-position batches."""
+
+    def __init__(self, channel: str):
+        self.channel = channel
+
+    async def publish(self, conn: asyncpg.Connection, records: list) -> None:
+        payloads = encode_rows(records)
+        await conn.execute("SELECT pg_notify($1, p) FROM unnest($2::text[]) AS p", self.channel, payloads)
+        FEED_ROWS.inc(len(records))
+        FEED_NOTIFICATIONS.inc(len(payloads))
@@ -0,0 +1,436 @@
+"""Decode raw aisstream frames into compact, write-ready tuples.
+
+Everything here is a pure function of the frame, so it can run inline on the
+event loop or in worker processes (see `collector.pipeline.ProcessDecodeStage`).
+With msgspec installed frames are decoded straight into typed structs holding
+only the fields we use; otherwise they go through a full dict and `.get` chains.
+"""
+import calendar
+from typing import NamedTuple, Optional
+
+from loguru import logger
+
+try:
+    import orjson as json
+    JSON_LOADS = json.loads
+    JSON_DUMPS = lambda x: json.dumps(x).decode('utf-8')
+except ImportError:
+    import json
+    JSON_LOADS = json.loads
+    JSON_DUMPS = json.dumps
+    logger.warning("orjson not installed, using standard json library. Install orjson for better performance.")
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+    logger.warning("msgspec not installed, decoding AIS messages via dicts. Install msgspec for better performance.")
+
+
+class PositionReport(NamedTuple):
+    """Vessel position; optional fields are None when not available or out of range.
+
+    event_time is the receive time from the frame metadata (epoch seconds),
+    None when the frame has none.
+    """
+    mmsi: int
+    latitude: float
+    longitude: float
+    speed: Optional[float]
+    course: Optional[float]
+    heading: Optional[int]
+    navigational_status: Optional[int]
+    rate_of_turn: Optional[float]
+    ship_type: Optional[int]
+    name: Optional[str]
+    event_time: Optional[float]
+
+
+class StaticReport(NamedTuple):
+    """Vessel identity from ShipStaticData / StaticDataReport."""
+    mmsi: int
+    name: Optional[str]
+    ship_type: Optional[int]
+
+
+class StationReport(NamedTuple):
+    """Fixed AIS object: base station or aid to navigation."""
+    mmsi: int
+    kind: str
+    latitude: float
+    longitude: float
+    name: Optional[str]
+    type_code: Optional[int]
+
+
+# Valid ranges of the AIS fields we store; anything outside becomes None so a
+# single odd report cannot fail a multi-row write (smallint casts, mostly).
+MAX_MMSI = 999999999
+MAX_SPEED = 102.2       # knots; 102.3 is "not available"
+MAX_COURSE = 359.9      # degrees; 360 is "not available"
+MAX_HEADING = 359       # degrees; 511 is "not available"
+MAX_NAV_STATUS = 15
+
+_POSITION_KEYS = {
+    "PositionReport": "PositionReport",
+    "ExtendedClassBPositionReport": "ExtendedClassBPositionReport",
+    "StandardClassBPositionReport": "StandardClassBPositionReport",
+}
+
+
+def _as_int(value) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_float(value) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_name(value) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    return value.strip() or None
+
+
+def _ranged(value, low, high):
+    # out-of-range values, including AIS "not available" codes just past the range, become None
+    if value is None or not low <= value <= high:
+        return None
+    return value
+
+
+def _mmsi(value) -> Optional[int]:
+    value = _as_int(value)
+    if value is None or not 0 < value <= MAX_MMSI:
+        return None
+    return value
+
+
+def _type_code(value) -> Optional[int]:
+    return _ranged(_as_int(value), 0, 255)
+
+
+def _valid_coordinates(lat, lon) -> bool:
+    # AIS uses 91 / 181 for "not available"
+    return lat is not None and lon is not None and -90 <= lat <= 90 and -180 <= lon <= 180
+
+
+def _parse_time_utc(value) -> Optional[float]:
+    """Epoch seconds from aisstream's "2026-10-17 12:00:00.123456789 +0000 UTC"."""
+    if not value:
+        return None
+    try:
+        seconds = calendar.timegm((
+            int(value[0:4]), int(value[5:7]), int(value[8:10]),
+            int(value[11:13]), int(value[14:16]), int(value[17:19]),
+        ))
+        rest = value[19:].split(" ")
+        if rest[0]:
+            # fraction with up to nanosecond digits, e.g. ".123456789"
+            seconds += float(rest[0])
+        offset = rest[1] if len(rest) > 1 else "+0000"
+        if offset != "+0000":
+            shift = int(offset[1:3]) * 3600 + int(offset[3:5]) * 60
+            seconds -= shift if offset[0] == "+" else -shift
+        return float(seconds)
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _position_report(mmsi, lat, lon, speed, course, heading, status, rate_of_turn,
+                     ship_type, name, event_time) -> Optional[PositionReport]:
+    """Range-check already typed position fields; None without a usable MMSI and position."""
+    mmsi = _mmsi(mmsi)
+    if mmsi is None or not _valid_coordinates(lat, lon):
+        return None
+    return PositionReport(
+        mmsi,
+        lat,
+        lon,
+        _ranged(speed, 0.0, MAX_SPEED),
+        _ranged(course, 0.0, MAX_COURSE),
+        _ranged(heading, 0, MAX_HEADING),
+        _ranged(status, 0, MAX_NAV_STATUS),
+        rate_of_turn,
+        _ranged(ship_type, 0, 255),
+        name,
+        event_time,
+    )
+
+
+def _position(inner: dict, lat, lon, event_time) -> Optional[PositionReport]:
+    # optional fields of the wrong type become None instead of costing the report
+    ship_type = inner.get("ShipType")
+    if ship_type is None:
+        ship_type = inner.get("Type")
+    return _position_report(
+        inner.get("UserID"),
+        _as_float(lat),
+        _as_float(lon),
+        _as_float(inner.get("Sog")),
+        _as_float(inner.get("Cog")),
+        _as_int(inner.get("TrueHeading")),
+        _as_int(inner.get("NavigationalStatus")),
+        _as_float(inner.get("RateOfTurn")),
+        _as_int(ship_type),
+        _as_name(inner.get("Name")),
+        event_time,
+    )
+
+
+def _station_report(mmsi, kind: str, lat, lon, name, type_code) -> Optional[StationReport]:
+    mmsi = _mmsi(mmsi)
+    if mmsi is None or not _valid_coordinates(lat, lon):
+        return None
+    return StationReport(mmsi, kind, lat, lon, name, _type_code(type_code))
+
+
+def _station(inner: dict, kind: str, name, type_code) -> Optional[StationReport]:
+    return _station_report(
+        inner.get("UserID"), kind, _as_float(inner.get("Latitude")), _as_float(inner.get("Longitude")),
+        name, type_code,
+    )
+
+
+def _event_time(message: dict) -> Optional[float]:
+    return _parse_time_utc((message.get("MetaData") or {}).get("time_utc"))
+
+
+def decode_message(message: dict):
+    """Normalize one parsed aisstream message. Returns None for unused or invalid ones."""
+    msg_type = message.get("MessageType")
+    body = message.get("Message") or {}
+
+    if msg_type in _POSITION_KEYS:
+        pos = body.get(_POSITION_KEYS[msg_type])
+        if not pos:
+            return None
+        return _position(pos, pos.get("Latitude"), pos.get("Longitude"), _event_time(message))
+
+    if msg_type == "ShipStaticData":
+        static = body.get("ShipStaticData") or {}
+        mmsi = _mmsi(static.get("UserID"))
+        if mmsi is None:
+            return None
+        stype = static.get("ShipType")
+        if stype is None:
+            stype = static.get("Type")
+        return StaticReport(mmsi, _as_name(static.get("Name")), _type_code(stype))
+
+    if msg_type == "StaticDataReport":
+        sdr = body.get("StaticDataReport") or {}
+        mmsi = _mmsi(sdr.get("UserID"))
+        rb = sdr.get("ReportB") or {}
+        if mmsi is None or not rb.get("Valid"):
+            return None
+        return StaticReport(mmsi, None, _type_code(rb.get("ShipType")))
+
+    if msg_type == "BaseStationReport":
+        bs = body.get("BaseStationReport") or {}
+        return _station(bs, "ais_base", None, bs.get("FixType"))
+
+    if msg_type == "AidsToNavigationReport":
+        aton = body.get("AidsToNavigationReport") or {}
+        return _station(aton, "ais_aton", _as_name(aton.get("Name")), aton.get("Type"))
+
+    if msg_type == "LongRangeAisBroadcastMessage":
+        lr = body.get("LongRangeAisBroadcastMessage") or {}
+        lat = lr.get("Latitude")
+        lon = lr.get("Longitude")
+        if lat is None:
+            lat = lr.get("Latitude1")
+        if lon is None:
+            lon = lr.get("Longitude1")
+        return _position(lr, lat, lon, _event_time(message))
+
+    return None
+
+
+def _decode_frame_dict(raw):
+    """Parse one raw frame into a dict, then normalize it."""
+    return decode_message(JSON_LOADS(raw))
+
+
+if msgspec is not None:
+
+    class _Position(msgspec.Struct):
+        UserID: Optional[int] = None
+        Latitude: Optional[float] = None
+        Longitude: Optional[float] = None
+        Sog: Optional[float] = None
+        Cog: Optional[float] = None
+        TrueHeading: Optional[int] = None
+        NavigationalStatus: Optional[int] = None
+        RateOfTurn: Optional[float] = None
+        ShipType: Optional[int] = None
+        Type: Optional[int] = None
+        Name: Optional[str] = None
+
+    class _LongRange(msgspec.Struct):
+        UserID: Optional[int] = None
+        Latitude: Optional[float] = None
+        Longitude: Optional[float] = None
+        Latitude1: Optional[float] = None
+        Longitude1: Optional[float] = None
+        Sog: Optional[float] = None
+        Cog: Optional[float] = None
+        TrueHeading: Optional[int] = None
+        NavigationalStatus: Optional[int] = None
+        RateOfTurn: Optional[float] = None
+
+    class _ShipStatic(msgspec.Struct):
+        UserID: Optional[int] = None
+        Name: Optional[str] = None
+        ShipType: Optional[int] = None
+        Type: Optional[int] = None
+
+    class _ReportB(msgspec.Struct):
+        Valid: bool = False
+        ShipType: Optional[int] = None
+
+    class _StaticDataReport(msgspec.Struct):
+        UserID: Optional[int] = None
+        ReportB: Optional[_ReportB] = None
+
+    class _Station(msgspec.Struct):
+        UserID: Optional[int] = None
+        Latitude: Optional[float] = None
+        Longitude: Optional[float] = None
+        FixType: Optional[int] = None
+        Type: Optional[int] = None
+        Name: Optional[str] = None
+
+    class _Message(msgspec.Struct):
+        PositionReport: Optional[_Position] = None
+        StandardClassBPositionReport: Optional[_Position] = None
+        ExtendedClassBPositionReport: Optional[_Position] = None
+        LongRangeAisBroadcastMessage: Optional[_LongRange] = None
+        ShipStaticData: Optional[_ShipStatic] = None
+        StaticDataReport: Optional[_StaticDataReport] = None
+        BaseStationReport: Optional[_Station] = None
+        AidsToNavigationReport: Optional[_Station] = None
+
+    class _MetaData(msgspec.Struct):
+        time_utc: Optional[str] = None
+
+    class _Envelope(msgspec.Struct):
+        MessageType: str = ""
+        Message: Optional[_Message] = None
+        MetaData: Optional[_MetaData] = None
+
+    _ENVELOPE_DECODER = msgspec.json.Decoder(_Envelope, strict=False)
+
+    def _typed_position(p, lat, lon, ship_type, name, meta) -> Optional[PositionReport]:
+        return _position_report(
+            p.UserID,
+            lat,
+            lon,
+            p.Sog,
+            p.Cog,
+            p.TrueHeading,
+            p.NavigationalStatus,
+            p.RateOfTurn,
+            ship_type,
+            (name or "").strip() or None,
+            None if meta is None else _parse_time_utc(meta.time_utc),
+        )
+
+    def _typed_station(st, kind: str, name, type_code) -> Optional[StationReport]:
+        return _station_report(st.UserID, kind, st.Latitude, st.Longitude, name, type_code)
+
+    def _decode_frame_typed(raw):
+        """Decode one raw frame directly into typed structs, then normalize it.
+
+        A frame with a field of the wrong type (feed noise such as
+        "ShipType": "abc") goes through the lenient dict decoder instead of
+        being lost.
+        """
+        try:
+            env = _ENVELOPE_DECODER.decode(raw)
+        except msgspec.ValidationError:
+            return _decode_frame_dict(raw)
+        body = env.Message
+        if body is None:
+            return None
+        msg_type = env.MessageType
+
+        if msg_type in _POSITION_KEYS:
+            p = getattr(body, msg_type)
+            if p is None:
+                return None
+            ship_type = p.ShipType if p.ShipType is not None else p.Type
+            return _typed_position(p, p.Latitude, p.Longitude, ship_type, p.Name, env.MetaData)
+
+        if msg_type == "ShipStaticData":
+            st = body.ShipStaticData
+            mmsi = None if st is None else _mmsi(st.UserID)
+            if mmsi is None:
+                return None
+            ship_type = st.ShipType if st.ShipType is not None else st.Type
+            return StaticReport(mmsi, (st.Name or "").strip() or None, _type_code(ship_type))
+
+        if msg_type == "StaticDataReport":
+            sdr = body.StaticDataReport
+            mmsi = None if sdr is None else _mmsi(sdr.UserID)
+            if mmsi is None or sdr.ReportB is None or not sdr.ReportB.Valid:
+                return None
+            return StaticReport(mmsi, None, _type_code(sdr.ReportB.ShipType))
+
+        if msg_type == "BaseStationReport":
+            bs = body.BaseStationReport
+            return None if bs is None else _typed_station(bs, "ais_base", None, bs.FixType)
+
+        if msg_type == "AidsToNavigationReport":
+            aton = body.AidsToNavigationReport
+            if aton is None:
+                return None
+            return _typed_station(aton, "ais_aton", (aton.Name or "").strip() or None, aton.Type)
+
+        if msg_type == "LongRangeAisBroadcastMessage":
+            lr = body.LongRangeAisBroadcastMessage
+            if lr is None:
+                return None
+            lat = lr.Latitude if lr.Latitude is not None else lr.Latitude1
+            lon = lr.Longitude if lr.Longitude is not None else lr.Longitude1
+            return _typed_position(lr, lat, lon, None, None, env.MetaData)
+
+        return None
+
+    # decode_frame(raw) parses and normalizes one raw websocket frame
+    decode_frame = _decode_frame_typed
+else:
+    decode_frame = _decode_frame_dict
+
+
+def decode_batch(frames: list) -> list:
+    """Decode a micro-batch of frames, dropping invalid frames and exact duplicates.
+
+    The same report often arrives from several receivers within milliseconds;
+    positions identical apart from their receive time are only returned once.
+    """
+    out = []
+    seen = set()
+    for raw in frames:
+        try:
+            decoded = decode_frame(raw)
+        except Exception:
+            continue
+        if decoded is None:
+            continue
+        if type(decoded) is PositionReport:
+            key = decoded[:-1]
+            if key in seen:
+                continue
+            seen.add(key)
+        out.append(decoded)
+    return out
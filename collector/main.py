@@ -1,9 +1,23 @@
 import asyncio
+import signal
+
 from collector.ais_client import connect_ais_stream
 
 
+async def _run():
+    # docker stop sends SIGTERM: cancel the stream so buffered rows get flushed
+    task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, task.cancel)
+    try:
+        await connect_ais_stream()
+    except asyncio.CancelledError:
+        pass
+
+
 def main():
-    asyncio.run(connect_ais_stream())
+    asyncio.run(_run())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,215 @@
+"""In-process metrics for the collector pipeline (counters, gauges, histograms).
+
+`render()` formats the registry in the Prometheus text exposition format and
+`serve_metrics()` serves it over HTTP at /metrics.
+"""
+import asyncio
+import math
+import time
+from bisect import bisect_left
+
+from loguru import logger
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+REGISTRY: dict = {}
+
+
+class Counter:
+    """Monotonically increasing value."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class Gauge:
+    """Value that can go up and down."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+
+class Histogram:
+    """Cumulative histogram with fixed upper bounds."""
+
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def time(self) -> "_Timer":
+        """Context manager observing elapsed wall time in seconds."""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("_hist", "_started")
+
+    def __init__(self, hist: Histogram):
+        self._hist = hist
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._hist.observe(time.perf_counter() - self._started)
+        return False
+
+
+class Family:
+    """A metric split by label values; `labels(...)` returns the child for one combination.
+
+    Look the child up once and keep it on hot paths.
+    """
+
+    def __init__(self, cls, name: str, help_text: str, labelnames: tuple, **kwargs):
+        self.cls = cls
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self._kwargs = kwargs
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self.children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            child = self.cls(self.name, self.help, **self._kwargs)
+            self.children[key] = child
+        return child
+
+
+def _get_or_create(cls, name: str, help_text: str, labels: tuple = (), **kwargs):
+    metric = REGISTRY.get(name)
+    if metric is None:
+        if labels:
+            metric = Family(cls, name, help_text, labels, **kwargs)
+        else:
+            metric = cls(name, help_text, **kwargs)
+        REGISTRY[name] = metric
+    return metric
+
+
+def counter(name: str, help_text: str, labels: tuple = ()):
+    return _get_or_create(Counter, name, help_text, labels)
+
+
+def gauge(name: str, help_text: str, labels: tuple = ()):
+    return _get_or_create(Gauge, name, help_text, labels)
+
+
+def histogram(name: str, help_text: str, buckets=DEFAULT_BUCKETS, labels: tuple = ()):
+    return _get_or_create(Histogram, name, help_text, labels, buckets=buckets)
+
+
+_TYPES = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_set(names: tuple, values: tuple, le: str = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _render_series(lines: list, name: str, metric, names: tuple, values: tuple) -> None:
+    if type(metric) is Histogram:
+        cumulative = 0
+        for bound, count in zip(metric.buckets, metric.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_label_set(names, values, _number(float(bound)))} {cumulative}")
+        lines.append(f"{name}_bucket{_label_set(names, values, '+Inf')} {metric.count}")
+        lines.append(f"{name}_sum{_label_set(names, values)} {_number(metric.sum)}")
+        lines.append(f"{name}_count{_label_set(names, values)} {metric.count}")
+    else:
+        lines.append(f"{name}{_label_set(names, values)} {_number(metric.value)}")
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format (0.0.4)."""
+    lines = []
+    for name, metric in REGISTRY.items():
+        family = metric if type(metric) is Family else None
+        cls = family.cls if family else type(metric)
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {_TYPES[cls]}")
+        if family is None:
+            _render_series(lines, name, metric, (), ())
+        else:
+            for values, child in list(family.children.items()):
+                _render_series(lines, name, child, family.labelnames, values)
+    return "\n".join(lines) + "\n"
+
+
+async def _handle_scrape(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request = await asyncio.wait_for(reader.readline(), timeout=5)
+        while True:
+            header = await asyncio.wait_for(reader.readline(), timeout=5)
+            if header in (b"\r\n", b"\n", b""):
+                break
+        parts = request.split()
+        if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] == b"/metrics":
+            status, content_type, body = "200 OK", "text/plain; version=0.0.4; charset=utf-8", render().encode()
+        else:
+            status, content_type, body = "404 Not Found", "text/plain; charset=utf-8", b"not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_metrics(host: str, port: int) -> asyncio.AbstractServer:
+    """Serve `render()` at http://host:port/metrics until the returned server is closed."""
+    server = await asyncio.start_server(_handle_scrape, host, port)
+    logger.info(f"Metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,210 @@
+"""Stages between the AIS stream reader and the DB: decode workers, bounded queues, MMSI-partitioned writers."""
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from loguru import logger
+
+from collector.metrics import counter, gauge
+
+QUEUE_POLICIES = ("block", "drop_oldest")
+
+# how far from the head drop_oldest looks for low-priority work before
+# falling back to dropping the oldest item of any kind
+_DROP_SCAN = 256
+
+QUEUE_DEPTH = gauge("collector_queue_depth", "Messages waiting for a writer task")
+QUEUE_DROPPED = counter("collector_queue_dropped_total", "Messages dropped by the drop_oldest policy")
+QUEUE_BLOCKED = counter("collector_queue_blocked_total", "Times the reader waited for a full queue")
+MESSAGES = counter(
+    "collector_messages_total", "Decoded stream frames by kind (ignored = unused, invalid or duplicate)",
+    labels=("type",),
+)
+MESSAGES_IGNORED = MESSAGES.labels("ignored")
+
+_STOP = object()
+
+
+class BoundedQueue:
+    """FIFO with a hard size limit and a configurable overflow policy.
+
+    "block" makes producers wait for space. "drop_oldest" never waits: it drops
+    the oldest low-priority item, or the oldest item if none is near the head.
+    """
+
+    def __init__(self, maxsize: int, policy: str = "block"):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy {policy!r}, expected one of {QUEUE_POLICIES}")
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self._items = deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    async def put(self, item, low_priority: bool = False) -> None:
+        if len(self._items) >= self.maxsize:
+            if self.policy == "block":
+                QUEUE_BLOCKED.inc()
+                while len(self._items) >= self.maxsize:
+                    self._not_full.clear()
+                    await self._not_full.wait()
+            else:
+                self._drop_one()
+        self._push((low_priority, item))
+
+    def put_nowait(self, item) -> None:
+        """Enqueue ignoring the size limit (control messages only)."""
+        self._push((False, item))
+
+    async def get(self):
+        while not self._items:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        _, item = self._items.popleft()
+        QUEUE_DEPTH.dec()
+        self._not_full.set()
+        return item
+
+    def _push(self, entry) -> None:
+        self._items.append(entry)
+        QUEUE_DEPTH.inc()
+        self._not_empty.set()
+
+    def _drop_one(self) -> None:
+        for i, (low_priority, _) in enumerate(self._items):
+            if i >= _DROP_SCAN:
+                break
+            if low_priority:
+                del self._items[i]
+                break
+        else:
+            self._items.popleft()
+        QUEUE_DEPTH.dec()
+        QUEUE_DROPPED.inc()
+
+
+class PartitionedWriters:
+    """N writer tasks, each draining its own queue; items are routed by key % N.
+
+    Routing on MMSI keeps every vessel's messages on one writer, so per-ship
+    ordering holds while partitions write to the database in parallel.
+    """
+
+    def __init__(self, handler, partitions: int, maxsize: int, policy: str = "block"):
+        self._handler = handler
+        self.partitions = max(1, partitions)
+        per_partition = max(1, maxsize // self.partitions)
+        self.queues = [BoundedQueue(per_partition, policy) for _ in range(self.partitions)]
+        self._tasks = []
+
+    @property
+    def maxsize(self) -> int:
+        return sum(q.maxsize for q in self.queues)
+
+    def depth(self) -> int:
+        return sum(len(q) for q in self.queues)
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._run(i, q)) for i, q in enumerate(self.queues)
+            ]
+
+    async def submit(self, key: int, item, low_priority: bool = False) -> None:
+        await self.queues[key % self.partitions].put(item, low_priority)
+
+    async def close(self) -> None:
+        """Let every writer drain its queue, then stop it."""
+        for q in self.queues:
+            q.put_nowait(_STOP)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, partition: int, queue: BoundedQueue) -> None:
+        while True:
+            item = await queue.get()
+            if item is _STOP:
+                return
+            try:
+                await self._handler(partition, item)
+            except Exception as e:
+                logger.error(f"Writer {partition} error: {e}")
+
+
+class ProcessDecodeStage:
+    """Decode raw frames in worker processes, in micro-batches, preserving order.
+
+    Frames are grouped into batches of `batch_size` (or whatever arrived within
+    `max_delay` seconds) and decoded by `decode_batch` in a process pool. Results
+    are handed to `route` strictly in submission order. At most two batches per
+    worker are in flight; beyond that `feed` waits.
+    """
+
+    def __init__(self, decode_batch, route, workers: int, batch_size: int, max_delay: float):
+        self._decode_batch = decode_batch
+        self._route = route
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay
+        self._batch = []
+        self._in_flight = asyncio.Queue(maxsize=self.workers * 2)
+        self._executor = None
+        self._drain_task = None
+        self._timer_task = None
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self._drain_task = asyncio.create_task(self._drain())
+            self._timer_task = asyncio.create_task(self._timer())
+
+    async def feed(self, raw) -> None:
+        self._batch.append(raw)
+        if len(self._batch) >= self.batch_size:
+            await self._submit()
+
+    async def close(self) -> None:
+        """Decode and route everything already fed, then stop the workers."""
+        if self._executor is None:
+            return
+        self._timer_task.cancel()
+        await self._submit()
+        await self._in_flight.put(_STOP)
+        await self._drain_task
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    async def _submit(self) -> None:
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        future = asyncio.get_running_loop().run_in_executor(self._executor, self._decode_batch, batch)
+        await self._in_flight.put((future, len(batch)))
+
+    async def _drain(self) -> None:
+        while True:
+            entry = await self._in_flight.get()
+            if entry is _STOP:
+                return
+            future, frames = entry
+            try:
+                decoded = await future
+            except Exception as e:
+                MESSAGES_IGNORED.inc(frames)
+                logger.error(f"Decode batch failed: {e}")
+                continue
+            MESSAGES_IGNORED.inc(frames - len(decoded))
+            for item in decoded:
+                try:
+                    await self._route(item)
+                except Exception as e:
+                    logger.error(f"Message processing error: {e}")
+
+    async def _timer(self) -> None:
+        while True:
+            await asyncio.sleep(self.max_delay)
+            await self._submit()
@@ -0,0 +1,124 @@
+"""Record raw AIS frames into rotating gzip segments for later replay.
+
+Each segment is a gzip-compressed text file with one frame per line, prefixed
+by its receive time: "<epoch seconds>\t<frame>". A segment is written as
+"<name>.part" and renamed to "ais-YYYYmmddTHHMMSSZ.jsonl.gz" once it is
+complete, so readers never see a half-written file.
+"""
+import asyncio
+import gzip
+import os
+import time
+from datetime import datetime, timezone
+from typing import Iterator, Tuple
+
+from loguru import logger
+
+from collector.metrics import counter
+
+RECORDED_FRAMES = counter("collector_recorded_frames_total", "Raw frames written to recorder segments")
+
+SEGMENT_SUFFIX = ".jsonl.gz"
+
+
+class StreamRecorder:
+    """Append raw frames to the current segment; rotate every `segment_seconds`.
+
+    `record` only buffers the frame; compression and file I/O run in a worker
+    thread once per `flush_interval`, off the event loop.
+    """
+
+    def __init__(self, directory: str, segment_seconds: float, flush_interval: float = 1.0):
+        self.directory = directory
+        self.segment_seconds = max(1.0, segment_seconds)
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._file = None
+        self._path = None
+        self._opened_at = 0.0
+        self._task = None
+
+    def start(self) -> None:
+        if self._task is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._task = asyncio.create_task(self._flush_loop())
+
+    def record(self, frame) -> None:
+        if type(frame) is bytes:
+            frame = frame.decode("utf-8")
+        self._pending.append(f"{time.time():.6f}\t{frame}\n")
+
+    async def close(self) -> None:
+        """Write what is buffered and finish the open segment."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._flush()
+        await asyncio.to_thread(self._finish_segment)
+
+    async def _flush(self) -> None:
+        if not self._pending:
+            return
+        lines, self._pending = self._pending, []
+        try:
+            await asyncio.to_thread(self._write_lines, lines)
+        except OSError as e:
+            logger.error(f"Recorder write failed, {len(lines)} frames lost: {e}")
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush()
+
+    def _write_lines(self, lines: list) -> None:
+        if self._file is not None and time.time() - self._opened_at >= self.segment_seconds:
+            self._finish_segment()
+        if self._file is None:
+            self._open_segment()
+        self._file.write("".join(lines))
+        RECORDED_FRAMES.inc(len(lines))
+
+    def _open_segment(self) -> None:
+        self._opened_at = time.time()
+        stamp = datetime.fromtimestamp(self._opened_at, timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self._path = os.path.join(self.directory, f"ais-{stamp}{SEGMENT_SUFFIX}")
+        self._file = gzip.open(self._path + ".part", "wt", encoding="utf-8", compresslevel=6)
+
+    def _finish_segment(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        os.replace(self._path + ".part", self._path)
+        logger.info(f"Recorded segment {self._path}")
+        self._file = None
+        self._path = None
+
+
+def segment_paths(paths: list) -> list:
+    """Expand files and directories into completed segment files, oldest first."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(
+                os.path.join(path, name) for name in os.listdir(path) if name.endswith(SEGMENT_SUFFIX)
+            )
+        else:
+            found.append(path)
+    return sorted(found, key=os.path.basename)
+
+
+def read_segment(path: str) -> Iterator[Tuple[float, str]]:
+    """Yield (receive time, raw frame) pairs; a truncated segment ends early."""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                stamp, sep, frame = line.partition("\t")
+                if not sep:
+                    continue
+                yield float(stamp), frame.rstrip("\n")
+    except (EOFError, gzip.BadGzipFile) as e:
+        logger.warning(f"Segment {path} is truncated or corrupt: {e}")
@@ -1,36 +1,79 @@
 """Repository for working with ship data in database"""
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from itertools import islice
+
 import asyncpg
-from datetime import datetime, timezone
 from loguru import logger
 
+from collector.change_feed import PositionFeed
+from collector.metrics import SIZE_BUCKETS, counter, gauge, histogram
+
+# ShipDimension drops stale cache entries once it holds more than this many
+_DIMENSION_PRUNE_MIN = 100000
+
+# Errors caused by the rows themselves, so retrying the same batch can never
+# succeed. COPY encodes records client side and raises the codecs' own errors.
+DATA_ERRORS = (
+    asyncpg.DataError, asyncpg.IntegrityConstraintViolationError, TypeError, ValueError, OverflowError,
+)
+
+# Column order of the position rows (tuples) the collector buffers and writes
+HISTORY_COLUMNS = (
+    "ship_id", "latitude", "longitude", "course_over_ground",
+    "speed_over_ground", "heading", "navigational_status",
+    "rate_of_turn", "ship_type", "timestamp",
+)
+
+
+async def upsert_ships_batch(conn: asyncpg.Connection, rows: list):
+    """Multi-row UPSERT of (ship_id, seen_at, ship_type) into the `ships` dimension.
+
+    Rows must have unique ship_id; sort them by ship_id so concurrent writers
+    lock dimension rows in the same order.
+    """
+    await conn.execute(
+        """
+        INSERT INTO ships (ship_id, first_seen, last_seen, last_ship_type)
+        SELECT s.ship_id, s.seen_at, s.seen_at, s.ship_type
+        FROM unnest($1::bigint[], $2::timestamptz[], $3::smallint[]) AS s(ship_id, seen_at, ship_type)
+        ON CONFLICT (ship_id)
+        DO UPDATE SET
+            last_seen = GREATEST(ships.last_seen, EXCLUDED.last_seen),
+            last_ship_type = COALESCE(EXCLUDED.last_ship_type, ships.last_ship_type)
+        """,
+        *(list(col) for col in zip(*rows)),
+    )
+
 
-async def upsert_ship_position(conn: asyncpg.Connection, ship_data: dict):
-    """UPSERT current ship position"""
-    ship_id = ship_data.get('UserID')
-    latitude = ship_data.get('Latitude')
-    longitude = ship_data.get('Longitude')
-    
-    course_over_ground = ship_data.get('Cog', None)
-    speed_over_ground = ship_data.get('Sog', None)
-    true_heading = ship_data.get('TrueHeading', None)
-    heading = None if (true_heading is None or true_heading == 511) else true_heading
-    
-    navigational_status = ship_data.get('NavigationalStatus')
-    rate_of_turn = ship_data.get('RateOfTurn')
-    ship_type = ship_data.get('ShipType')
-    if ship_type is not None:
-        try:
-            ship_type = int(ship_type)
-        except (TypeError, ValueError):
-            ship_type = None
-    timestamp = datetime.now(timezone.utc)
+async def upsert_ship_positions_batch(conn: asyncpg.Connection, records: list):
+    """Multi-row UPSERT of current positions from position rows (HISTORY_COLUMNS order).
 
+    `timestamp` is the report's event time and never moves backwards; updated_at
+    is the write time. Only updated_bucket (10-minute steps) is indexed, so most
+    updates are HOT. Rows must have unique ship_id: ON CONFLICT cannot touch
+    the same row twice in one statement.
+    """
     upsert_query = """
         INSERT INTO ship_positions_current (
             ship_id, latitude, longitude, course_over_ground,
             speed_over_ground, heading, navigational_status,
             rate_of_turn, ship_type, timestamp, updated_at
-        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+        )
+        SELECT
+            r.ship_id, r.latitude, r.longitude, r.course_over_ground,
+            r.speed_over_ground, r.heading, r.navigational_status,
+            r.rate_of_turn, r.ship_type, r.timestamp, NOW()
+        FROM unnest(
+            $1::bigint[], $2::float8[], $3::float8[], $4::float8[],
+            $5::float8[], $6::int[], $7::int[],
+            $8::float8[], $9::smallint[], $10::timestamptz[]
+        ) AS r(
+            ship_id, latitude, longitude, course_over_ground,
+            speed_over_ground, heading, navigational_status,
+            rate_of_turn, ship_type, timestamp
+        )
         ON CONFLICT (ship_id)
         DO UPDATE SET
             latitude = EXCLUDED.latitude,
@@ -42,64 +85,429 @@ async def upsert_ship_position(conn: asyncpg.Connection, ship_data: dict):
             rate_of_turn = EXCLUDED.rate_of_turn,
             ship_type = COALESCE(EXCLUDED.ship_type, ship_positions_current.ship_type),
             timestamp = EXCLUDED.timestamp,
-            updated_at = EXCLUDED.updated_at
+            updated_at = EXCLUDED.updated_at,
+            updated_bucket = freshness_bucket(EXCLUDED.updated_at)
+        WHERE EXCLUDED.timestamp >= ship_positions_current.timestamp
     """
 
-    await conn.execute(
-        upsert_query,
-        ship_id, latitude, longitude, course_over_ground,
-        speed_over_ground, heading, navigational_status,
-        rate_of_turn, ship_type, timestamp, timestamp,
+    await conn.execute(upsert_query, *(list(col) for col in zip(*records)))
+
+
+async def copy_history_positions(conn: asyncpg.Connection, records: list):
+    """Bulk insert position rows into history with binary COPY."""
+    await conn.copy_records_to_table(
+        "ship_positions_history", records=records, columns=HISTORY_COLUMNS
     )
 
 
-async def insert_history_position(conn: asyncpg.Connection, ship_data: dict):
-    """Insert position into history"""
-    ship_id = ship_data.get('UserID')
-    latitude = ship_data.get('Latitude')
-    longitude = ship_data.get('Longitude')
-    
-    # Правильные названия полей в AIS API: Sog, Cog, TrueHeading
-    course_over_ground = ship_data.get('Cog', None)
-    speed_over_ground = ship_data.get('Sog', None)
-    true_heading = ship_data.get('TrueHeading', None)
-    # TrueHeading = 511 означает "недоступно" в AIS
-    heading = None if (true_heading is None or true_heading == 511) else true_heading
-    
-    navigational_status = ship_data.get('NavigationalStatus')
-    rate_of_turn = ship_data.get('RateOfTurn')
-    ship_type = ship_data.get('ShipType')
-    if ship_type is not None:
-        try:
-            ship_type = int(ship_type)
-        except (TypeError, ValueError):
-            ship_type = None
-    timestamp = datetime.now(timezone.utc)
-
-    insert_query = """
-        INSERT INTO ship_positions_history (
-            ship_id, latitude, longitude, course_over_ground,
-            speed_over_ground, heading, navigational_status,
-            rate_of_turn, ship_type, timestamp
-        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
-    """
+async def ensure_history_partitions(conn: asyncpg.Connection, days_ahead: int) -> int:
+    """Create missing daily history partitions up to `days_ahead` days ahead. Returns the count created."""
+    return await conn.fetchval("SELECT ensure_history_partitions($1)", days_ahead)
 
+
+async def drop_history_partitions(conn: asyncpg.Connection, keep_days: int) -> int:
+    """Detach and drop history partitions older than `keep_days` days. Returns the count dropped."""
+    return await conn.fetchval("SELECT drop_history_partitions($1)", keep_days)
+
+
+async def upsert_vessel_registry_batch(conn: asyncpg.Connection, records: list):
+    """Multi-row UPSERT of (ship_id, name, ship_type, updated_at) into vessel_registry.
+
+    NULL name or ship_type never overwrites a known value.
+    """
     await conn.execute(
-        insert_query,
-        ship_id, latitude, longitude, course_over_ground,
-        speed_over_ground, heading, navigational_status,
-        rate_of_turn, ship_type, timestamp,
+        """
+        INSERT INTO vessel_registry (ship_id, name, ship_type, updated_at)
+        SELECT * FROM unnest($1::bigint[], $2::text[], $3::smallint[], $4::timestamptz[])
+        ON CONFLICT (ship_id)
+        DO UPDATE SET
+            name = COALESCE(EXCLUDED.name, vessel_registry.name),
+            ship_type = COALESCE(EXCLUDED.ship_type, vessel_registry.ship_type),
+            updated_at = EXCLUDED.updated_at
+        """,
+        *(list(col) for col in zip(*records)),
+    )
+
+
+async def load_vessel_registry(conn: asyncpg.Connection, limit: int) -> list:
+    """The `limit` most recently updated registry rows, oldest first: [(ship_id, name, ship_type)]."""
+    rows = await conn.fetch(
+        """
+        SELECT ship_id, name, ship_type
+        FROM vessel_registry
+        ORDER BY updated_at DESC
+        LIMIT $1
+        """,
+        limit,
     )
+    return [(r["ship_id"], r["name"], r["ship_type"]) for r in reversed(rows)]
+
+
+class ShipDimension:
+    """Collector-side maintenance of the `ships` dimension (replaces the per-row trigger).
+
+    Before a position batch is written, `ships` is upserted only for vessels
+    this process has not written yet, whose ship type changed, or whose
+    last_seen was written more than `refresh` seconds ago: one small sorted
+    multi-row upsert per flush, usually none at all.
+    """
+
+    def __init__(self, refresh: float):
+        self.refresh = refresh
+        self._written = {}
+        self._prune_at = _DIMENSION_PRUNE_MIN
+        self.upserts = counter("collector_ships_dimension_upserts_total", "Rows upserted into the ships dimension")
+
+    async def ensure(self, conn: asyncpg.Connection, records: list) -> int:
+        """Upsert `ships` rows needed before writing these position rows."""
+        now = time.monotonic()
+        written = self._written
+        pending = {}
+        for record in records:
+            ship_id = record[0]
+            ship_type = record[8]
+            seen_at = record[9]
+            known = written.get(ship_id)
+            if known is not None and now - known[1] < self.refresh and (ship_type is None or ship_type == known[0]):
+                continue
+            previous = pending.get(ship_id)
+            if previous is not None:
+                seen_at = max(seen_at, previous[1])
+                if ship_type is None:
+                    ship_type = previous[2]
+            pending[ship_id] = (ship_id, seen_at, ship_type)
+        if not pending:
+            return 0
+
+        rows = [pending[ship_id] for ship_id in sorted(pending)]
+        await upsert_ships_batch(conn, rows)
+        for ship_id, _, ship_type in rows:
+            known = written.get(ship_id)
+            if ship_type is None and known is not None:
+                ship_type = known[0]
+            written[ship_id] = (ship_type, now)
+        self.upserts.inc(len(rows))
+        if len(written) > self._prune_at:
+            self._prune(now)
+        return len(rows)
+
+    def _prune(self, now: float) -> None:
+        # entries older than `refresh` force a write on the next sighting anyway
+        cutoff = now - self.refresh
+        self._written = {k: v for k, v in self._written.items() if v[1] >= cutoff}
+        self._prune_at = max(_DIMENSION_PRUNE_MIN, 2 * len(self._written))
+
+
+class _BatchWriter(ABC):
+    """Size/time triggered write-behind buffer flushed by a background task.
+
+    At most `max_rows` rows are held: a full buffer first forces a flush, and if
+    the database is unavailable the oldest rows are dropped. A batch the
+    database rejects for its data (DATA_ERRORS) is split in halves until the
+    offending rows are isolated; those are dropped and counted as rejected, the
+    rest is written. Any other failure puts the unwritten rows back at the front
+    of the buffer; with `max_retries` set they are dropped once flushes have
+    failed that many times in a row.
+    """
+
+    kind = ""
+    max_retries = None
+
+    def __init__(self, pool, batch_size: int, flush_interval: float, max_rows: int):
+        self._pool = pool
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_rows = max(self.batch_size, max_rows)
+        self._rows = self._new_rows()
+        self._failures = 0
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+        self.batch_rows = histogram(
+            f"collector_{self.kind}_batch_rows", f"Rows per {self.kind} flush", buckets=SIZE_BUCKETS
+        )
+        self.flush_seconds = histogram(
+            f"collector_{self.kind}_flush_seconds", f"Latency of {self.kind} flushes"
+        )
+        self.acquire_seconds = histogram(
+            "collector_db_acquire_seconds", "Wait for a pooled DB connection before a flush", labels=("kind",)
+        ).labels(self.kind)
+        self.flush_errors = counter(
+            f"collector_{self.kind}_flush_errors_total", f"Failed {self.kind} flushes"
+        )
+        self.dropped = counter(
+            f"collector_{self.kind}_dropped_total", f"{self.kind} rows dropped (buffer full or retries exhausted)"
+        )
+        self.rejected = counter(
+            f"collector_{self.kind}_rejected_total", f"{self.kind} rows rejected by the database as invalid"
+        )
+        self.buffered = gauge(
+            f"collector_{self.kind}_buffered_rows", f"{self.kind} rows waiting to be flushed"
+        )
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def add(self, record: tuple) -> None:
+        """Queue one row (a position row, or the buffer's own row shape)."""
+        if len(self._rows) >= self.max_rows:
+            await self.flush()
+        before = len(self._rows)
+        self._push(record)
+        self.buffered.inc(len(self._rows) - before)
+        self._trim()
+        if len(self._rows) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Write all pending rows. Returns the number of rows written."""
+        async with self._lock:
+            if not self._rows:
+                return 0
+            batch = self._take()
+            self.buffered.dec(len(batch))
+
+            started = time.perf_counter()
+            # stack of row slices still to write, next one last
+            pending = [batch]
+            written = 0
+            try:
+                async with self._pool.acquire() as conn:
+                    self.acquire_seconds.observe(time.perf_counter() - started)
+                    while pending:
+                        part = pending[-1]
+                        try:
+                            await self._write(conn, part)
+                        except DATA_ERRORS as e:
+                            pending.pop()
+                            self._split(part, e, pending)
+                            continue
+                        pending.pop()
+                        written += len(part)
+            except Exception as e:
+                unwritten = [row for part in reversed(pending) for row in part]
+                self.flush_errors.inc()
+                self._failures += 1
+                if self.max_retries is not None and self._failures > self.max_retries:
+                    logger.error(f"Dropping {len(unwritten)} {self.kind} rows after {self._failures} failed flushes: {e}")
+                    self.dropped.inc(len(unwritten))
+                    self._failures = 0
+                else:
+                    logger.error(f"Error flushing {len(unwritten)} {self.kind} rows: {e}")
+                    before = len(self._rows)
+                    self._requeue(unwritten)
+                    self.buffered.inc(len(self._rows) - before)
+                    self._trim()
+                return written
+            self._failures = 0
+            self.flush_seconds.observe(time.perf_counter() - started)
+            self.batch_rows.observe(len(batch))
+            return written
+
+    def _split(self, part: list, error: Exception, pending: list) -> None:
+        """Queue both halves of a rejected slice, or drop it if it is a single row."""
+        if len(part) == 1:
+            logger.warning(f"Rejected {self.kind} row {part[0]!r}: {error}")
+            self.rejected.inc()
+            return
+        middle = len(part) // 2
+        pending.append(part[middle:])
+        pending.append(part[:middle])
+
+    async def close(self) -> None:
+        """Stop the background flusher and write whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def _new_rows(self):
+        return []
+
+    def _push(self, record: tuple) -> None:
+        self._rows.append(record)
+
+    def _take(self) -> list:
+        rows, self._rows = self._rows, self._new_rows()
+        return rows
+
+    def _requeue(self, batch: list) -> None:
+        self._rows = batch + self._rows
+
+    def _evict_oldest(self, count: int) -> None:
+        del self._rows[:count]
+
+    @abstractmethod
+    async def _write(self, conn: asyncpg.Connection, batch: list) -> None:
+        """Write one batch of rows on `conn`; raising leaves them to `flush` to retry or reject."""
+
+    def _trim(self) -> None:
+        overflow = len(self._rows) - self.max_rows
+        if overflow > 0:
+            self._evict_oldest(overflow)
+            self.dropped.inc(overflow)
+            self.buffered.dec(overflow)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+
+class CoalescingBuffer(_BatchWriter):
+    """Buffer of full per-vessel rows keyed by ship_id (first column).
+
+    Within a flush window only the newest row of each vessel is kept (last
+    writer wins), so `batch_size` and `max_rows` count vessels, not messages.
+    """
+
+    def __init__(self, pool, batch_size: int, flush_interval: float, max_rows: int):
+        super().__init__(pool, batch_size, flush_interval, max_rows)
+        self.coalesced = counter(
+            f"collector_{self.kind}_coalesced_total", f"{self.kind} rows replaced by a newer one before flush"
+        )
+
+    def _new_rows(self):
+        return {}
+
+    def _push(self, record: tuple) -> None:
+        ship_id = record[0]
+        if self._rows.pop(ship_id, None) is not None:
+            self.coalesced.inc()
+        self._rows[ship_id] = record
+
+    def _take(self) -> list:
+        rows, self._rows = self._rows, self._new_rows()
+        return list(rows.values())
+
+    def _requeue(self, batch: list) -> None:
+        # rows that arrived while the flush was failing are newer and win
+        merged = {record[0]: record for record in batch}
+        for ship_id, record in self._rows.items():
+            merged.pop(ship_id, None)
+            merged[ship_id] = record
+        self._rows = merged
+
+    def _evict_oldest(self, count: int) -> None:
+        for ship_id in list(islice(self._rows, count)):
+            del self._rows[ship_id]
+
+
+
+class CurrentPositionBuffer(CoalescingBuffer):
+    """Write-behind buffer for ship_positions_current (one multi-row upsert per flush)."""
+
+    kind = "current"
+
+    def __init__(self, pool, batch_size: int, flush_interval: float, max_rows: int,
+                 dimension: ShipDimension = None, feed: PositionFeed = None):
+        super().__init__(pool, batch_size, flush_interval, max_rows)
+        self.dimension = dimension
+        self.feed = feed
+
+    async def _write(self, conn: asyncpg.Connection, batch: list) -> None:
+        if self.dimension is not None:
+            await self.dimension.ensure(conn, batch)
+        if self.feed is None:
+            await upsert_ship_positions_batch(conn, batch)
+            return
+        # NOTIFY is delivered on commit, so the feed only carries committed rows
+        async with conn.transaction():
+            await upsert_ship_positions_batch(conn, batch)
+            await self.feed.publish(conn, batch)
+
+
+class VesselRegistryBuffer(CoalescingBuffer):
+    """Write-behind buffer for vessel_registry rows (ship_id, name, ship_type, updated_at)."""
+
+    kind = "registry"
+
+    async def _write(self, conn: asyncpg.Connection, batch: list) -> None:
+        await upsert_vessel_registry_batch(conn, batch)
+
+
+class HistorySink(_BatchWriter):
+    """Bulk sink for ship_positions_history using binary COPY."""
+
+    kind = "history"
+
+    def __init__(self, pool, batch_size: int, flush_interval: float, max_rows: int, max_retries: int = 3,
+                 dimension: ShipDimension = None):
+        super().__init__(pool, batch_size, flush_interval, max_rows)
+        self.max_retries = max_retries
+        self.dimension = dimension
+
+    async def _write(self, conn: asyncpg.Connection, batch: list) -> None:
+        if self.dimension is not None:
+            await self.dimension.ensure(conn, batch)
+        await copy_history_positions(conn, batch)
+
+
+class HistoryPartitionMaintenance:
+    """Periodic upkeep of the daily ship_positions_history partitions.
+
+    Every `interval` seconds (and once at start) creates partitions for the
+    next `days_ahead` days and drops those older than `keep_days` (0 keeps
+    everything). Dropping a partition is a catalog operation, so retention does
+    not DELETE rows or bloat the table.
+    """
+
+    def __init__(self, pool, interval: float, days_ahead: int, keep_days: int):
+        self.pool = pool
+        self.interval = interval
+        self.days_ahead = days_ahead
+        self.keep_days = keep_days
+        self.created = counter("collector_history_partitions_created_total", "History partitions created")
+        self.dropped = counter("collector_history_partitions_dropped_total", "History partitions dropped by retention")
+        self._task = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
 
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
 
-async def save_ship_position(pool, ship_data: dict, save_history: bool = False):
-    """Save ship position to database (UPSERT + optionally history)"""
-    try:
-        async with pool.acquire() as conn:
-            await upsert_ship_position(conn, ship_data)
-            
-            if save_history:
-                await insert_history_position(conn, ship_data)
-    except Exception as e:
-        logger.error(f"Error saving to database: {e}")
+    async def run_once(self) -> None:
+        async with self.pool.acquire() as conn:
+            created = await ensure_history_partitions(conn, self.days_ahead)
+            dropped = 0
+            if self.keep_days > 0:
+                dropped = await drop_history_partitions(conn, self.keep_days)
+        self.created.inc(created)
+        self.dropped.inc(dropped)
+        if created or dropped:
+            logger.info(f"History partitions: {created} created, {dropped} dropped")
 
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncpg.UndefinedFunctionError:
+                logger.warning(
+                    "History partition functions not found, maintenance disabled; "
+                    "run scripts/partition_history_table.sql"
+                )
+                return
+            except Exception as e:
+                logger.error(f"History partition maintenance failed: {e}")
+            await asyncio.sleep(self.interval)
@@ -1,8 +1,17 @@
 """AIS fixed stations: base stations (msg 4), aids to navigation (msg 21)."""
+import time
 from datetime import datetime, timezone
 
 import asyncpg
 
+from collector.decoder import StationReport
+from collector.metrics import counter
+from collector.ship_repository import CoalescingBuffer
+
+STATIONS_UNCHANGED = counter(
+    "collector_station_unchanged_total", "Station reports skipped because nothing changed since the last write"
+)
+
 
 async def upsert_ais_station(
     conn: asyncpg.Connection,
@@ -58,3 +67,88 @@ async def save_ais_station(
             name=name,
             type_code=type_code,
         )
+
+
+async def upsert_ais_stations_batch(conn: asyncpg.Connection, records: list) -> None:
+    """Multi-row upsert of (mmsi, kind, name, latitude, longitude, type_code, updated_at) tuples."""
+    await conn.execute(
+        """
+        INSERT INTO ais_stations (mmsi, kind, name, latitude, longitude, type_code, updated_at)
+        SELECT * FROM unnest(
+            $1::bigint[], $2::varchar[], $3::text[], $4::float8[],
+            $5::float8[], $6::smallint[], $7::timestamptz[]
+        )
+        ON CONFLICT (mmsi) DO UPDATE SET
+            kind = EXCLUDED.kind,
+            name = COALESCE(EXCLUDED.name, ais_stations.name),
+            latitude = EXCLUDED.latitude,
+            longitude = EXCLUDED.longitude,
+            type_code = COALESCE(EXCLUDED.type_code, ais_stations.type_code),
+            updated_at = EXCLUDED.updated_at
+        """,
+        *(list(col) for col in zip(*records)),
+    )
+
+
+def _station_state(kind: str, name, latitude: float, longitude: float, type_code) -> tuple:
+    """What counts as a change: position rounded to ~10 m, so GPS jitter of a fixed station is not one."""
+    return kind, name, round(latitude, 4), round(longitude, 4), type_code
+
+
+class StationBuffer(CoalescingBuffer):
+    """Write-behind buffer for ais_stations rows, coalesced by MMSI.
+
+    `on_written(batch)` is called after each successful flush.
+    """
+
+    kind = "station"
+
+    def __init__(self, pool, batch_size: int, flush_interval: float, max_rows: int, on_written=None):
+        super().__init__(pool, batch_size, flush_interval, max_rows)
+        self.on_written = on_written
+
+    async def _write(self, conn: asyncpg.Connection, batch: list) -> None:
+        await upsert_ais_stations_batch(conn, batch)
+        if self.on_written is not None:
+            self.on_written(batch)
+
+
+class StationWriter:
+    """Change-only front end of a StationBuffer.
+
+    Remembers the last state written per MMSI, recorded only once its flush
+    succeeds, so rows lost to a failed flush or a full buffer are written again
+    on the next report. Unchanged reports are skipped; each station is still
+    rewritten every `refresh` seconds to keep updated_at roughly current.
+    There are only a few thousand fixed stations, so the cache is not bounded.
+    """
+
+    def __init__(self, pool, batch_size: int, flush_interval: float, max_rows: int, refresh: float):
+        self.buffer = StationBuffer(pool, batch_size, flush_interval, max_rows, on_written=self._mark_written)
+        self.refresh = refresh
+        self._written = {}
+
+    def start(self) -> None:
+        self.buffer.start()
+
+    async def close(self) -> None:
+        await self.buffer.close()
+
+    async def add(self, report: StationReport) -> bool:
+        """Queue the report if it differs from the last write or that write is stale. Returns True if queued."""
+        state = _station_state(report.kind, report.name, report.latitude, report.longitude, report.type_code)
+        written = self._written.get(report.mmsi)
+        if written is not None and written[0] == state and time.monotonic() - written[1] < self.refresh:
+            STATIONS_UNCHANGED.inc()
+            return False
+        # an identical report before the flush just replaces the buffered row
+        await self.buffer.add((
+            report.mmsi, report.kind, report.name, report.latitude, report.longitude,
+            report.type_code, datetime.now(timezone.utc),
+        ))
+        return True
+
+    def _mark_written(self, batch: list) -> None:
+        now = time.monotonic()
+        for mmsi, kind, name, latitude, longitude, type_code, _ in batch:
+            self._written[mmsi] = (_station_state(kind, name, latitude, longitude, type_code), now)
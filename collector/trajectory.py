@@ -0,0 +1,135 @@
+"""Online trajectory simplification for history points (opening-window Douglas-Peucker).
+
+For each vessel the last emitted point is the anchor and later points are held
+back while every one of them stays within `tolerance_m` of the segment from the
+anchor to the newest point. When a new point breaks that, the previous point is
+emitted and becomes the new anchor. Held-back points are also released after
+`max_delay` seconds or once `max_points` are pending, so latency and memory stay
+bounded.
+"""
+import asyncio
+import math
+import time
+
+from collector.metrics import counter
+from collector.vessel_state import TRAIL_POINTS_HELD, VesselState
+
+TRAIL_POINTS_IN = counter("collector_trail_points_in_total", "History candidates entering the simplifier")
+TRAIL_POINTS_OUT = counter("collector_trail_points_out_total", "History points kept by the simplifier")
+
+_METERS_PER_DEGREE = 111320.0
+
+# position row layout (collector.ship_repository.HISTORY_COLUMNS)
+_LAT = 1
+_LON = 2
+
+
+def _segment_distance_m(anchor: tuple, end: tuple, point: tuple) -> float:
+    """Distance in metres from `point` to the anchor->end segment (local flat projection)."""
+    cos_lat = math.cos(math.radians(anchor[_LAT]))
+
+    def project(record):
+        dlon = (record[_LON] - anchor[_LON] + 540.0) % 360.0 - 180.0
+        return dlon * cos_lat * _METERS_PER_DEGREE, (record[_LAT] - anchor[_LAT]) * _METERS_PER_DEGREE
+
+    ex, ey = project(end)
+    px, py = project(point)
+    length_sq = ex * ex + ey * ey
+    if length_sq == 0.0:
+        return math.hypot(px, py)
+    t = max(0.0, min(1.0, (px * ex + py * ey) / length_sq))
+    return math.hypot(px - t * ex, py - t * ey)
+
+
+class TrajectorySimplifier:
+    """Per-partition front end of a HistorySink that drops redundant trail points.
+
+    Trail state lives on each VesselState (`trail_anchor`, `trail_pending`,
+    `trail_since`), so it is evicted together with the vessel. An evicted
+    vessel's held-back points stay in `_waiting` until the release loop emits
+    them, or until the MMSI comes back with a new state, which emits them first.
+    """
+
+    def __init__(self, sink, tolerance_m: float, max_delay: float, max_points: int):
+        self._sink = sink
+        self.tolerance_m = tolerance_m
+        self.max_delay = max_delay
+        self.max_points = max(1, max_points)
+        self._waiting = {}
+        self._task = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._release_loop())
+
+    async def add(self, state: VesselState, record: tuple) -> None:
+        TRAIL_POINTS_IN.inc()
+        anchor = state.trail_anchor
+        if anchor is None:
+            evicted = self._waiting.get(state.mmsi)
+            if evicted is not None and evicted is not state:
+                # the vessel was evicted and re-created: release the old track's window
+                await self._emit(self._advance(evicted))
+            state.trail_anchor = record
+            await self._emit(record)
+            return
+
+        pending = state.trail_pending
+        if not pending:
+            state.trail_pending = [record]
+            state.trail_since = time.monotonic()
+            self._waiting[state.mmsi] = state
+            TRAIL_POINTS_HELD.inc()
+            return
+
+        tolerance = self.tolerance_m
+        if any(_segment_distance_m(anchor, record, p) > tolerance for p in pending):
+            keep = self._advance(state)
+            state.trail_pending = [record]
+            state.trail_since = time.monotonic()
+            self._waiting[state.mmsi] = state
+            TRAIL_POINTS_HELD.inc()
+            await self._emit(keep)
+            return
+
+        pending.append(record)
+        TRAIL_POINTS_HELD.inc()
+        if len(pending) >= self.max_points or time.monotonic() - state.trail_since >= self.max_delay:
+            await self._emit(self._advance(state))
+
+    async def close(self) -> None:
+        """Stop the release task and emit every held-back point."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._release(0.0)
+
+    def _advance(self, state: VesselState) -> tuple:
+        """Make the newest pending point the anchor; returns it for emission."""
+        pending = state.trail_pending
+        keep = pending[-1]
+        state.trail_anchor = keep
+        state.trail_pending = None
+        TRAIL_POINTS_HELD.dec(len(pending))
+        self._waiting.pop(state.mmsi, None)
+        return keep
+
+    async def _emit(self, record: tuple) -> None:
+        TRAIL_POINTS_OUT.inc()
+        await self._sink.add(record)
+
+    async def _release(self, max_age: float) -> None:
+        cutoff = time.monotonic() - max_age
+        due = [s for s in self._waiting.values() if s.trail_pending and s.trail_since <= cutoff]
+        records = [self._advance(state) for state in due]
+        for record in records:
+            await self._emit(record)
+
+    async def _release_loop(self) -> None:
+        while True:
+            await asyncio.sleep(max(1.0, self.max_delay / 4))
+            await self._release(self.max_delay)
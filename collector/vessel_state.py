@@ -0,0 +1,140 @@
+"""Bounded in-memory per-vessel state for the collector (identity + throttle state)."""
+import sys
+import time
+from itertools import islice
+from typing import Optional
+
+from collector.metrics import counter, gauge
+
+VESSELS_TRACKED = gauge("collector_vessel_state_vessels", "Vessels held in the in-memory state store")
+VESSELS_BYTES = gauge("collector_vessel_state_bytes", "Estimated memory used by the vessel state store")
+VESSELS_EVICTED = counter("collector_vessel_state_evicted_total", "Vessels evicted by TTL or size cap")
+TRAIL_POINTS_HELD = gauge("collector_trail_points_held", "History points held back by the trail simplifier")
+
+
+class VesselState:
+    """Everything the collector remembers about one MMSI.
+
+    lat/lon/speed/course/heading are the values of the last *saved* position,
+    speed/course/heading None when that report did not have them;
+    saved_event_time is the event time (epoch seconds) of that position and
+    watermark the newest event time accepted for the vessel; last_seen and
+    registered_at (last vessel_registry write) are time.monotonic() readings.
+    Names are set through `VesselStateStore.set_name`, which keeps the memory
+    estimate current. The trail_* slots belong to
+    `collector.trajectory.TrajectorySimplifier`.
+    """
+
+    __slots__ = (
+        "mmsi", "name", "ship_type",
+        "lat", "lon", "speed", "course", "heading",
+        "saved_event_time", "last_seen", "registered_at", "watermark",
+        "trail_anchor", "trail_pending", "trail_since",
+    )
+
+    def __init__(self, mmsi: int, now: float):
+        self.mmsi = mmsi
+        self.name: Optional[str] = None
+        self.ship_type: Optional[int] = None
+        self.lat = 0.0
+        self.lon = 0.0
+        self.speed: Optional[float] = None
+        self.course: Optional[float] = None
+        self.heading: Optional[int] = None
+        self.saved_event_time: Optional[float] = None
+        self.last_seen = now
+        self.registered_at: Optional[float] = None
+        self.watermark: Optional[float] = None
+        self.trail_anchor = None
+        self.trail_pending = None
+        self.trail_since = 0.0
+
+
+_RECORD_BYTES = sys.getsizeof(VesselState(0, 0.0))
+# a position row (10 slots, floats and a datetime) and its list slot
+_TRAIL_POINT_BYTES = sys.getsizeof((0,) * 10) + 5 * sys.getsizeof(0.0) + 48 + 8
+
+
+def _name_bytes(name: Optional[str]) -> int:
+    return 0 if name is None else sys.getsizeof(name)
+
+
+class VesselStateStore:
+    """MMSI -> VesselState map with TTL and LRU eviction.
+
+    The dict is kept in least-recently-seen order (touching a vessel re-inserts
+    it at the end), so both expiry and the size cap only look at the head. Name
+    bytes are summed as names change and vessels leave, so the memory estimate
+    never walks the store.
+    """
+
+    def __init__(self, ttl: float, max_vessels: int):
+        self.ttl = ttl
+        self.max_vessels = max(1, max_vessels)
+        self._vessels = {}
+        self._name_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._vessels)
+
+    def __contains__(self, mmsi: int) -> bool:
+        return mmsi in self._vessels
+
+    def get(self, mmsi: int) -> Optional[VesselState]:
+        return self._vessels.get(mmsi)
+
+    def touch(self, mmsi: int) -> VesselState:
+        """Return the vessel's state (creating it) and mark it as just seen."""
+        vessels = self._vessels
+        now = time.monotonic()
+        state = vessels.pop(mmsi, None)
+        if state is None:
+            if len(vessels) >= self.max_vessels:
+                self._evict_head(len(vessels) - self.max_vessels + 1)
+            state = VesselState(mmsi, now)
+        else:
+            state.last_seen = now
+        vessels[mmsi] = state
+        return state
+
+    def load(self, mmsi: int, name: Optional[str], ship_type: Optional[int]) -> None:
+        """Warm-start one vessel's static data (registry rows come oldest first)."""
+        state = self.touch(mmsi)
+        self.set_name(state, name)
+        state.ship_type = ship_type
+        state.registered_at = state.last_seen
+
+    def evict_expired(self) -> int:
+        """Drop vessels not seen for `ttl` seconds. Returns the number evicted."""
+        cutoff = time.monotonic() - self.ttl
+        expired = 0
+        for state in self._vessels.values():
+            if state.last_seen >= cutoff:
+                break
+            expired += 1
+        if expired:
+            self._evict_head(expired)
+        self._update_gauges()
+        return expired
+
+    def set_name(self, state: VesselState, name: Optional[str]) -> None:
+        """Rename a vessel held by the store."""
+        self._name_bytes += _name_bytes(name) - _name_bytes(state.name)
+        state.name = name
+
+    def memory_bytes(self) -> int:
+        """Rough footprint: dict table, state records, name strings and held-back trail points."""
+        return (
+            sys.getsizeof(self._vessels) + len(self._vessels) * _RECORD_BYTES + self._name_bytes
+            + int(TRAIL_POINTS_HELD.value) * _TRAIL_POINT_BYTES
+        )
+
+    def _evict_head(self, count: int) -> None:
+        vessels = self._vessels
+        for mmsi in list(islice(vessels, count)):
+            self._name_bytes -= _name_bytes(vessels.pop(mmsi).name)
+        VESSELS_EVICTED.inc(count)
+
+    def _update_gauges(self) -> None:
+        VESSELS_TRACKED.set(len(self._vessels))
+        VESSELS_BYTES.set(self.memory_bytes())
@@ -15,11 +15,96 @@ DB_CONFIG = {
 }
 
 AIS_API_KEY = os.getenv("SECRET_KEY_SHIPAPI")
-AIS_STREAM_URL = "wss://stream.aisstream.io/v0/stream"
+# Point at a local stand-in (python -m benchmarks.fleet_simulator) for load tests
+AIS_STREAM_URL = os.getenv("AIS_STREAM_URL", "wss://stream.aisstream.io/v0/stream")
 AIS_BOUNDING_BOXES = [[[-90, -180], [90, 180]]]
 
 AIS_LOG_STATS_INTERVAL = int(os.getenv("AIS_LOG_STATS_INTERVAL", "5"))
 AIS_LOG_DETAILED = os.getenv("AIS_LOG_DETAILED", "false").lower() == "true"
 
+# Write-behind buffer for ship_positions_current: flush on size or time trigger
+AIS_CURRENT_BATCH_SIZE = int(os.getenv("AIS_CURRENT_BATCH_SIZE", "500"))
+AIS_CURRENT_FLUSH_INTERVAL = float(os.getenv("AIS_CURRENT_FLUSH_INTERVAL", "1.0"))
+AIS_CURRENT_BUFFER_MAX = int(os.getenv("AIS_CURRENT_BUFFER_MAX", "50000"))
+
+# Bulk COPY sink for ship_positions_history
+AIS_HISTORY_BATCH_SIZE = int(os.getenv("AIS_HISTORY_BATCH_SIZE", "2000"))
+AIS_HISTORY_FLUSH_INTERVAL = float(os.getenv("AIS_HISTORY_FLUSH_INTERVAL", "2.0"))
+AIS_HISTORY_BUFFER_MAX = int(os.getenv("AIS_HISTORY_BUFFER_MAX", "200000"))
+AIS_HISTORY_MAX_RETRIES = int(os.getenv("AIS_HISTORY_MAX_RETRIES", "3"))
+
+# history partitions: keep this many days ahead, drop partitions older than AIS_HISTORY_RETENTION_DAYS (0 = keep all)
+AIS_HISTORY_PARTITIONS_AHEAD = int(os.getenv("AIS_HISTORY_PARTITIONS_AHEAD", "3"))
+AIS_HISTORY_RETENTION_DAYS = int(os.getenv("AIS_HISTORY_RETENTION_DAYS", "7"))
+AIS_PARTITION_MAINTENANCE_INTERVAL = float(os.getenv("AIS_PARTITION_MAINTENANCE_INTERVAL", "3600"))
+
+# Reader -> writer hand-off: bounded queue drained by MMSI-partitioned writer tasks
+AIS_WRITER_COUNT = max(1, int(os.getenv("AIS_WRITER_COUNT", "4")))
+AIS_QUEUE_MAXSIZE = int(os.getenv("AIS_QUEUE_MAXSIZE", "20000"))
+AIS_QUEUE_POLICY = os.getenv("AIS_QUEUE_POLICY", "block").lower()  # block | drop_oldest
+
+# Stream reconnects: jittered exponential backoff and no-data watchdog (seconds)
+AIS_RECONNECT_MIN_DELAY = float(os.getenv("AIS_RECONNECT_MIN_DELAY", "1"))
+AIS_RECONNECT_MAX_DELAY = float(os.getenv("AIS_RECONNECT_MAX_DELAY", "60"))
+AIS_STALL_TIMEOUT = float(os.getenv("AIS_STALL_TIMEOUT", "30"))
+
+# Split AIS_BOUNDING_BOXES into this many longitude bands, one websocket each
+AIS_SHARD_COUNT = max(1, int(os.getenv("AIS_SHARD_COUNT", "1")))
+
+# Decode frames in worker processes (0 = inline on the event loop)
+AIS_DECODE_WORKERS = int(os.getenv("AIS_DECODE_WORKERS", "0"))
+AIS_DECODE_BATCH_SIZE = int(os.getenv("AIS_DECODE_BATCH_SIZE", "500"))
+AIS_DECODE_BATCH_DELAY = float(os.getenv("AIS_DECODE_BATCH_DELAY", "0.05"))
+
+# In-memory vessel state: forget vessels not heard from for AIS_VESSEL_TTL seconds
+AIS_VESSEL_TTL = float(os.getenv("AIS_VESSEL_TTL", "21600"))
+AIS_VESSEL_MAX = int(os.getenv("AIS_VESSEL_MAX", "500000"))
+
+# Persisted vessel registry (name, ship type): batched upserts, loaded at startup
+AIS_REGISTRY_BATCH_SIZE = int(os.getenv("AIS_REGISTRY_BATCH_SIZE", "500"))
+AIS_REGISTRY_FLUSH_INTERVAL = float(os.getenv("AIS_REGISTRY_FLUSH_INTERVAL", "5.0"))
+AIS_REGISTRY_BUFFER_MAX = int(os.getenv("AIS_REGISTRY_BUFFER_MAX", "50000"))
+# Rewrite unchanged entries this often (seconds) so updated_at tracks recently seen vessels
+AIS_REGISTRY_REFRESH = float(os.getenv("AIS_REGISTRY_REFRESH", "3600"))
+
+# ships dimension: refresh a vessel's last_seen at most this often (seconds)
+AIS_SHIPS_REFRESH = float(os.getenv("AIS_SHIPS_REFRESH", "60"))
+
+# AIS base stations / AtoN: write only changes, plus an updated_at refresh every AIS_STATION_REFRESH seconds
+AIS_STATION_BATCH_SIZE = int(os.getenv("AIS_STATION_BATCH_SIZE", "200"))
+AIS_STATION_FLUSH_INTERVAL = float(os.getenv("AIS_STATION_FLUSH_INTERVAL", "5.0"))
+AIS_STATION_BUFFER_MAX = int(os.getenv("AIS_STATION_BUFFER_MAX", "10000"))
+AIS_STATION_REFRESH = float(os.getenv("AIS_STATION_REFRESH", "900"))
+
+# Position throttle: "delta" (fixed thresholds) or "predictive" (dead reckoning)
+AIS_THROTTLE_MODE = os.getenv("AIS_THROTTLE_MODE", "delta").lower()
+AIS_THROTTLE_MAX_AGE = float(os.getenv("AIS_THROTTLE_MAX_AGE", "15"))
+AIS_DR_TOLERANCE_M = float(os.getenv("AIS_DR_TOLERANCE_M", "50"))
+
+# Online trail simplification before history insert (0 = keep every history point)
+AIS_TRAIL_TOLERANCE_M = float(os.getenv("AIS_TRAIL_TOLERANCE_M", "0"))
+AIS_TRAIL_MAX_DELAY = float(os.getenv("AIS_TRAIL_MAX_DELAY", "60"))
+AIS_TRAIL_MAX_POINTS = int(os.getenv("AIS_TRAIL_MAX_POINTS", "64"))
+
+# Record raw frames to rotating gzip segments in this directory (empty = off)
+AIS_RECORD_DIR = os.getenv("AIS_RECORD_DIR", "")
+AIS_RECORD_SEGMENT_SECONDS = float(os.getenv("AIS_RECORD_SEGMENT_SECONDS", "300"))
+
+# Prometheus text metrics at http://AIS_METRICS_HOST:AIS_METRICS_PORT/metrics (0 = off);
+# loopback only unless the host is set explicitly
+AIS_METRICS_HOST = os.getenv("AIS_METRICS_HOST", "127.0.0.1")
+AIS_METRICS_PORT = int(os.getenv("AIS_METRICS_PORT", "9108"))
+
+# Change feed: the collector NOTIFYs committed current positions on this channel, the API LISTENs (empty = off)
+POSITIONS_FEED_CHANNEL = os.getenv("POSITIONS_FEED_CHANNEL", "ship_positions")
+# API: full reconciliation query this often while the feed is up (seconds); without the feed it polls every second
+API_RECONCILE_INTERVAL = float(os.getenv("API_RECONCILE_INTERVAL", "30"))
+# API: incremental polls (feed down) re-read this many seconds before the last seen updated_at
+API_POLL_OVERLAP = float(os.getenv("API_POLL_OVERLAP", "5"))
+# API: minimum delay between two websocket broadcasts (seconds)
+API_BROADCAST_INTERVAL = float(os.getenv("API_BROADCAST_INTERVAL", "0.25"))
+# API: send a full keyframe instead of a delta at least this often (seconds)
+API_KEYFRAME_INTERVAL = float(os.getenv("API_KEYFRAME_INTERVAL", "30"))
+
 # Optional: OpenWeatherMap tile layers (precipitation / clouds on map)
 OPENWEATHERMAP_API_KEY = os.getenv("OPENWEATHERMAP_API_KEY", "")
\ No newline at end of file
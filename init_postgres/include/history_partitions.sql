@@ -0,0 +1,92 @@
+-- Функции обслуживания секций ship_positions_history: единственное определение.
+-- Подключаются через \ir из init_postgres.sql и scripts/partition_history_table.sql.
+
+-- Границы секций истории (без DEFAULT); MINVALUE/MAXVALUE -> -infinity/infinity
+CREATE OR REPLACE FUNCTION history_partition_bounds()
+RETURNS TABLE (partition_name TEXT, range_start TIMESTAMPTZ, range_end TIMESTAMPTZ) AS $$
+    SELECT
+        p.name,
+        CASE WHEN p.b[1] = 'MINVALUE' THEN '-infinity'::timestamptz ELSE trim(both '''' from p.b[1])::timestamptz END,
+        CASE WHEN p.b[2] = 'MAXVALUE' THEN 'infinity'::timestamptz ELSE trim(both '''' from p.b[2])::timestamptz END
+    FROM (
+        SELECT
+            c.relname::text AS name,
+            regexp_match(pg_get_expr(c.relpartbound, c.oid), 'FROM \((.+)\) TO \((.+)\)') AS b
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'ship_positions_history'::regclass
+    ) p
+    WHERE p.b IS NOT NULL;
+$$ LANGUAGE sql STABLE;
+
+-- Создание дневных секций на days_ahead суток вперед (и days_back назад).
+-- Дни, уже покрытые секцией, пропускаются; строки дня из DEFAULT переносятся в новую секцию.
+CREATE OR REPLACE FUNCTION ensure_history_partitions(days_ahead INTEGER DEFAULT 3, days_back INTEGER DEFAULT 0)
+RETURNS INTEGER AS $$
+DECLARE
+    today DATE := (NOW() AT TIME ZONE 'UTC')::date;
+    day DATE;
+    range_from TIMESTAMPTZ;
+    range_to TIMESTAMPTZ;
+    part TEXT;
+    created INTEGER := 0;
+BEGIN
+    FOR day IN SELECT generate_series(today - days_back, today + days_ahead, INTERVAL '1 day')::date LOOP
+        range_from := day::timestamp AT TIME ZONE 'UTC';
+        range_to := (day + 1)::timestamp AT TIME ZONE 'UTC';
+        IF EXISTS (
+            SELECT 1 FROM history_partition_bounds()
+            WHERE range_start < range_to AND range_end > range_from
+        ) THEN
+            CONTINUE;
+        END IF;
+
+        part := 'ship_positions_history_p' || to_char(day, 'YYYYMMDD');
+        EXECUTE format('CREATE TABLE %I (LIKE ship_positions_history INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part);
+        EXECUTE format(
+            'WITH moved AS ('
+            '    DELETE FROM ship_positions_history_default WHERE timestamp >= $1 AND timestamp < $2 RETURNING *'
+            ') INSERT INTO %I SELECT * FROM moved',
+            part
+        ) USING range_from, range_to;
+        EXECUTE format(
+            'ALTER TABLE ship_positions_history ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            part, range_from, range_to
+        );
+        created := created + 1;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Очистка: отсоединение и удаление секций старше keep_days суток (без DELETE и раздувания таблицы)
+CREATE OR REPLACE FUNCTION drop_history_partitions(keep_days INTEGER DEFAULT 7)
+RETURNS INTEGER AS $$
+DECLARE
+    cutoff TIMESTAMPTZ := ((NOW() AT TIME ZONE 'UTC')::date - keep_days)::timestamp AT TIME ZONE 'UTC';
+    part RECORD;
+    dropped INTEGER := 0;
+BEGIN
+    -- DETACH берет эксклюзивную блокировку родителя: не ждать долго, следующий запуск повторит
+    SET LOCAL lock_timeout = '5s';
+    FOR part IN
+        SELECT partition_name FROM history_partition_bounds()
+        WHERE range_end <= cutoff
+        ORDER BY range_end
+    LOOP
+        EXECUTE format('ALTER TABLE ship_positions_history DETACH PARTITION %I', part.partition_name);
+        EXECUTE format('DROP TABLE %I', part.partition_name);
+        dropped := dropped + 1;
+    END LOOP;
+    DELETE FROM ship_positions_history_default WHERE timestamp < cutoff;
+    RETURN dropped;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Очистка старых данных (старше 7 дней), сохранена для совместимости
+CREATE OR REPLACE FUNCTION cleanup_old_positions()
+RETURNS void AS $$
+BEGIN
+    PERFORM drop_history_partitions(7);
+END;
+$$ LANGUAGE plpgsql;
@@ -1,4 +1,13 @@
--- Таблица для текущих позиций судов (UPSERT)
+-- Грубая метка свежести (10 минут) для индекса по времени обновления: в пределах
+-- интервала значение не меняется, поэтому UPSERT текущей позиции остается HOT-обновлением
+CREATE OR REPLACE FUNCTION freshness_bucket(ts TIMESTAMPTZ)
+RETURNS TIMESTAMPTZ AS $$
+    SELECT date_bin(INTERVAL '10 minutes', ts, TIMESTAMPTZ '2000-01-01 00:00:00+00');
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Таблица для текущих позиций судов (UPSERT).
+-- Индексированы только ship_id и updated_bucket, остальные столбцы меняются без
+-- записи в индексы; fillfactor оставляет на странице место для новой версии строки.
 CREATE TABLE IF NOT EXISTS ship_positions_current (
     ship_id BIGINT PRIMARY KEY,
     latitude DOUBLE PRECISION NOT NULL,
@@ -10,12 +19,19 @@ CREATE TABLE IF NOT EXISTS ship_positions_current (
     rate_of_turn DOUBLE PRECISION,
     ship_type SMALLINT,
     timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
-    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    updated_bucket TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT freshness_bucket(NOW())
+) WITH (
+    fillfactor = 70,
+    autovacuum_vacuum_scale_factor = 0.02,
+    autovacuum_vacuum_threshold = 1000,
+    autovacuum_analyze_scale_factor = 0.05,
+    autovacuum_vacuum_cost_delay = 0
 );
 
--- Таблица для истории позиций (с автоматической очисткой старых данных)
+-- Таблица для истории позиций: секции по суткам (UTC), очистка удалением старых секций
 CREATE TABLE IF NOT EXISTS ship_positions_history (
-    id BIGSERIAL PRIMARY KEY,
+    id BIGSERIAL,
     ship_id BIGINT NOT NULL,
     latitude DOUBLE PRECISION NOT NULL,
     longitude DOUBLE PRECISION NOT NULL,
@@ -25,8 +41,13 @@ CREATE TABLE IF NOT EXISTS ship_positions_history (
     navigational_status INTEGER,
     rate_of_turn DOUBLE PRECISION,
     ship_type SMALLINT,
-    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
-);
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Секция по умолчанию: строки вне дневных секций (сильно опоздавшие или из будущего)
+CREATE TABLE IF NOT EXISTS ship_positions_history_default
+    PARTITION OF ship_positions_history DEFAULT;
 
 -- Справочник судов для явных связей в ERD
 CREATE TABLE IF NOT EXISTS ships (
@@ -36,39 +57,26 @@ CREATE TABLE IF NOT EXISTS ships (
     last_ship_type SMALLINT
 );
 
+-- Реестр статических данных судов (имя, тип): коллектор загружает его при старте
+CREATE TABLE IF NOT EXISTS vessel_registry (
+    ship_id BIGINT PRIMARY KEY,
+    name TEXT,
+    ship_type SMALLINT,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
 -- Индексы для быстрого поиска
 CREATE INDEX IF NOT EXISTS idx_history_ship_id ON ship_positions_history(ship_id);
-CREATE INDEX IF NOT EXISTS idx_history_timestamp ON ship_positions_history(timestamp);
-CREATE INDEX IF NOT EXISTS idx_current_updated_at ON ship_positions_current(updated_at);
+-- Окно треков и диапазоны по времени: строки пишутся почти по порядку timestamp,
+-- BRIN в сотни раз меньше B-tree
+CREATE INDEX IF NOT EXISTS idx_history_timestamp_brin ON ship_positions_history
+    USING BRIN (timestamp) WITH (pages_per_range = 32);
+CREATE INDEX IF NOT EXISTS idx_current_updated_bucket ON ship_positions_current(updated_bucket);
+CREATE INDEX IF NOT EXISTS idx_vessel_registry_updated_at ON vessel_registry(updated_at);
 
--- Триггер: автоматически создает/обновляет запись в ships
-CREATE OR REPLACE FUNCTION ensure_ship_dimension_row()
-RETURNS TRIGGER AS $$
-BEGIN
-    INSERT INTO ships (ship_id, first_seen, last_seen, last_ship_type)
-    VALUES (
-        NEW.ship_id,
-        COALESCE(NEW.timestamp, NOW()),
-        COALESCE(NEW.updated_at, NEW.timestamp, NOW()),
-        NEW.ship_type
-    )
-    ON CONFLICT (ship_id)
-    DO UPDATE SET
-        last_seen = GREATEST(ships.last_seen, COALESCE(NEW.updated_at, NEW.timestamp, NOW())),
-        last_ship_type = COALESCE(EXCLUDED.last_ship_type, ships.last_ship_type);
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
-DROP TRIGGER IF EXISTS trg_current_ensure_ship ON ship_positions_current;
-CREATE TRIGGER trg_current_ensure_ship
-BEFORE INSERT OR UPDATE ON ship_positions_current
-FOR EACH ROW EXECUTE FUNCTION ensure_ship_dimension_row();
-
-DROP TRIGGER IF EXISTS trg_history_ensure_ship ON ship_positions_history;
-CREATE TRIGGER trg_history_ensure_ship
-BEFORE INSERT ON ship_positions_history
-FOR EACH ROW EXECUTE FUNCTION ensure_ship_dimension_row();
+-- Справочник ships ведет коллектор: пакетный UPSERT перед записью позиций,
+-- только для новых судов, смены типа или устаревшего last_seen
+-- (вместо построчного триггера ensure_ship_dimension_row).
 
 -- Внешние ключи для явных связей в ERD
 DO $$
@@ -97,18 +105,15 @@ BEGIN
     END IF;
 END $$;
 
--- Функция для автоматической очистки старых данных (старше 7 дней)
-CREATE OR REPLACE FUNCTION cleanup_old_positions()
-RETURNS void AS $$
-BEGIN
-    DELETE FROM ship_positions_history 
-    WHERE timestamp < NOW() - INTERVAL '7 days';
-END;
-$$ LANGUAGE plpgsql;
+-- Функции обслуживания секций (создание, очистка)
+\ir include/history_partitions.sql
+
+-- Секции на сегодня и 3 суток вперед; дальше их создает коллектор
+SELECT ensure_history_partitions(3);
 
 -- Комментарии к таблицам
 COMMENT ON TABLE ship_positions_current IS 'Текущие позиции судов (обновляется через UPSERT)';
-COMMENT ON TABLE ship_positions_history IS 'История позиций судов (автоматически очищается через 7 дней)';
+COMMENT ON TABLE ship_positions_history IS 'История позиций судов (секции по суткам, старые секции удаляются коллектором)';
 
 -- Базовые станции AIS (сообщение 4), навигационные знаки AtoN (сообщение 21)
 CREATE TABLE IF NOT EXISTS ais_stations (
@@ -148,5 +153,6 @@ END $$;
 
 COMMENT ON TABLE ais_stations IS 'Стационарные объекты AIS: базовые станции, AtoN';
 COMMENT ON TABLE ships IS 'Справочник судов (родительская сущность для текущих и исторических позиций)';
+COMMENT ON TABLE vessel_registry IS 'Статические данные судов (имя, тип) для прогрева коллектора при старте';
 COMMENT ON TABLE ais_station_kinds IS 'Справочник категорий стационарных AIS-объектов';
 
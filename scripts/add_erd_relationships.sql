@@ -33,34 +33,11 @@ ON CONFLICT (ship_id) DO UPDATE SET
     first_seen = LEAST(ships.first_seen, EXCLUDED.first_seen),
     last_seen = GREATEST(ships.last_seen, EXCLUDED.last_seen);
 
--- 3) Trigger function to keep ships in sync
-CREATE OR REPLACE FUNCTION ensure_ship_dimension_row()
-RETURNS TRIGGER AS $$
-BEGIN
-    INSERT INTO ships (ship_id, first_seen, last_seen, last_ship_type)
-    VALUES (
-        NEW.ship_id,
-        COALESCE(NEW.timestamp, NOW()),
-        COALESCE(NEW.updated_at, NEW.timestamp, NOW()),
-        NEW.ship_type
-    )
-    ON CONFLICT (ship_id)
-    DO UPDATE SET
-        last_seen = GREATEST(ships.last_seen, COALESCE(NEW.updated_at, NEW.timestamp, NOW())),
-        last_ship_type = COALESCE(EXCLUDED.last_ship_type, ships.last_ship_type);
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
+-- 3) ships is kept in sync by the collector (batched upserts before position
+--    writes), not by per-row triggers; remove them if an older version added them
 DROP TRIGGER IF EXISTS trg_current_ensure_ship ON ship_positions_current;
-CREATE TRIGGER trg_current_ensure_ship
-BEFORE INSERT OR UPDATE ON ship_positions_current
-FOR EACH ROW EXECUTE FUNCTION ensure_ship_dimension_row();
-
 DROP TRIGGER IF EXISTS trg_history_ensure_ship ON ship_positions_history;
-CREATE TRIGGER trg_history_ensure_ship
-BEFORE INSERT ON ship_positions_history
-FOR EACH ROW EXECUTE FUNCTION ensure_ship_dimension_row();
+DROP FUNCTION IF EXISTS ensure_ship_dimension_row();
 
 -- 4) FK: current/history -> ships
 DO $$
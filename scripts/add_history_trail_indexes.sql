@@ -0,0 +1,31 @@
+-- Run once on existing databases (after scripts/partition_history_table.sql):
+-- replace the B-tree on history timestamp with
+--   idx_history_timestamp_brin  BRIN (timestamp) for the trails window and time-range scans
+-- History is appended in near timestamp order, so the BRIN index is a few MB
+-- where the B-tree takes GBs. idx_history_ship_id stays as it is.
+--
+-- Partitioned indexes cannot be built CONCURRENTLY, so each partition's index is
+-- built concurrently and attached to an index created ON ONLY the parent; the
+-- parent index becomes valid once every partition has one. Writers are never
+-- blocked except for the brief DROP INDEX at the end.
+-- Run with psql (uses \gexec), outside an explicit transaction.
+
+-- 1) Parent index definition; new partitions get the index automatically
+CREATE INDEX IF NOT EXISTS idx_history_timestamp_brin
+    ON ONLY ship_positions_history USING BRIN (timestamp) WITH (pages_per_range = 32);
+
+-- 2) Build per partition without blocking writes, then attach to the parent index
+SELECT
+    format('CREATE INDEX CONCURRENTLY IF NOT EXISTS %I ON %I USING BRIN (timestamp) WITH (pages_per_range = 32)',
+           c.relname || '_ts_brin', c.relname),
+    format('ALTER INDEX idx_history_timestamp_brin ATTACH PARTITION %I', c.relname || '_ts_brin')
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'ship_positions_history'::regclass
+ORDER BY c.relname
+\gexec
+
+-- 3) The B-tree on timestamp is replaced by BRIN
+DROP INDEX IF EXISTS idx_history_timestamp;
+
+ANALYZE ship_positions_history;
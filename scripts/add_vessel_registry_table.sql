@@ -0,0 +1,18 @@
+-- Run once on existing databases: vessel static-data registry for collector warm start
+CREATE TABLE IF NOT EXISTS vessel_registry (
+    ship_id BIGINT PRIMARY KEY,
+    name TEXT,
+    ship_type SMALLINT,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_vessel_registry_updated_at ON vessel_registry(updated_at);
+
+-- Seed ship types already known from the ships dimension
+INSERT INTO vessel_registry (ship_id, ship_type, updated_at)
+SELECT ship_id, last_ship_type, last_seen
+FROM ships
+WHERE last_ship_type IS NOT NULL
+ON CONFLICT (ship_id) DO NOTHING;
+
+COMMENT ON TABLE vessel_registry IS 'Статические данные судов (имя, тип) для прогрева коллектора при старте';
@@ -0,0 +1,6 @@
+-- Run once on existing databases after deploying a collector with ShipDimension:
+-- the collector now upserts `ships` in batches before writing positions, so the
+-- per-row triggers only double the write cost.
+DROP TRIGGER IF EXISTS trg_current_ensure_ship ON ship_positions_current;
+DROP TRIGGER IF EXISTS trg_history_ensure_ship ON ship_positions_history;
+DROP FUNCTION IF EXISTS ensure_ship_dimension_row();
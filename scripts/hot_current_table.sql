@@ -0,0 +1,31 @@
+-- Run once on existing databases: let ship_positions_current be updated with
+-- heap-only-tuple (HOT) updates. idx_current_updated_at indexed a column that
+-- changes on every upsert, so every upsert wrote new index entries. It is
+-- replaced by updated_bucket, a 10-minute bucket that changes at most once per
+-- 10 minutes per vessel. The table is small (one row per vessel), so the
+-- rewrite at the end takes seconds.
+-- Run before deploying the matching collector and API.
+
+CREATE OR REPLACE FUNCTION freshness_bucket(ts TIMESTAMPTZ)
+RETURNS TIMESTAMPTZ AS $$
+    SELECT date_bin(INTERVAL '10 minutes', ts, TIMESTAMPTZ '2000-01-01 00:00:00+00');
+$$ LANGUAGE sql IMMUTABLE;
+
+ALTER TABLE ship_positions_current
+    ADD COLUMN IF NOT EXISTS updated_bucket TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT freshness_bucket(NOW());
+UPDATE ship_positions_current SET updated_bucket = freshness_bucket(updated_at);
+
+DROP INDEX IF EXISTS idx_current_updated_at;
+CREATE INDEX IF NOT EXISTS idx_current_updated_bucket ON ship_positions_current(updated_bucket);
+
+-- free space on every page for the new row version, and vacuum this hot table early
+ALTER TABLE ship_positions_current SET (
+    fillfactor = 70,
+    autovacuum_vacuum_scale_factor = 0.02,
+    autovacuum_vacuum_threshold = 1000,
+    autovacuum_analyze_scale_factor = 0.05,
+    autovacuum_vacuum_cost_delay = 0
+);
+
+-- fillfactor only applies to newly written pages: rewrite the table once
+VACUUM FULL ANALYZE ship_positions_current;
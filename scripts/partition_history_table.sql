@@ -0,0 +1,96 @@
+-- Run once on existing databases: turn ship_positions_history into a table
+-- range-partitioned by day (UTC), with retention by dropping whole partitions.
+--
+-- No rows are copied. The existing table is attached as one partition covering
+-- everything up to the end of today (UTC). New days get their own partitions,
+-- and retention drops the old table as a whole once all of its rows have expired.
+--
+-- Stop the collector first. Step 1 builds an index without blocking. Step 2
+-- holds an exclusive lock on the history table, but it only changes the
+-- catalog: the CHECK constraint is one sequential scan and nothing is rewritten.
+-- Run with psql, outside an explicit transaction (step 1 uses CONCURRENTLY).
+
+-- 1) Unique index for the new primary key (id, timestamp), built without blocking writers
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ship_positions_history_legacy_id_ts
+    ON ship_positions_history (id, timestamp);
+
+BEGIN;
+
+LOCK TABLE ship_positions_history IN ACCESS EXCLUSIVE MODE;
+
+-- 2) Move the existing table aside and free the names the new table uses
+ALTER TABLE ship_positions_history RENAME TO ship_positions_history_legacy;
+ALTER TABLE ship_positions_history_legacy
+    DROP CONSTRAINT ship_positions_history_pkey,
+    ADD CONSTRAINT ship_positions_history_legacy_pkey PRIMARY KEY USING INDEX ship_positions_history_legacy_id_ts;
+ALTER INDEX IF EXISTS idx_history_ship_id RENAME TO idx_history_legacy_ship_id;
+ALTER INDEX IF EXISTS idx_history_timestamp RENAME TO idx_history_legacy_timestamp;
+
+-- 3) Partitioned table; keeps the id sequence of the old table
+CREATE TABLE ship_positions_history (
+    id BIGINT NOT NULL DEFAULT nextval('ship_positions_history_id_seq'),
+    ship_id BIGINT NOT NULL,
+    latitude DOUBLE PRECISION NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    course_over_ground DOUBLE PRECISION,
+    speed_over_ground DOUBLE PRECISION,
+    heading INTEGER,
+    navigational_status INTEGER,
+    rate_of_turn DOUBLE PRECISION,
+    ship_type SMALLINT,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+ALTER SEQUENCE ship_positions_history_id_seq OWNED BY ship_positions_history.id;
+ALTER TABLE ship_positions_history_legacy ALTER COLUMN id DROP DEFAULT;
+
+CREATE TABLE ship_positions_history_default
+    PARTITION OF ship_positions_history DEFAULT;
+
+CREATE INDEX idx_history_ship_id ON ship_positions_history(ship_id);
+CREATE INDEX idx_history_timestamp ON ship_positions_history(timestamp);
+
+-- the old table's FK is equivalent, so attaching reuses it instead of re-validating
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'fk_ship_positions_history_ship'
+          AND conrelid = 'ship_positions_history_legacy'::regclass
+    ) THEN
+        ALTER TABLE ship_positions_history_legacy
+            RENAME CONSTRAINT fk_ship_positions_history_ship TO fk_ship_positions_history_legacy_ship;
+    END IF;
+END $$;
+ALTER TABLE ship_positions_history
+    ADD CONSTRAINT fk_ship_positions_history_ship
+    FOREIGN KEY (ship_id) REFERENCES ships(ship_id) ON DELETE CASCADE;
+
+-- 4) Attach the old table for everything before tomorrow (or after its newest row).
+--    The CHECK constraint proves the range, so ATTACH skips its own validation scan.
+DO $$
+DECLARE
+    range_to TIMESTAMPTZ;
+BEGIN
+    SELECT ((GREATEST(MAX(timestamp), NOW()) AT TIME ZONE 'UTC')::date + 1)::timestamp AT TIME ZONE 'UTC'
+    INTO range_to
+    FROM ship_positions_history_legacy;
+
+    EXECUTE format(
+        'ALTER TABLE ship_positions_history_legacy ADD CONSTRAINT ship_positions_history_legacy_range CHECK (timestamp < %L)',
+        range_to
+    );
+    EXECUTE format(
+        'ALTER TABLE ship_positions_history ATTACH PARTITION ship_positions_history_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+        range_to
+    );
+END $$;
+
+-- 5) Partition maintenance functions, defined once for this script and init_postgres.sql
+\ir ../init_postgres/include/history_partitions.sql
+
+SELECT ensure_history_partitions(3);
+
+COMMENT ON TABLE ship_positions_history IS 'История позиций судов (секции по суткам, старые секции удаляются коллектором)';
+
+COMMIT;
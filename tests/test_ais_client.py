@@ -0,0 +1,61 @@
+import pytest
+
+from collector import ais_client
+from collector.decoder import PositionReport
+from collector.vessel_state import VesselState
+
+T0 = 1792238400.0
+KNOT_DEG_PER_S = 1852 / 3600 / 111320.0
+
+
+def _report(lat: float, lon: float, speed=None, course=None, heading=None, event_time=T0) -> PositionReport:
+    return PositionReport(244660000, lat, lon, speed, course, heading, 0, 0.0, 70, None, event_time)
+
+
+def _saved(report: PositionReport) -> VesselState:
+    state = VesselState(report.mmsi, 0.0)
+    state.lat = report.latitude
+    state.lon = report.longitude
+    state.speed = report.speed
+    state.course = report.course
+    state.heading = report.heading
+    state.saved_event_time = report.event_time
+    return state
+
+
+@pytest.fixture
+def predictive(monkeypatch):
+    monkeypatch.setattr(ais_client, "AIS_THROTTLE_MODE", "predictive")
+    monkeypatch.setattr(ais_client, "AIS_DR_TOLERANCE_M", 50.0)
+    monkeypatch.setattr(ais_client, "AIS_THROTTLE_MAX_AGE", 60.0)
+
+
+def test_vessel_without_cog_is_not_extrapolated(predictive):
+    state = _saved(_report(51.95, 4.05, speed=10.0))
+    # 12 kn SOG but no COG, same position 40 s later: the old rule predicted ~200 m due north
+    report = _report(51.95, 4.05, speed=12.0, event_time=T0 + 40)
+    assert ais_client._throttle(state, report, report.event_time) == (False, False)
+
+    moved = _report(51.95 + 0.001, 4.05, speed=12.0, event_time=T0 + 40)
+    assert ais_client._throttle(state, moved, moved.event_time) == (True, True)
+
+
+def test_real_north_course_is_extrapolated(predictive):
+    state = _saved(_report(51.95, 4.05, speed=10.0, course=0.0))
+    report = _report(51.95 + 10.0 * KNOT_DEG_PER_S * 40, 4.05, speed=10.0, course=0.0, event_time=T0 + 40)
+    assert ais_client._throttle(state, report, report.event_time) == (False, False)
+
+
+def test_missing_course_is_no_course_change(monkeypatch):
+    monkeypatch.setattr(ais_client, "AIS_THROTTLE_MODE", "delta")
+    monkeypatch.setattr(ais_client, "AIS_THROTTLE_MAX_AGE", 60.0)
+    state = _saved(_report(51.95, 4.05, speed=10.0))
+    for course, heading in ((0.0, 0), (None, None)):
+        report = _report(51.95, 4.05, speed=10.0, course=course, heading=heading, event_time=T0 + 5)
+        assert ais_client._throttle(state, report, report.event_time) == (False, False)
+
+    state.course, state.heading = 358.0, 358
+    across_north = _report(51.95, 4.05, speed=10.0, course=1.0, heading=1, event_time=T0 + 5)
+    assert ais_client._throttle(state, across_north, across_north.event_time) == (False, False)
+    turned = _report(51.95, 4.05, speed=10.0, course=10.0, heading=358, event_time=T0 + 5)
+    assert ais_client._throttle(state, turned, turned.event_time) == (True, False)
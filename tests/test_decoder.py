@@ -0,0 +1,136 @@
+import json
+import random
+
+import pytest
+
+from benchmarks.fleet_simulator import _GARBAGE, Fleet
+from collector import decoder
+from collector.decoder import PositionReport, StaticReport
+
+TIME_UTC = "2026-10-17 12:00:00.5 +0000 UTC"
+
+DECODERS = [decoder._decode_frame_dict]
+if decoder.msgspec is not None:
+    DECODERS.append(decoder._decode_frame_typed)
+
+
+def _frame(msg_type: str, body: dict) -> bytes:
+    return json.dumps({
+        "MessageType": msg_type,
+        "Message": {msg_type: body},
+        "MetaData": {"time_utc": TIME_UTC},
+    }).encode()
+
+
+def _position(**fields) -> dict:
+    body = {
+        "UserID": 244660000, "Latitude": 51.95, "Longitude": 4.05,
+        "Sog": 12.5, "Cog": 87.0, "TrueHeading": 86, "NavigationalStatus": 0, "RateOfTurn": 0.0,
+    }
+    body.update(fields)
+    return body
+
+
+@pytest.mark.parametrize("decode", DECODERS)
+def test_position_report(decode):
+    report = decode(_frame("PositionReport", _position(TrueHeading=511)))
+    assert report == PositionReport(
+        244660000, 51.95, 4.05, 12.5, 87.0, None, 0, 0.0, None, None, 1792238400.5,
+    )
+
+
+@pytest.mark.parametrize("decode", DECODERS)
+@pytest.mark.parametrize("field, value", [
+    ("ShipType", "abc"),
+    ("Name", 12345),
+    ("Sog", "fast"),
+    ("TrueHeading", [1]),
+])
+def test_malformed_optional_field_keeps_the_report(decode, field, value):
+    report = decode(_frame("StandardClassBPositionReport", _position(**{field: value})))
+    assert type(report) is PositionReport
+    assert (report.mmsi, report.latitude, report.longitude) == (244660000, 51.95, 4.05)
+    assert report.event_time == 1792238400.5
+
+
+def test_decoders_agree_on_malformed_optional_fields():
+    if decoder.msgspec is None:
+        pytest.skip("msgspec not installed")
+    frames = [
+        _frame("PositionReport", _position(ShipType="abc", Name=7)),
+        _frame("ShipStaticData", {"UserID": 244660000, "Name": "EVER GIVEN ", "ShipType": "cargo"}),
+        _frame("ShipStaticData", {"UserID": 244660000, "Name": ["x"], "ShipType": 70}),
+    ]
+    for raw in frames:
+        assert decoder._decode_frame_typed(raw) == decoder._decode_frame_dict(raw)
+    assert decoder._decode_frame_typed(frames[1]) == StaticReport(244660000, "EVER GIVEN", None)
+
+
+@pytest.mark.parametrize("decode", DECODERS)
+@pytest.mark.parametrize("field, value, attr", [
+    ("ShipType", 40000, "ship_type"),
+    ("ShipType", -1, "ship_type"),
+    ("TrueHeading", 360, "heading"),
+    ("NavigationalStatus", 99, "navigational_status"),
+    ("Cog", 360.0, "course"),
+    ("Sog", 102.3, "speed"),
+])
+def test_out_of_range_field_becomes_none(decode, field, value, attr):
+    report = decode(_frame("PositionReport", _position(**{field: value})))
+    assert getattr(report, attr) is None
+    assert report.mmsi == 244660000
+
+
+@pytest.mark.parametrize("decode", DECODERS)
+@pytest.mark.parametrize("mmsi", [0, -5, 10 ** 12])
+def test_invalid_mmsi_drops_the_report(decode, mmsi):
+    assert decode(_frame("PositionReport", _position(UserID=mmsi))) is None
+    assert decode(_frame("ShipStaticData", {"UserID": mmsi, "Name": "X", "Type": 70})) is None
+
+
+@pytest.mark.parametrize("decode", DECODERS)
+def test_static_ship_type_out_of_range(decode):
+    report = decode(_frame("ShipStaticData", {"UserID": 244660000, "Name": "X", "Type": 1000}))
+    assert report == StaticReport(244660000, "X", None)
+
+
+def _simulator_frames() -> list:
+    """Frames as the fleet simulator sends them, plus garbage and out-of-range variants."""
+    rnd = random.Random(7)
+    fleet = Fleet(400, "ports", rnd)
+    now = 1792238400.0
+    kinds = [
+        [f for _, _, f in fleet.positions(300, now)],
+        [f for _, _, f in fleet.statics(100, now)],
+        [f for _, _, f in fleet.station_reports(20, now)],
+    ]
+    out_of_range = [
+        ("UserID", 0), ("UserID", 10 ** 12), ("Latitude", 91.0), ("Longitude", -181.0),
+        ("Sog", 102.3), ("Cog", 360.0), ("TrueHeading", 360), ("NavigationalStatus", 16),
+        ("ShipType", 256), ("ShipType", -1), ("Type", 40000), ("RateOfTurn", "left"),
+    ]
+    variants = []
+    for frames in kinds:
+        for i, (field, value) in enumerate(out_of_range):
+            for frame in frames[i::len(out_of_range)][:4]:
+                message = json.loads(frame)
+                body = message["Message"][message["MessageType"]]
+                (body.get("ReportB") or body)[field] = value
+                variants.append(json.dumps(message))
+    return [f for frames in kinds for f in frames] + variants + list(_GARBAGE)
+
+
+def test_decoders_agree_on_simulator_frames():
+    if decoder.msgspec is None:
+        pytest.skip("msgspec not installed")
+    decoded = 0
+    for raw in _simulator_frames():
+        try:
+            expected = decoder._decode_frame_dict(raw)
+        except ValueError:
+            with pytest.raises(ValueError):
+                decoder._decode_frame_typed(raw)
+            continue
+        assert decoder._decode_frame_typed(raw) == expected, raw
+        decoded += expected is not None
+    assert decoded > 400
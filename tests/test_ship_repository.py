@@ -0,0 +1,100 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import asyncpg
+
+from collector.ship_repository import CurrentPositionBuffer, HistorySink
+
+NOW = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+POISON_TYPE = 40000
+
+
+def _record(ship_id: int, ship_type=70) -> tuple:
+    return (ship_id, 51.95, 4.05, 87.0, 12.5, 86, 0, 0.0, ship_type, NOW)
+
+
+class FakeConnection:
+    """Rejects any batch holding a ship_type outside smallint, as Postgres does."""
+
+    def __init__(self):
+        self.written = []
+        self.down = False
+
+    def _check(self, records: list) -> None:
+        if self.down:
+            raise ConnectionResetError("connection lost")
+        if any(record[8] == POISON_TYPE for record in records):
+            raise asyncpg.DataError("invalid input for query argument $9 (value out of int16 range)")
+
+    async def execute(self, query: str, *columns) -> None:
+        records = list(zip(*columns))
+        self._check(records)
+        self.written.extend(records)
+
+    async def copy_records_to_table(self, table: str, records: list, columns: tuple) -> None:
+        self._check(records)
+        self.written.extend(records)
+
+
+class FakePool:
+    def __init__(self):
+        self.conn = FakeConnection()
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+def _flush(buffer_cls, records: list, **kwargs):
+    pool = FakePool()
+    buffer = buffer_cls(pool, batch_size=len(records), flush_interval=1.0, max_rows=len(records), **kwargs)
+
+    async def run():
+        for record in records:
+            await buffer.add(record)
+        return await buffer.flush()
+
+    return buffer, pool, asyncio.run(run())
+
+
+def test_poison_row_does_not_block_current_positions():
+    records = [_record(ship_id) for ship_id in range(1, 101)]
+    records[37] = _record(38, POISON_TYPE)
+    buffer, pool, written = _flush(CurrentPositionBuffer, records)
+    rejected = buffer.rejected.value
+
+    assert written == 99
+    assert sorted(r[0] for r in pool.conn.written) == [i for i in range(1, 101) if i != 38]
+    assert len(buffer) == 0
+
+    # the next flush is not stuck on the rejected row
+    buffer, pool, written = _flush(CurrentPositionBuffer, [_record(1), _record(2)])
+    assert written == 2
+    assert buffer.rejected.value == rejected
+
+
+def test_poison_row_does_not_cost_the_history_batch():
+    records = [_record(ship_id) for ship_id in range(1, 2001)]
+    records[5] = _record(6, POISON_TYPE)
+    records[1500] = _record(1501, POISON_TYPE)
+    sink, pool, written = _flush(HistorySink, records)
+
+    assert written == 1998
+    assert [r[0] for r in pool.conn.written] == [i for i in range(1, 2001) if i not in (6, 1501)]
+
+
+def test_connection_error_requeues_the_batch():
+    pool = FakePool()
+    buffer = CurrentPositionBuffer(pool, batch_size=1000, flush_interval=1.0, max_rows=1000)
+
+    async def run():
+        for ship_id in range(1, 11):
+            await buffer.add(_record(ship_id))
+        pool.conn.down = True
+        failed = await buffer.flush()
+        pool.conn.down = False
+        return failed, len(buffer), await buffer.flush()
+
+    failed, requeued, written = asyncio.run(run())
+    assert (failed, requeued, written) == (0, 10, 10)
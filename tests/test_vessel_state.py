@@ -0,0 +1,54 @@
+import asyncio
+import sys
+
+from collector.trajectory import TrajectorySimplifier
+from collector.vessel_state import _RECORD_BYTES, _TRAIL_POINT_BYTES, TRAIL_POINTS_HELD, VesselStateStore
+
+
+class ListSink:
+    def __init__(self):
+        self.rows = []
+
+    async def add(self, record: tuple) -> None:
+        self.rows.append(record)
+
+
+def _recount(store: VesselStateStore) -> int:
+    """What memory_bytes used to compute by walking every vessel."""
+    names = sum(sys.getsizeof(s.name) for s in store._vessels.values() if s.name is not None)
+    return sys.getsizeof(store._vessels) + len(store) * _RECORD_BYTES + names
+
+
+def test_memory_bytes_follows_names_and_evictions():
+    store = VesselStateStore(ttl=3600.0, max_vessels=3)
+    store.load(1, "EVER GIVEN", 70)
+    store.load(2, None, 70)
+    store.set_name(store.touch(2), "MAERSK ESSEN")
+    store.set_name(store.touch(1), "EVER GIVEN II")
+    assert store.memory_bytes() - int(TRAIL_POINTS_HELD.value) * _TRAIL_POINT_BYTES == _recount(store)
+
+    # the size cap evicts vessel 2, the least recently seen
+    store.touch(3)
+    store.set_name(store.touch(4), "X")
+    assert 2 not in store
+    assert store.memory_bytes() - int(TRAIL_POINTS_HELD.value) * _TRAIL_POINT_BYTES == _recount(store)
+
+
+def test_trail_points_held_follow_the_simplifier():
+    store = VesselStateStore(ttl=3600.0, max_vessels=10)
+    sink = ListSink()
+    trail = TrajectorySimplifier(sink, tolerance_m=10.0, max_delay=3600.0, max_points=100)
+    before = TRAIL_POINTS_HELD.value
+
+    async def run():
+        state = store.touch(244660000)
+        for i in range(5):
+            # a straight line: everything after the anchor is held back
+            await trail.add(state, (244660000, 51.0 + i * 0.001, 4.0))
+        held = TRAIL_POINTS_HELD.value - before
+        await trail.close()
+        return held
+
+    assert asyncio.run(run()) == 4
+    assert TRAIL_POINTS_HELD.value == before
+    assert len(sink.rows) == 2